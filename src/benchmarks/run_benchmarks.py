@@ -0,0 +1,259 @@
+# src/benchmarks/run_benchmarks.py
+#
+# Throughput benchmark of the pipeline stages on a synthetic VisDrone dataset:
+#   parse               - the selected --parser over every annotation file (serial, as in detection_tasks)
+#   detection_tasks     - generate_detection_tasks
+#   sft_conversion      - convert_detection_tasks_to_sft_llava_debug
+# Each stage runs in a fresh process so its peak RSS is measured on its own. Results are written
+# as JSON; pass --compare with an earlier result file to print the change per stage.
+#
+#   python src/benchmarks/run_benchmarks.py --num-files 2000 --output bench.json
+#   python src/benchmarks/run_benchmarks.py --num-files 2000 --output bench_new.json --compare bench.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Make the src/ modules importable when the script is run directly
+sys.path.insert(0, SRC_DIR)
+
+from benchmarks.synthetic_dataset import add_dataset_arguments, generate_synthetic_dataset, load_manifest  # noqa: E402
+from utils.instrumentation import path_bytes  # noqa: E402
+
+STAGES = ("parse", "detection_tasks", "sft_conversion")
+# Stages whose timing depends on --parser; only these record and compare the parser
+PARSER_STAGES = ("parse", "detection_tasks")
+# Metrics compared by --compare, and whether larger is better
+COMPARED_METRICS = {"files_per_s": True, "boxes_per_s": True, "seconds": False, "peak_rss_bytes": False}
+
+
+def _peak_rss_bytes() -> Dict[str, Optional[int]]:
+    """Peak resident set size of this process and of its finished child processes (parser workers)."""
+    try:
+        import resource  # not available on Windows
+    except ImportError:
+        try:
+            import psutil  # optional; only the current process is covered
+        except ImportError:
+            return {"peak_rss_bytes": None, "peak_worker_rss_bytes": None}
+        info = psutil.Process().memory_info()
+        return {"peak_rss_bytes": getattr(info, "peak_wset", info.rss), "peak_worker_rss_bytes": None}
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "peak_worker_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale or None,
+    }
+
+
+def _run_stage(stage: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one stage (in a fresh process) and return its raw measurements."""
+    # The parser logs into logs/ relative to the working directory; keep it inside the work dir
+    os.chdir(config["work_dir"])
+    import logging
+
+    from tasks.detection_task import generate_detection_tasks, iter_parsed_files, list_annotation_files
+
+    # Modules the selected options import lazily are loaded before any clock starts
+    if config["parser"] == "bulk":
+        import numpy.ma  # noqa: F401  (loaded by the first np.unique call)
+        import tasks.bulk_parser  # noqa: F401  (and NumPy)
+    if config["output_format"] == "columnar":
+        import tasks.columnar  # noqa: F401
+
+    if config["quiet"]:
+        logging.getLogger("visdrone_parser").setLevel(logging.ERROR)
+        logging.getLogger("visdrone_logger").setLevel(logging.ERROR)
+
+    annotations_dir = config["annotations_dir"]
+    txt_files = list_annotation_files(annotations_dir)
+    result: Dict[str, Any] = {"files": len(txt_files)}
+    if stage in PARSER_STAGES:
+        result["parser"] = config["parser"]
+
+    start = time.perf_counter()
+    if stage == "parse":
+        result["boxes"] = result["lines"] = 0
+        txt_paths = [os.path.join(annotations_dir, txt_file) for txt_file in txt_files]
+        for detections, file_stats in iter_parsed_files(txt_paths, config["parser"]):
+            result["boxes"] += len(detections)
+            result["lines"] += file_stats["total_lines"]
+        result["output_bytes"] = 0
+    elif stage == "detection_tasks":
+        report_path = os.path.join(config["work_dir"], "parse_report.json")
+        output_path = generate_detection_tasks(
+            annotations_dir,
+            os.path.join(config["work_dir"], "tasks"),
+            output_format=config["output_format"],
+            num_workers=config["num_workers"],
+            parse_report_path=report_path,
+            group_by_image=True,
+            parser=config["parser"]
+        )
+        with open(report_path, 'r', encoding='utf-8') as f:
+            totals = json.load(f)["totals"]
+        result["boxes"] = totals["valid"]
+        result["lines"] = totals["lines"]
+        result["output_bytes"] = path_bytes(output_path)
+    elif stage == "sft_conversion":
+        from converters.to_sft_format import convert_detection_tasks_to_sft_llava_debug, iter_detection_task_records
+        from utils.category_mapping import VISDRONE_CATEGORY_MAPPING
+
+        tasks_path = config["tasks_path"]
+        extension = ".json" if config["output_format"] == "json" else ".jsonl"
+        output_path = os.path.join(config["work_dir"], "sft", "sft_detection_qa" + extension)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Box count of the input, read before the clock starts
+        result["boxes"] = sum(len(record["detections"]) for record in iter_detection_task_records(tasks_path))
+        start = time.perf_counter()
+        convert_detection_tasks_to_sft_llava_debug(
+            tasks_path, output_path, config["images_dir"], category_mapping=dict(VISDRONE_CATEGORY_MAPPING)
+        )
+        result["output_bytes"] = path_bytes(output_path)
+    else:
+        raise ValueError(f"Unknown stage: {stage!r}")
+    result["seconds"] = time.perf_counter() - start
+    result.update(_peak_rss_bytes())
+    return result
+
+
+def _stage_worker(stage: str, config: Dict[str, Any], queue: "multiprocessing.Queue") -> None:
+    try:
+        queue.put(("ok", _run_stage(stage, config)))
+    except Exception as e:  # reported by the parent
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def run_stage_isolated(stage: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_stage_worker, args=(stage, config, queue))
+    process.start()
+    status, payload = queue.get()
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"Stage {stage} failed: {payload}")
+
+    seconds = payload["seconds"]
+    payload["files_per_s"] = payload["files"] / seconds if seconds > 0 else None
+    payload["boxes_per_s"] = payload["boxes"] / seconds if seconds > 0 else None
+    return payload
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the relative change of each compared metric per stage (positive = better)."""
+    print(f"\n=== Compared with {baseline.get('git_commit') or 'baseline'} ({baseline.get('timestamp')}) ===")
+    for stage, metrics in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        changes = []
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            new_value, old_value = metrics.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value / old_value - 1) * (1 if higher_is_better else -1)
+            changes.append(f"{metric} {change:+.1%}")
+        parsers = ""
+        if stage in PARSER_STAGES and old.get("parser") != metrics.get("parser"):
+            parsers = f" [{old.get('parser')} -> {metrics.get('parser')} parser]"
+        print(f"- {stage}{parsers}: {', '.join(changes)}")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Benchmark the VisDrone -> SFT pipeline stages")
+    add_dataset_arguments(arg_parser)
+    arg_parser.add_argument("--work-dir", default=os.path.join("outputs", "benchmarks"),
+                            help="directory for the synthetic dataset and stage outputs")
+    arg_parser.add_argument("--reuse-dataset", action="store_true",
+                            help="reuse the dataset in --work-dir if its settings match instead of regenerating it")
+    arg_parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES, help="stages to run")
+    arg_parser.add_argument("--parser", default="python", choices=("python", "bulk"), help="annotation parser")
+    arg_parser.add_argument("--output-format", default="jsonl", choices=("json", "jsonl", "columnar"),
+                            help="detection task / SFT output format")
+    arg_parser.add_argument("--num-workers", type=int, default=1, help="parser processes (<= 0: one per CPU core)")
+    arg_parser.add_argument("--verbose-logs", action="store_true", help="keep per-line parse warnings on the console")
+    arg_parser.add_argument("--output", default=None, help="result JSON path (default: <work-dir>/benchmark_results.json)")
+    arg_parser.add_argument("--compare", default=None, help="earlier result JSON to compare against")
+    args = arg_parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir)
+    dataset_dir = os.path.join(work_dir, "dataset")
+    settings = {
+        "num_files": args.num_files,
+        "mean_boxes": args.mean_boxes,
+        "distribution": args.distribution,
+        "malformed_rate": args.malformed_rate,
+        "missing_image_rate": args.missing_image_rate,
+        "seed": args.seed,
+    }
+    manifest = load_manifest(dataset_dir) if args.reuse_dataset else None
+    if manifest is None or any(manifest["settings"].get(k) != v for k, v in settings.items()):
+        print(f"Generating synthetic dataset in {dataset_dir} ...")
+        manifest = generate_synthetic_dataset(dataset_dir, **settings)
+
+    config = {
+        "work_dir": work_dir,
+        "annotations_dir": manifest["annotations_dir"],
+        "images_dir": manifest["images_dir"],
+        "parser": args.parser,
+        "output_format": args.output_format,
+        "num_workers": args.num_workers,
+        "quiet": not args.verbose_logs,
+        "tasks_path": os.path.join(
+            work_dir, "tasks",
+            "detection_tasks_columnar" if args.output_format == "columnar" else f"detection_tasks.{args.output_format}"
+        ),
+    }
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "dataset": {**manifest["settings"], "totals": manifest["totals"]},
+        "options": {"parser": args.parser, "output_format": args.output_format, "num_workers": args.num_workers},
+        "stages": {},
+    }
+    for stage in args.stages:
+        if stage == "sft_conversion" and not os.path.exists(config["tasks_path"]):
+            raise SystemExit("sft_conversion needs the output of the detection_tasks stage; run that stage first")
+        print(f"Running stage: {stage}{f' ({args.parser} parser)' if stage in PARSER_STAGES else ''} ...")
+        metrics = run_stage_isolated(stage, config)
+        results["stages"][stage] = metrics
+        print(f"  {metrics['seconds']:.3f} s, {metrics['files_per_s']:.1f} files/s, {metrics['boxes_per_s']:.0f} boxes/s, "
+              f"peak RSS {(metrics['peak_rss_bytes'] or 0) / 2 ** 20:.1f} MiB, output {metrics['output_bytes']} bytes")
+
+    output_path = args.output or os.path.join(work_dir, "benchmark_results.json")
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Benchmark results saved to: {output_path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_results(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
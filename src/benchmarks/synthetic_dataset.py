@@ -0,0 +1,158 @@
+# src/benchmarks/synthetic_dataset.py
+#
+# Synthetic VisDrone-DET dataset generator for benchmarks: annotation files with a configurable
+# box-count distribution and malformed-line rate, plus stub image files carrying only a JPEG header.
+
+import argparse
+import json
+import math
+import os
+import random
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+MANIFEST_FILE = "manifest.json"
+
+# Rough VisDrone2019-DET-train category frequencies (1 pedestrian ... 11 others, 0 ignored regions)
+CATEGORY_WEIGHTS = {0: 3, 1: 22, 2: 8, 3: 3, 4: 38, 5: 7, 6: 4, 7: 2, 8: 1, 9: 2, 10: 9, 11: 1}
+
+# Kinds of malformed lines, chosen uniformly when a line is corrupted
+MALFORMED_LINES = ("", "bad,line", "x,12,30,40,1,4,0,0", "nan,12,30,40,1,4,0,0", "10,12,-30,40,1,4,0,0")
+
+
+def stub_jpeg(width: int, height: int) -> bytes:
+    """Return a minimal JPEG byte string (SOI, baseline SOF0 header, EOI) with the given size."""
+    sof = struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    return b"\xff\xd8" + b"\xff\xc0" + struct.pack(">H", len(sof) + 2) + sof + b"\xff\xd9"
+
+
+def sample_box_count(rng: random.Random, mean_boxes: float, distribution: str) -> int:
+    """Draw a per-image box count; "lognormal" gives the heavy tail of dense VisDrone scenes."""
+    if distribution == "fixed":
+        return int(round(mean_boxes))
+    if distribution == "uniform":
+        return rng.randint(0, int(round(2 * mean_boxes)))
+    if distribution == "poisson":
+        # Normal approximation; exact sampling is not worth it for benchmark data
+        return max(0, int(round(rng.gauss(mean_boxes, math.sqrt(mean_boxes)))))
+    if distribution == "lognormal":
+        sigma = 0.8
+        return int(round(rng.lognormvariate(math.log(max(mean_boxes, 1)) - sigma ** 2 / 2, sigma)))
+    raise ValueError(f"Unknown box count distribution: {distribution!r}")
+
+
+def generate_synthetic_dataset(
+    output_dir: str,
+    num_files: int = 100,
+    mean_boxes: float = 50,
+    distribution: str = "lognormal",
+    malformed_rate: float = 0.01,
+    missing_image_rate: float = 0.0,
+    image_size: Tuple[int, int] = (1360, 765),
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Write `output_dir/annotations/*.txt` and `output_dir/images/*.jpg` and return the manifest
+    (also saved as `manifest.json`) with the generation settings and line / box totals.
+
+    Args:
+        output_dir (str): Dataset root directory.
+        num_files (int): Number of annotation files (= images).
+        mean_boxes (float): Mean number of boxes per image.
+        distribution (str): Box count distribution: "lognormal", "poisson", "uniform" or "fixed".
+        malformed_rate (float): Fraction of lines replaced by a malformed line (empty, too few fields,
+                                non-numeric, NaN or negative size).
+        missing_image_rate (float): Fraction of annotation files without an image file.
+        image_size (Tuple[int, int]): Width and height written into every stub image header.
+        seed (int): Random seed; the same settings always produce the same files.
+
+    Returns:
+        Dict[str, Any]: The manifest.
+    """
+    rng = random.Random(seed)
+    annotations_dir = os.path.join(output_dir, "annotations")
+    images_dir = os.path.join(output_dir, "images")
+    os.makedirs(annotations_dir, exist_ok=True)
+    os.makedirs(images_dir, exist_ok=True)
+
+    categories = list(CATEGORY_WEIGHTS)
+    weights = list(CATEGORY_WEIGHTS.values())
+    width, height = image_size
+    image_bytes = stub_jpeg(width, height)
+    totals = {"lines": 0, "boxes": 0, "malformed_lines": 0, "images": 0, "annotation_bytes": 0}
+
+    for i in range(num_files):
+        name = f"{i:07d}_00000_d_0000001"
+        num_boxes = sample_box_count(rng, mean_boxes, distribution)
+        lines = []
+        for _ in range(num_boxes):
+            if rng.random() < malformed_rate:
+                lines.append(rng.choice(MALFORMED_LINES))
+                totals["malformed_lines"] += 1
+                continue
+            box_w = rng.randint(2, 120)
+            box_h = rng.randint(2, 120)
+            category = rng.choices(categories, weights)[0]
+            lines.append(
+                f"{rng.randint(0, width - box_w)},{rng.randint(0, height - box_h)},{box_w},{box_h},"
+                f"{0 if category == 0 else 1},{category},{rng.randint(0, 1)},{rng.randint(0, 2)}"
+            )
+            totals["boxes"] += 1
+        data = ("\n".join(lines) + "\n") if lines else ""
+        with open(os.path.join(annotations_dir, name + ".txt"), 'w', encoding='utf-8') as f:
+            f.write(data)
+        totals["lines"] += len(lines)
+        totals["annotation_bytes"] += len(data.encode('utf-8'))
+
+        if rng.random() >= missing_image_rate:
+            with open(os.path.join(images_dir, name + ".jpg"), 'wb') as f:
+                f.write(image_bytes)
+            totals["images"] += 1
+
+    manifest = {
+        "settings": {
+            "num_files": num_files,
+            "mean_boxes": mean_boxes,
+            "distribution": distribution,
+            "malformed_rate": malformed_rate,
+            "missing_image_rate": missing_image_rate,
+            "image_size": list(image_size),
+            "seed": seed,
+        },
+        "totals": totals,
+        "annotations_dir": annotations_dir,
+        "images_dir": images_dir,
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_manifest(dataset_dir: str) -> Optional[Dict[str, Any]]:
+    manifest_path = os.path.join(dataset_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--num-files", type=int, default=200, help="number of annotation files / images")
+    parser.add_argument("--mean-boxes", type=float, default=50, help="mean number of boxes per image")
+    parser.add_argument("--distribution", default="lognormal", choices=("lognormal", "poisson", "uniform", "fixed"),
+                        help="box count distribution")
+    parser.add_argument("--malformed-rate", type=float, default=0.01, help="fraction of malformed lines")
+    parser.add_argument("--missing-image-rate", type=float, default=0.0, help="fraction of images left out")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic VisDrone-DET dataset")
+    arg_parser.add_argument("output_dir", help="dataset root (annotations/ and images/ are created inside)")
+    add_dataset_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    result = generate_synthetic_dataset(
+        args.output_dir, args.num_files, args.mean_boxes, args.distribution, args.malformed_rate,
+        args.missing_image_rate, seed=args.seed
+    )
+    print(json.dumps(result["totals"], indent=2))
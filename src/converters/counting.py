@@ -0,0 +1,191 @@
+# src/converters/counting.py
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from converters.to_sft_format import SkipTracker
+from tasks.bulk_parser import arrays_from_detections
+from tasks.trajectory_task import DEFAULT_EXCLUDED_CATEGORIES
+from utils.image_index import ImageIndex
+
+# Names of the grid cells for the common grid sizes, row by row; other sizes use "row r, column c"
+REGION_NAMES = {
+    1: ["whole"],
+    2: ["upper-left", "upper-right", "lower-left", "lower-right"],
+    3: ["upper-left", "upper", "upper-right", "left", "center", "right", "lower-left", "lower", "lower-right"],
+}
+
+
+def region_names(grid_size: int) -> List[str]:
+    if grid_size in REGION_NAMES:
+        return REGION_NAMES[grid_size]
+    return [f"row {row + 1}, column {col + 1}" for row in range(grid_size) for col in range(grid_size)]
+
+
+def box_centers(boxes: np.ndarray, box_format: str = "xywh") -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (x, y) box centers; "xywh" boxes are (left, top, width, height) as in VisDrone files."""
+    if box_format == "xywh":
+        return boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2
+    if box_format == "xyxy":
+        return (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2
+    raise ValueError(f"Unknown box_format: {box_format!r} (expected 'xywh' or 'xyxy')")
+
+
+def count_by_region(
+    boxes: np.ndarray,
+    category_ids: np.ndarray,
+    image_size: Optional[Tuple[float, float]],
+    grid_size: int = 3,
+    box_format: str = "xywh"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Count boxes per category and grid cell in one pass.
+
+    Each box is assigned to the cell holding its center; the (category, cell) pairs are flattened
+    into one integer key and counted with a single `np.bincount`, so the cost is O(boxes) however
+    many questions are asked afterwards. Without `image_size` the extent of the boxes is used.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (sorted unique category ids of shape (K,),
+                                        counts of shape (K, grid_size * grid_size), cells row by row)
+    """
+    cx, cy = box_centers(boxes, box_format)
+    if image_size is None:
+        right = boxes[:, 0] + boxes[:, 2] if box_format == "xywh" else boxes[:, 2]
+        bottom = boxes[:, 1] + boxes[:, 3] if box_format == "xywh" else boxes[:, 3]
+        image_size = (max(float(right.max()), 1.0), max(float(bottom.max()), 1.0))
+    width, height = image_size
+
+    cols = np.clip((cx * grid_size / width).astype(np.int64), 0, grid_size - 1)
+    rows = np.clip((cy * grid_size / height).astype(np.int64), 0, grid_size - 1)
+    categories, category_index = np.unique(category_ids, return_inverse=True)
+    num_cells = grid_size * grid_size
+    keys = category_index * num_cells + rows * grid_size + cols
+    counts = np.bincount(keys, minlength=len(categories) * num_cells).reshape(len(categories), num_cells)
+    return categories, counts
+
+
+def _objects(count: int) -> str:
+    return "object" if count == 1 else "objects"
+
+
+class CountingSFTBuilder:
+    """
+    Task builder for counting and spatial-distribution QA (registered as "counting" in `src/registry.py`).
+
+    One multi-turn conversation is built per image from the (category, grid cell) count matrix:
+    a total per category, the densest (category, region) pairs, one empty region of the most
+    frequent category as a negative example, and the regions occupied by each category.
+    Boxes of `excluded_categories` (VisDrone 0 "ignored regions" and 11 "others" by default) are
+    not objects to count and are dropped before counting.
+    """
+
+    task_type = "counting"
+    # Asks `run_sft_tasks` to read image sizes from the file headers for the region grid
+    needs_image_dimensions = True
+
+    def __init__(
+        self,
+        images_base_dir: str,
+        category_mapping: Optional[Dict[int, str]] = None,
+        image_index: Optional[ImageIndex] = None,
+        grid_size: int = 3,
+        box_format: str = "xywh",
+        max_region_questions: int = 4,
+        include_empty_regions: bool = True,
+        excluded_categories: Sequence[int] = DEFAULT_EXCLUDED_CATEGORIES
+    ):
+        self.images_base_dir = images_base_dir
+        self.category_mapping = dict(category_mapping or {})
+        self.image_index = image_index if image_index is not None else ImageIndex(images_base_dir, read_dimensions=True)
+        self.grid_size = grid_size
+        self.box_format = box_format
+        self.max_region_questions = max_region_questions
+        self.include_empty_regions = include_empty_regions
+        self.excluded_categories = tuple(excluded_categories)
+        self.regions = region_names(grid_size)
+        self.stats = {"total_images": 0, "processed_images": 0, "conversations": 0, "questions": 0}
+        self.skip = SkipTracker()
+
+    def _category_name(self, category_id: int, labels: Dict[int, str]) -> str:
+        return self.category_mapping.get(category_id) or labels.get(category_id, f"class_{category_id}")
+
+    def build(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.stats["total_images"] += 1
+        image_file = record.get("image_file")
+        detections = record.get("detections", [])
+        if not self.image_index.exists(image_file):
+            self.skip.add({"image_file": image_file, "reason": "Image file does not exist"})
+            return []
+
+        boxes, category_ids = arrays_from_detections(detections)
+        valid = np.isfinite(boxes).all(axis=1) & ~np.isin(category_ids, self.excluded_categories)
+        if not valid.any():
+            self.skip.add({"image_file": image_file, "reason": "No valid detections"})
+            return []
+        boxes, category_ids = boxes[valid], category_ids[valid]
+
+        # Normalized records (see `tasks/box_normalization.py`) say how their boxes are stored
+        box_format = record.get("box_format", self.box_format)
+        image_size = self.image_index.dimensions(image_file)
+        if record.get("coordinate_scale"):
+            image_size = (record["coordinate_scale"], record["coordinate_scale"])
+        categories, counts = count_by_region(boxes, category_ids, image_size, self.grid_size, box_format)
+        labels = {det.get("category_id"): det.get("label") for det in detections}
+        names = [self._category_name(category_id, labels) for category_id in categories.tolist()]
+        turns = self._questions(names, counts)
+
+        self.stats["processed_images"] += 1
+        self.stats["conversations"] += 1
+        self.stats["questions"] += len(turns)
+        conversation = []
+        for question, answer in turns:
+            conversation.append({"from": "human", "value": question})
+            conversation.append({"from": "gpt", "value": answer})
+        return [{"image_path": os.path.join(self.images_base_dir, image_file), "conversation": conversation}]
+
+    def _questions(self, names: List[str], counts: np.ndarray) -> List[Tuple[str, str]]:
+        totals = counts.sum(axis=1)
+        # Most frequent category first; the stable sort keeps category id order among ties
+        order = np.argsort(-totals, kind="stable").tolist()
+        turns = []
+
+        for k in order:
+            total = int(totals[k])
+            turns.append((
+                f"How many {names[k]} objects are in the image?",
+                f"There {'is' if total == 1 else 'are'} {total} {names[k]} {_objects(total)} in the image."
+            ))
+
+        if self.grid_size > 1:
+            flat = counts.ravel()
+            densest = np.argsort(-flat, kind="stable")[:self.max_region_questions]
+            for index in densest[flat[densest] > 0].tolist():
+                k, cell = divmod(index, counts.shape[1])
+                count = int(flat[index])
+                turns.append((
+                    f"How many {names[k]} objects are in the {self.regions[cell]} region of the image?",
+                    f"There {'is' if count == 1 else 'are'} {count} {names[k]} {_objects(count)} "
+                    f"in the {self.regions[cell]} region."
+                ))
+
+            if self.include_empty_regions:
+                empty = np.flatnonzero(counts[order[0]] == 0)
+                if len(empty):
+                    turns.append((
+                        f"How many {names[order[0]]} objects are in the {self.regions[empty[0]]} region of the image?",
+                        f"There are no {names[order[0]]} objects in the {self.regions[empty[0]]} region."
+                    ))
+
+            for k in order:
+                occupied = ", ".join(self.regions[cell] for cell in np.flatnonzero(counts[k]).tolist())
+                turns.append((
+                    f"Which regions of the image contain {names[k]} objects?",
+                    f"{names[k].capitalize()} objects appear in the following regions: {occupied}."
+                ))
+        return turns
+
+    def summary(self) -> Dict[str, int]:
+        return {**self.stats, "skipped": self.skip.count}
@@ -0,0 +1,91 @@
+# src/converters/prompt_templates.py
+
+import json
+import string
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# The default detection template; a template file (`template_path`) holds the same keys. Its first
+# question and answer prefix are the ones used without a seed.
+DEFAULT_DETECTION_TEMPLATE = {
+    "task_type": "detection",
+    "questions": [
+        "Does the image contain the following objects? {categories}. If yes, please mark their locations.",
+        "Are there any {categories} in this image? If so, give the location of each one.",
+        "Locate every {categories} in the image and report their bounding boxes.",
+    ],
+    "answer_prefixes": [
+        "Yes, the image contains the following objects: ",
+        "The image contains these objects: ",
+    ],
+    "answer_suffix": ".",
+    "object": "Object {label} (ID: {category_id}), Location: [{x1}, {y1}, {x2}, {y2}]",
+    "object_separator": "；",
+    "category_separator": ", ",
+}
+
+OBJECT_FIELDS = ("label", "category_id", "x1", "y1", "x2", "y2")
+
+
+def _to_positional(template: str, fields: Sequence[str]) -> str:
+    """
+    Rewrite a named format string ("{label} at {x1}") into a positional one ("{0} at {2}"),
+    so rendering is a plain `str.format(*args)` call without building a kwargs dict per box.
+    """
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        parts.append(literal.replace("{", "{{").replace("}", "}}"))
+        if field is None:
+            continue
+        if field not in fields:
+            raise ValueError(f"Unknown template field {{{field}}}; expected one of {', '.join(fields)}")
+        parts.append("{" + str(fields.index(field)) + (f"!{conversion}" if conversion else "")
+                     + (f":{spec}" if spec else "") + "}")
+    return "".join(parts)
+
+
+class DetectionTemplate:
+    """
+    A detection QA template compiled once into bound `str.format` callables.
+
+    - `format_object(label, category_id, x1, y1, x2, y2)` renders one box; the converter keeps the
+      resulting strings and builds the answer with a single join.
+    - Question and answer-prefix variants are picked per conversation from `seed` and a stable
+      per-conversation key, so the choice is reproducible and independent of processing order
+      (serial, sharded or cached runs agree). Without a seed the first variant is always used.
+    """
+
+    def __init__(self, spec: Dict[str, Any], seed: Optional[int] = None):
+        self.spec = spec
+        self.seed = seed
+        self.questions = [_to_positional(q, ("categories",)).format for q in spec["questions"]]
+        self.answer_prefixes = list(spec["answer_prefixes"])
+        self.answer_suffix = spec.get("answer_suffix", "")
+        self.format_object = _to_positional(spec["object"], OBJECT_FIELDS).format
+        self.object_separator = spec.get("object_separator", "; ")
+        self.category_separator = spec.get("category_separator", ", ")
+
+    def _pick(self, count: int, key: str, salt: str) -> int:
+        if self.seed is None or count == 1:
+            return 0
+        return zlib.crc32(f"{self.seed}:{salt}:{key}".encode('utf-8')) % count
+
+    def render(self, labels: List[str], object_texts: List[str], key: str = "") -> Tuple[str, str]:
+        """Return (human question, gpt answer) for one conversation."""
+        # Ordered by first appearance (a set would be ordered by the per-process string hash)
+        categories = self.category_separator.join(dict.fromkeys(labels))
+        question = self.questions[self._pick(len(self.questions), key, "q")](categories)
+        prefix = self.answer_prefixes[self._pick(len(self.answer_prefixes), key, "a")]
+        return question, prefix + self.object_separator.join(object_texts) + self.answer_suffix
+
+
+def load_detection_template(template_path: Optional[str] = None, seed: Optional[int] = None) -> DetectionTemplate:
+    """
+    Load and compile a detection template JSON file, or the built-in `DEFAULT_DETECTION_TEMPLATE`
+    when no `template_path` is given.
+    """
+    if template_path is None:
+        return DetectionTemplate(DEFAULT_DETECTION_TEMPLATE, seed)
+    with open(template_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    return DetectionTemplate(spec, seed)
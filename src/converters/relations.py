@@ -0,0 +1,133 @@
+# src/converters/relations.py
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from converters.to_sft_format import SkipTracker
+from tasks.bulk_parser import arrays_from_detections
+from tasks.trajectory_task import DEFAULT_EXCLUDED_CATEGORIES
+from utils.image_index import ImageIndex
+from utils.spatial_index import GridIndex, to_xyxy
+
+
+class RelationSFTBuilder:
+    """
+    Task builder for relational and region QA (registered as "relation" in `src/registry.py`).
+
+    A `GridIndex` is built once per image and a few anchor objects are picked: objects whose
+    category occurs only once ("the bus") first, then the largest boxes. For each anchor the
+    conversation asks what is next to it (k nearest neighbours), what overlaps it (IoU query)
+    and which objects lie in the region around it (region query). Boxes of `excluded_categories`
+    (VisDrone 0 "ignored regions" and 11 "others" by default) are left out of the index, so they
+    are neither anchors nor answers.
+    """
+
+    task_type = "relation"
+
+    def __init__(
+        self,
+        images_base_dir: str,
+        category_mapping: Optional[Dict[int, str]] = None,
+        image_index: Optional[ImageIndex] = None,
+        box_format: str = "xywh",
+        max_anchors: int = 3,
+        num_neighbours: int = 3,
+        region_scale: float = 3.0,
+        excluded_categories: Sequence[int] = DEFAULT_EXCLUDED_CATEGORIES
+    ):
+        self.images_base_dir = images_base_dir
+        self.category_mapping = dict(category_mapping or {})
+        self.image_index = image_index if image_index is not None else ImageIndex(images_base_dir)
+        self.box_format = box_format
+        self.max_anchors = max_anchors
+        self.num_neighbours = num_neighbours
+        # The region question covers the anchor box scaled by this factor around its center
+        self.region_scale = region_scale
+        self.excluded_categories = tuple(excluded_categories)
+        self.stats = {"total_images": 0, "processed_images": 0, "conversations": 0}
+        self.skip = SkipTracker()
+
+    def build(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.stats["total_images"] += 1
+        image_file = record.get("image_file")
+        detections = record.get("detections", [])
+        if not self.image_index.exists(image_file):
+            self.skip.add({"image_file": image_file, "reason": "Image file does not exist"})
+            return []
+
+        raw_boxes, category_ids = arrays_from_detections(detections)
+        valid = np.isfinite(raw_boxes).all(axis=1) & ~np.isin(category_ids, self.excluded_categories)
+        if valid.sum() < 2:
+            self.skip.add({"image_file": image_file, "reason": "Fewer than two valid detections"})
+            return []
+        raw_boxes, category_ids = raw_boxes[valid], category_ids[valid]
+        labels = {det.get("category_id"): det.get("label") for det in detections}
+        names = [self.category_mapping.get(cid) or labels.get(cid, f"class_{cid}") for cid in category_ids.tolist()]
+
+        # Normalized records (see `tasks/box_normalization.py`) say how their boxes are stored
+        index = GridIndex(to_xyxy(raw_boxes, record.get("box_format", self.box_format)))
+        anchors, unique = self._pick_anchors(index, category_ids)
+
+        # Objects are described in (x1, y1, x2, y2) like the regions, whatever the record's box format
+        def describe(i: int) -> str:
+            return f"{names[i]} at [{', '.join(f'{v:g}' for v in index.boxes[i].tolist())}]"
+
+        def refer(i: int) -> str:
+            return f"the {names[i]}" if unique[i] else f"the {describe(i)}"
+
+        turns = []
+        for i in anchors:
+            turns.extend(self._anchor_questions(index, i, names, describe, refer))
+
+        self.stats["processed_images"] += 1
+        self.stats["conversations"] += 1
+        conversation = []
+        for question, answer in turns:
+            conversation.append({"from": "human", "value": question})
+            conversation.append({"from": "gpt", "value": answer})
+        return [{"image_path": os.path.join(self.images_base_dir, image_file), "conversation": conversation}]
+
+    def _pick_anchors(self, index: GridIndex, category_ids: np.ndarray) -> Tuple[List[int], np.ndarray]:
+        _, inverse, counts = np.unique(category_ids, return_inverse=True, return_counts=True)
+        unique = counts[inverse] == 1
+        boxes = index.boxes
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        # Unambiguous objects first, then by decreasing area; lexsort sorts by the last key first
+        order = np.lexsort((-areas, ~unique))
+        return order[:self.max_anchors].tolist(), unique
+
+    def _anchor_questions(self, index: GridIndex, i: int, names: List[str], describe, refer) -> List[Tuple[str, str]]:
+        turns = []
+        neighbour_ids, _ = index.neighbours(i, self.num_neighbours)
+        turns.append((
+            f"What is next to {refer(i)}?",
+            "The nearest objects are: " + "; ".join(describe(j) for j in neighbour_ids.tolist()) + "."
+        ))
+
+        overlap_ids, ious = index.overlapping(i)
+        if len(overlap_ids):
+            answer = "; ".join(f"{describe(j)} (IoU {iou:.2f})" for j, iou in zip(overlap_ids.tolist(), ious.tolist()))
+            turns.append((f"Which objects overlap {refer(i)}?", answer + "."))
+        else:
+            turns.append((f"Which objects overlap {refer(i)}?", f"No objects overlap {refer(i)}."))
+
+        center = index.centers[i]
+        half = (index.boxes[i, 2:] - index.boxes[i, :2]) * self.region_scale / 2
+        region = np.concatenate([center - half, center + half])
+        inside = index.query_region(region, mode="center")
+        inside = inside[inside != i]
+        region_text = ", ".join(f"{v:.0f}" for v in region.tolist())
+        if len(inside):
+            counts: Dict[str, int] = {}
+            for j in inside.tolist():
+                counts[names[j]] = counts.get(names[j], 0) + 1
+            answer = "; ".join(f"{count} {name}" for name, count in counts.items())
+            turns.append((f"Which other objects are inside the region [{region_text}]?", answer + "."))
+        else:
+            turns.append((f"Which other objects are inside the region [{region_text}]?", "There are no other objects in that region."))
+        return turns
+
+    def summary(self) -> Dict[str, int]:
+        return {**self.stats, "skipped": self.skip.count}
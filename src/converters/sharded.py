@@ -0,0 +1,168 @@
+# src/converters/sharded.py
+
+import json
+import os
+import shutil
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+
+from converters.prompt_templates import load_detection_template
+from converters.to_sft_format import SkipTracker, iter_detection_task_records, iter_sft_records
+from utils.image_id import stable_image_id
+from utils.image_index import ImageIndex
+from utils.instrumentation import Instrumentation
+from utils.compressed_io import with_compression_suffix
+from utils.jsonl_utils import dumps_compact, iter_jsonl_records, write_jsonl_records
+from utils.parallel import ordered_parallel_map
+
+SHARD_INDEX_FILE = "sft_index.json"
+PARTITIONS_DIR = "_partitions"
+
+
+def shard_file_name(shard: int, num_shards: int, compression: Optional[str] = None) -> str:
+    return with_compression_suffix(f"sft-{shard:05d}-of-{num_shards:05d}.jsonl", compression)
+
+
+def _partition_tasks(detection_tasks_path: str, partitions_dir: str, num_shards: int) -> None:
+    """Stream task records into one JSONL file per shard; all records of an image land in the same shard."""
+    os.makedirs(partitions_dir, exist_ok=True)
+    handles = [
+        open(os.path.join(partitions_dir, f"tasks-{shard:05d}.jsonl"), 'w', encoding='utf-8')
+        for shard in range(num_shards)
+    ]
+    try:
+        for record in iter_detection_task_records(detection_tasks_path):
+            shard = stable_image_id(record["image_file"]) % num_shards
+            handles[shard].write(dumps_compact(record))
+            handles[shard].write("\n")
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def _convert_shard(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert one partition file into one SFT shard file (runs in a worker process)."""
+    stats = {"total_images": 0, "processed_images": 0, "conversations": 0}
+    skip = SkipTracker()
+    image_index = ImageIndex(job["images_base_dir"], job["image_index_path"])
+    sft_records = iter_sft_records(
+        iter_jsonl_records(job["partition_path"]),
+        job["images_base_dir"],
+        dict(job["category_mapping"]),
+        stats,
+        skip,
+        job["max_objects_per_conversation"],
+        image_index=image_index,
+        template=load_detection_template(job["template_path"], job["seed"])
+    )
+    records = write_jsonl_records(sft_records, job["output_path"], job["compression_level"])
+    return {
+        "file": os.path.basename(job["output_path"]),
+        "records": records,
+        "tasks": stats["processed_images"],
+        "bytes": os.path.getsize(job["output_path"]),
+        "total_images": stats["total_images"],
+        "skipped": skip.count,
+    }
+
+
+def convert_detection_tasks_to_sft_sharded(
+    detection_tasks_path: str,
+    output_dir: str,
+    images_base_dir: str,
+    category_mapping: Dict[int, str] = None,
+    num_shards: int = 64,
+    num_workers: Optional[int] = None,
+    max_objects_per_conversation: Optional[int] = None,
+    image_index_path: Optional[str] = None,
+    template_path: Optional[str] = None,
+    seed: Optional[int] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None
+) -> str:
+    """
+    Convert detection tasks into SFT QA pairs written as numbered JSONL shards.
+
+    Task records are first partitioned by `stable_image_id(image_file) % num_shards`, so every image
+    lives in exactly one shard and the assignment is the same on every run. Shards are then
+    converted in a process pool and written to `sft-00000-of-00064.jsonl` etc. An index file
+    (`sft_index.json`) lists every shard with its record count, task record count and size in bytes.
+
+    Args:
+        detection_tasks_path (str): Task file or directory accepted by `iter_detection_task_records`.
+        output_dir (str): Directory receiving the shard files and the index.
+        images_base_dir (str): Directory containing the images.
+        category_mapping (Dict[int, str]): Category ID to name mapping.
+        num_shards (int): Number of output shards.
+        num_workers (Optional[int]): Number of conversion processes; None or <= 0 uses all CPU cores.
+        max_objects_per_conversation (Optional[int]): See `convert_detection_tasks_to_sft_llava_debug`.
+        image_index_path (Optional[str]): Where the shared image index is persisted; defaults to a
+                                          temporary file next to the partitions.
+        template_path (Optional[str]): QA template file; see `converters/prompt_templates.py`.
+        seed (Optional[int]): Seed for picking question/answer variants.
+        instrumentation (Optional[Instrumentation]): Records the "sft_sharded" stage, advanced once per
+                                                     finished shard (see `utils/instrumentation.py`).
+        compression (Optional[str]): "gzip" or "zstd" compresses every shard on the fly
+                                     (`sft-00000-of-00064.jsonl.gz` / `.zst`); the index lists compressed sizes.
+        compression_level (Optional[int]): Compression level; None uses the codec default.
+
+    Returns:
+        str: Path of the shard index file.
+    """
+    if category_mapping is None:
+        category_mapping = {}
+
+    os.makedirs(output_dir, exist_ok=True)
+    partitions_dir = os.path.join(output_dir, PARTITIONS_DIR)
+    if image_index_path is None:
+        image_index_path = os.path.join(partitions_dir, "image_index.json")
+
+    _partition_tasks(detection_tasks_path, partitions_dir, num_shards)
+    # Build (or refresh) the image index once; every worker then loads it instead of rescanning
+    ImageIndex(images_base_dir, image_index_path)
+
+    jobs = [
+        {
+            "partition_path": os.path.join(partitions_dir, f"tasks-{shard:05d}.jsonl"),
+            "output_path": os.path.join(output_dir, shard_file_name(shard, num_shards, compression)),
+            "images_base_dir": images_base_dir,
+            "image_index_path": image_index_path,
+            "category_mapping": category_mapping,
+            "max_objects_per_conversation": max_objects_per_conversation,
+            "template_path": template_path,
+            "seed": seed,
+            "compression_level": compression_level,
+        }
+        for shard in range(num_shards)
+    ]
+    stage = instrumentation.stage("sft_sharded", total=num_shards, unit="shards") if instrumentation is not None else nullcontext()
+    with stage as progress:
+        shards = []
+        for shard in ordered_parallel_map(_convert_shard, jobs, num_workers, chunksize=1):
+            shards.append(shard)
+            if progress is not None:
+                progress.advance(records_written=shard["records"], bytes_written=shard["bytes"])
+    shutil.rmtree(partitions_dir, ignore_errors=True)
+
+    index = {
+        "num_shards": num_shards,
+        "total_records": sum(shard["records"] for shard in shards),
+        "total_tasks": sum(shard["tasks"] for shard in shards),
+        "total_bytes": sum(shard["bytes"] for shard in shards),
+        "shards": [
+            {key: shard[key] for key in ("file", "records", "tasks", "bytes")}
+            for shard in shards
+        ],
+    }
+    index_path = os.path.join(output_dir, SHARD_INDEX_FILE)
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+    print("\n=== Sharded Processing Summary ===")
+    print(f"Total images: {sum(shard['total_images'] for shard in shards)}")
+    print(f"Successfully processed: {index['total_tasks']}")
+    print(f"Conversations written: {index['total_records']} in {num_shards} shards")
+    print(f"Skipped: {sum(shard['skipped'] for shard in shards)}")
+    print(f"\n✅ SFT shards saved to: {output_dir} (index: {index_path})")
+    return index_path
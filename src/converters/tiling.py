@@ -0,0 +1,221 @@
+# src/converters/tiling.py
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from converters.prompt_templates import load_detection_template
+from converters.to_sft_format import SkipTracker
+from tasks.bulk_parser import arrays_from_detections
+from utils.image_index import ImageIndex
+from utils.spatial_index import to_xyxy
+
+
+def tile_grid(width: int, height: int, tile_size: int = 640, overlap: float = 0.2) -> np.ndarray:
+    """
+    Return overlapping (x1, y1, x2, y2) tiles covering a `width` x `height` image, row by row.
+
+    Tiles are `tile_size` square with a stride of `tile_size * (1 - overlap)`; the last tile of a
+    row / column is aligned to the image edge instead of running past it. An image smaller than
+    `tile_size` along an axis gets a single tile spanning that axis.
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError(f"overlap must be in [0, 1), got {overlap}")
+
+    def starts(length: int) -> np.ndarray:
+        if length <= tile_size:
+            return np.zeros(1, dtype=np.int64)
+        stride = max(1, int(tile_size * (1 - overlap)))
+        positions = np.arange(0, length - tile_size, stride)
+        return np.append(positions, length - tile_size)
+
+    xs, ys = starts(width), starts(height)
+    x1, y1 = np.meshgrid(xs, ys)
+    x1, y1 = x1.ravel(), y1.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, width), np.minimum(y1 + tile_size, height)], axis=1)
+
+
+def assign_boxes_to_tiles(
+    boxes: np.ndarray,
+    tiles: np.ndarray,
+    min_visibility: float = 0.5
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Assign (x1, y1, x2, y2) boxes to tiles with one broadcast (tiles x boxes) intersection test.
+
+    A box belongs to every tile holding at least `min_visibility` of its area, so objects cut
+    by a tile border are kept in the tile that shows most of them and dropped from slivers.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (tile index, box index, box clipped to the tile in
+                                                    tile-relative coordinates of shape (M, 4)),
+                                                    ordered by tile, then box
+    """
+    ix1 = np.maximum(tiles[:, None, 0], boxes[None, :, 0])
+    iy1 = np.maximum(tiles[:, None, 1], boxes[None, :, 1])
+    ix2 = np.minimum(tiles[:, None, 2], boxes[None, :, 2])
+    iy2 = np.minimum(tiles[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    # Zero-area boxes count as visible when they lie inside the tile
+    keep = (inter >= min_visibility * area[None, :]) & (ix2 >= ix1) & (iy2 >= iy1)
+
+    tile_idx, box_idx = np.nonzero(keep)
+    origin = tiles[tile_idx, :2]
+    clipped = np.stack([ix1[keep], iy1[keep], ix2[keep], iy2[keep]], axis=1) - np.tile(origin, 2)
+    return tile_idx, box_idx, clipped
+
+
+class TileCropCache:
+    """
+    On-disk cache of tile crops, so each source image is decoded at most once over all runs.
+
+    `paths()` returns the crop file names of an image's tiles and writes only the missing ones,
+    decoding the source image once for all of them; existing crops are found through a listing
+    of `crop_dir` taken at start-up, without a `stat` per crop. Requires Pillow.
+    """
+
+    def __init__(self, crop_dir: str, quality: int = 95):
+        self.crop_dir = crop_dir
+        self.quality = quality
+        os.makedirs(crop_dir, exist_ok=True)
+        self.existing = set(os.listdir(crop_dir))
+        self.written = 0
+
+    @staticmethod
+    def crop_name(image_file: str, tile: Sequence[int]) -> str:
+        stem, extension = os.path.splitext(image_file)
+        return f"{stem}_{'_'.join(str(int(v)) for v in tile)}{extension or '.jpg'}"
+
+    def paths(self, image_path: str, image_file: str, tiles: np.ndarray) -> List[str]:
+        names = [self.crop_name(image_file, tile) for tile in tiles.tolist()]
+        missing = [i for i, name in enumerate(names) if name not in self.existing]
+        if missing:
+            try:
+                from PIL import Image  # optional; only needed when crops are written
+            except ImportError:
+                raise ImportError("Writing tile crops requires Pillow (pip install Pillow); leave crop_dir unset "
+                                  "to reference the full image with a tile box instead")
+            with Image.open(image_path) as image:
+                image.load()
+                for i in missing:
+                    crop = image.crop(tuple(int(v) for v in tiles[i].tolist()))
+                    crop.save(os.path.join(self.crop_dir, names[i]), quality=self.quality)
+                    self.existing.add(names[i])
+                    self.written += 1
+        return [os.path.join(self.crop_dir, name) for name in names]
+
+
+class TilingSFTBuilder:
+    """
+    Task builder for tiled detection QA on high-resolution frames (registered as "tiling" in `src/registry.py`).
+
+    Each image is split into overlapping tiles (`tile_grid`), boxes are assigned to tiles with a
+    vectorized intersection test (`assign_boxes_to_tiles`) and one detection conversation is built
+    per non-empty tile, with coordinates relative to the tile's top-left corner. Every record carries
+    `"tile": [x1, y1, x2, y2]` in source image pixels.
+
+    Without `crop_dir` the records reference the full image and the tile box is applied when the
+    image is loaded for training. With `crop_dir` the tile crops are written once into that
+    directory (`TileCropCache`, requires Pillow) and the records reference the crops.
+    """
+
+    task_type = "tiling"
+    # Asks `run_sft_tasks` to read image sizes from the file headers for the tile grid
+    needs_image_dimensions = True
+
+    def __init__(
+        self,
+        images_base_dir: str,
+        category_mapping: Optional[Dict[int, str]] = None,
+        image_index: Optional[ImageIndex] = None,
+        tile_size: int = 640,
+        overlap: float = 0.2,
+        min_visibility: float = 0.5,
+        box_format: str = "xywh",
+        crop_dir: Optional[str] = None,
+        crop_quality: int = 95,
+        template_path: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        self.images_base_dir = images_base_dir
+        self.category_mapping = dict(category_mapping or {})
+        self.image_index = image_index if image_index is not None else ImageIndex(images_base_dir, read_dimensions=True)
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.min_visibility = min_visibility
+        self.box_format = box_format
+        self.crops = TileCropCache(crop_dir, crop_quality) if crop_dir else None
+        self.template = load_detection_template(template_path, seed)
+        self.stats = {"total_images": 0, "processed_images": 0, "conversations": 0, "tiles": 0}
+        self.skip = SkipTracker()
+
+    def build(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.stats["total_images"] += 1
+        image_file = record.get("image_file")
+        detections = record.get("detections", [])
+        if not self.image_index.exists(image_file):
+            self.skip.add({"image_file": image_file, "reason": "Image file does not exist"})
+            return []
+        image_size = self.image_index.dimensions(image_file)
+        if image_size is None:
+            self.skip.add({"image_file": image_file, "reason": "Unknown image size"})
+            return []
+
+        raw_boxes, category_ids = arrays_from_detections(detections)
+        valid = np.isfinite(raw_boxes).all(axis=1)
+        if not valid.any():
+            self.skip.add({"image_file": image_file, "reason": "No valid detections"})
+            return []
+        raw_boxes, category_ids = raw_boxes[valid], category_ids[valid]
+
+        # Normalized records (see `tasks/box_normalization.py`) say how their boxes are stored
+        boxes = to_xyxy(raw_boxes, record.get("box_format", self.box_format))
+        if record.get("coordinate_scale"):
+            boxes = boxes * np.array(image_size * 2, dtype=np.float64) / record["coordinate_scale"]
+
+        tiles = tile_grid(image_size[0], image_size[1], self.tile_size, self.overlap)
+        tile_idx, box_idx, clipped = assign_boxes_to_tiles(boxes, tiles, self.min_visibility)
+        self.stats["tiles"] += len(tiles)
+        if not len(tile_idx):
+            self.skip.add({"image_file": image_file, "reason": "No box visible in any tile"})
+            return []
+
+        image_path = os.path.join(self.images_base_dir, image_file)
+        labels = {det.get("category_id"): det.get("label") for det in detections}
+        # Boundaries of the runs of equal tile index (the assignment is ordered by tile)
+        occupied, starts = np.unique(tile_idx, return_index=True)
+        ends = np.append(starts[1:], len(tile_idx))
+        crop_paths = self.crops.paths(image_path, image_file, tiles[occupied]) if self.crops is not None else None
+
+        clipped = np.round(clipped, 1).tolist()
+        box_categories = category_ids[box_idx].tolist()
+        format_object = self.template.format_object
+        sft_records = []
+        for n, (tile, start, end) in enumerate(zip(occupied.tolist(), starts.tolist(), ends.tolist())):
+            names, object_texts = [], []
+            for j in range(start, end):
+                category_id = box_categories[j]
+                name = self.category_mapping.get(category_id) or labels.get(category_id, f"class_{category_id}")
+                names.append(name)
+                object_texts.append(format_object(name, category_id, *clipped[j]))
+            question, answer = self.template.render(names, object_texts, f"{image_file}#tile{tile}")
+            sft_records.append({
+                "image_path": crop_paths[n] if crop_paths is not None else image_path,
+                "tile": tiles[tile].tolist(),
+                "conversation": [
+                    {"from": "human", "value": question},
+                    {"from": "gpt", "value": answer}
+                ]
+            })
+
+        self.stats["processed_images"] += 1
+        self.stats["conversations"] += len(sft_records)
+        return sft_records
+
+    def summary(self) -> Dict[str, int]:
+        summary = {**self.stats, "skipped": self.skip.count}
+        if self.crops is not None:
+            summary["crops_written"] = self.crops.written
+        return summary
@@ -1,112 +1,486 @@
 # src/sft_converter.py
 
-import json
 import os
-from typing import List, Dict, Any
+from contextlib import nullcontext
+from itertools import groupby
+from typing import TYPE_CHECKING, List, Dict, Any, Callable, Iterable, Iterator, Optional, Union
 
-def convert_detection_tasks_to_sft_llava_debug(
-    detection_tasks_json_path: str,
-    output_sft_json_path: str,
-    images_base_dir: str,
-    category_mapping: Dict[int, str] = None
-) -> None:
-    if category_mapping is None:
-        category_mapping = {}
+from converters.prompt_templates import DetectionTemplate, load_detection_template
+from utils.cache import ConversionCache, fingerprint_key, record_key, settings_key
+from utils.image_index import ImageIndex
+from utils.instrumentation import Instrumentation, StageMetrics, path_bytes
+from utils.jsonl_utils import is_jsonl_path, iter_jsonl_records, load_json, write_json_array_records, write_jsonl_records
 
-    with open(detection_tasks_json_path, 'r', encoding='utf-8') as f:
-        tasks_data = json.load(f)
+if TYPE_CHECKING:
+    from tasks.columnar import ColumnarTasks
 
-    sft_records = []
-    skipped_detections = []
-    total_images = 0
-    processed_images = 0
+# Number of skipped records kept in memory for the summary printout
+MAX_SKIPPED_EXAMPLES = 10
 
-    for record in tasks_data:
-        image_id = record.get("image_id")
-        image_file = record.get("image_file")
-        detections = record.get("detections", [])
 
-        total_images += 1
+def iter_detection_task_records(detection_tasks_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield detection task records from a `.json` array, a `.jsonl` file or a columnar task directory.
+    `.jsonl` files are read lazily, one record at a time; columnar directories are memory-mapped.
+    `.gz` / `.zst` compressed files are decompressed on the fly.
+    """
+    if os.path.isdir(detection_tasks_path):
+        from tasks.columnar import ColumnarTasks  # requires NumPy, only imported when used
 
-        image_path = os.path.join(images_base_dir, image_file)
-        if not os.path.exists(image_path):
-            skipped_detections.append({
-                "image_file": image_file,
-                "reason": "Image file does not exist",
-                "detections_skipped": len(detections)
-            })
-            continue
+        yield from ColumnarTasks(detection_tasks_path).iter_task_records()
+    elif is_jsonl_path(detection_tasks_path):
+        yield from iter_jsonl_records(detection_tasks_path)
+    else:
+        yield from load_json(detection_tasks_path)
 
-        valid_detections = []
-        for idx, det in enumerate(detections):
-            x1 = det.get("x1")
-            y1 = det.get("y1")
-            x2 = det.get("x2")
-            y2 = det.get("y2")
-            label = det.get("label", "unknown")
-            category_id = det.get("category_id", -1)
-
-            if None in [x1, y1, x2, y2]:
-                skipped_detections.append({
-                    "image_file": image_file,
-                    "detection_idx": idx,
-                    "reason": "Coordinates contain None values",
-                    "category_id": category_id,
-                    "label": label
-                })
-                continue
 
-            if category_id not in category_mapping:
-                category_mapping[category_id] = label
-            mapped_name = category_mapping.get(category_id, "unknown")
+class SkipTracker:
+    """Counts skipped records while keeping only the first few for the summary."""
 
-            valid_detections.append({
-                "x1": x1, "y1": y1, "x2": x2, "y2": y2,
-                "label": mapped_name, "category_id": category_id
-            })
+    def __init__(self, max_examples: int = MAX_SKIPPED_EXAMPLES):
+        self.count = 0
+        self.examples: List[Dict[str, Any]] = []
+        self.max_examples = max_examples
+
+    def add(self, item: Dict[str, Any]) -> None:
+        self.count += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append(item)
+
+
+def _build_sft_record(
+    image_path: str,
+    labels: List[str],
+    object_texts: List[str],
+    template: DetectionTemplate,
+    key: str
+) -> Dict[str, Any]:
+    human_question, gpt_answer = template.render(labels, object_texts, key)
+    return {
+        "image_path": image_path,
+        "conversation": [
+            {"from": "human", "value": human_question},
+            {"from": "gpt", "value": gpt_answer}
+        ]
+    }
+
+
+def _convert_task_record(
+    record: Dict[str, Any],
+    images_base_dir: str,
+    category_mapping: Dict[int, str],
+    skip: SkipTracker,
+    max_objects_per_conversation: Optional[int] = None,
+    image_index: Optional[ImageIndex] = None,
+    template: Optional[DetectionTemplate] = None
+) -> List[Dict[str, Any]]:
+    """
+    Convert one task record into SFT records. A per-image record with more valid detections than
+    `max_objects_per_conversation` is split into several conversations of at most that many objects.
+    """
+    if template is None:
+        template = load_detection_template()
+    image_file = record.get("image_file")
+    detections = record.get("detections", [])
 
-        if not valid_detections:
-            skipped_detections.append({
+    image_path = os.path.join(images_base_dir, image_file)
+    image_exists = image_index.exists(image_file) if image_index is not None else os.path.exists(image_path)
+    if not image_exists:
+        skip.add({
+            "image_file": image_file,
+            "reason": "Image file does not exist",
+            "detections_skipped": len(detections)
+        })
+        return []
+
+    # Each valid box is rendered straight to its answer string; no intermediate dict per box
+    format_object = template.format_object
+    labels = []
+    object_texts = []
+    for idx, det in enumerate(detections):
+        x1 = det.get("x1")
+        y1 = det.get("y1")
+        x2 = det.get("x2")
+        y2 = det.get("y2")
+        label = det.get("label", "unknown")
+        category_id = det.get("category_id", -1)
+
+        if None in [x1, y1, x2, y2]:
+            skip.add({
                 "image_file": image_file,
-                "reason": "No valid detections",
-                "detections_skipped": len(detections)
+                "detection_idx": idx,
+                "reason": "Coordinates contain None values",
+                "category_id": category_id,
+                "label": label
             })
             continue
 
-        detected_categories = {det["label"] for det in valid_detections}
-        human_question = f"Does the image contain the following objects? {', '.join(detected_categories)}. If yes, please mark their locations."
-        detections_text = []
-        for det in valid_detections:
-            x1, y1, x2, y2 = det["x1"], det["y1"], det["x2"], det["y2"]
-            label = det["label"]
-            category_id = det["category_id"]
-            detections_text.append(f"Object {label} (ID: {category_id}), Location: [{x1}, {y1}, {x2}, {y2}]")
-        gpt_answer = "Yes, the image contains the following objects: " + "；".join(detections_text) + "."
-
-        sft_records.append({
-            "image_path": image_path,
-            "conversation": [
-                {"from": "human", "value": human_question},
-                {"from": "gpt", "value": gpt_answer}
-            ]
+        if category_id not in category_mapping:
+            category_mapping[category_id] = label
+        mapped_name = category_mapping.get(category_id, "unknown")
+
+        labels.append(mapped_name)
+        object_texts.append(format_object(mapped_name, category_id, x1, y1, x2, y2))
+
+    if not object_texts:
+        skip.add({
+            "image_file": image_file,
+            "reason": "No valid detections",
+            "detections_skipped": len(detections)
         })
-        processed_images += 1
+        return []
+    return _split_conversations(image_path, image_file, labels, object_texts, template, max_objects_per_conversation)
+
+
+def _split_conversations(
+    image_path: str,
+    image_file: str,
+    labels: List[str],
+    object_texts: List[str],
+    template: DetectionTemplate,
+    max_objects_per_conversation: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    if not max_objects_per_conversation or len(object_texts) <= max_objects_per_conversation:
+        return [_build_sft_record(image_path, labels, object_texts, template, image_file)]
+    return [
+        _build_sft_record(
+            image_path,
+            labels[start:start + max_objects_per_conversation],
+            object_texts[start:start + max_objects_per_conversation],
+            template,
+            f"{image_file}#{start}"
+        )
+        for start in range(0, len(object_texts), max_objects_per_conversation)
+    ]
+
+
+def _convert_columnar_image(
+    image_file: str,
+    boxes: List[List[float]],
+    category_ids: List[int],
+    images_base_dir: str,
+    category_mapping: Dict[int, str],
+    skip: SkipTracker,
+    max_objects_per_conversation: Optional[int],
+    image_index: ImageIndex,
+    template: DetectionTemplate
+) -> List[Dict[str, Any]]:
+    """
+    `_convert_task_record` for one image of a columnar task directory: answer strings are formatted
+    straight from the image's box and category id columns, without a detection dict per box.
+    Columnar boxes always have all four coordinates, and their label is `class_<category_id>`.
+    """
+    if not image_index.exists(image_file):
+        skip.add({
+            "image_file": image_file,
+            "reason": "Image file does not exist",
+            "detections_skipped": len(category_ids)
+        })
+        return []
+
+    format_object = template.format_object
+    labels = []
+    object_texts = []
+    for (x1, y1, x2, y2), category_id in zip(boxes, category_ids):
+        if category_id not in category_mapping:
+            category_mapping[category_id] = f"class_{category_id}"
+        mapped_name = category_mapping[category_id]
+        labels.append(mapped_name)
+        object_texts.append(format_object(mapped_name, category_id, x1, y1, x2, y2))
+
+    if not object_texts:
+        skip.add({"image_file": image_file, "reason": "No valid detections", "detections_skipped": 0})
+        return []
+    return _split_conversations(
+        os.path.join(images_base_dir, image_file), image_file, labels, object_texts, template, max_objects_per_conversation
+    )
+
+
+def _add_categories(record: Dict[str, Any], category_mapping: Dict[int, str]) -> None:
+    """Fill `category_mapping` from a record as `_convert_task_record` would, for records served from the cache."""
+    for det in record.get("detections", []):
+        category_id = det.get("category_id", -1)
+        if category_id not in category_mapping and None not in (det.get("x1"), det.get("y1"), det.get("x2"), det.get("y2")):
+            category_mapping[category_id] = det.get("label", "unknown")
+
+
+def _sft_cache_key(
+    fingerprints: Dict[str, str],
+    image_file: str,
+    num_records: int,
+    num_detections: int,
+    records: Union[List[Dict[str, Any]], Callable[[], List[Dict[str, Any]]]],
+    cache_settings: str
+) -> str:
+    """
+    SFT cache key of the task records of one image: the fingerprint of its annotation file, or a
+    content hash of `records` (called first if it is a function) for files unknown to the cache.
+    """
+    fingerprint = fingerprints.get(os.path.splitext(str(image_file))[0] + ".txt")
+    if fingerprint is not None:
+        return fingerprint_key(f"{image_file}/{num_records}/{num_detections}", fingerprint, cache_settings)
+    return record_key(records() if callable(records) else records, cache_settings)
+
+
+def iter_sft_records(
+    tasks: Iterable[Dict[str, Any]],
+    images_base_dir: str,
+    category_mapping: Dict[int, str],
+    stats: Dict[str, int],
+    skip: SkipTracker,
+    max_objects_per_conversation: Optional[int] = None,
+    cache: Optional[ConversionCache] = None,
+    cache_settings: str = "",
+    image_index: Optional[ImageIndex] = None,
+    template: Optional[DetectionTemplate] = None,
+    progress: Optional[StageMetrics] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily convert detection task records into SFT records, updating `stats` and `skip` as it goes.
+
+    With a `cache`, the records of an image whose content and converter settings are unchanged since
+    a previous run (and whose image still exists) reuse the cached SFT records instead of being
+    converted, with one lookup per image. They are identified by image file, record and detection
+    counts and the fingerprint of the annotation file they were generated from (see
+    `ConversionCache.annotation_fingerprints`), so the records are neither serialized nor hashed;
+    records of annotation files unknown to the cache fall back to a content hash (`record_key`).
+    Image existence is answered from `image_index` when given, without a `stat` call per record.
+    `progress` (see `utils/instrumentation.py`) is advanced once per task record.
+    """
+    if image_index is None:
+        image_index = ImageIndex(images_base_dir)
+    if template is None:
+        template = load_detection_template()
+    fingerprints = cache.annotation_fingerprints() if cache is not None else {}
+    # Records of one image are consecutive (one per image, or one per detection) and are cached together
+    for image_file, image_records in groupby(tasks, key=lambda record: record.get("image_file")):
+        image_records = list(image_records)
+        converted = None
+        if cache is not None:
+            num_detections = sum(len(record.get("detections", [])) for record in image_records)
+            key = _sft_cache_key(fingerprints, image_file, len(image_records), num_detections, image_records, cache_settings)
+            if image_index.exists(image_file):
+                converted = cache.lookup_sft(key)
+                if converted is not None:
+                    for record in image_records:
+                        _add_categories(record, category_mapping)
+        if converted is None:
+            converted = [
+                _convert_task_record(
+                    record, images_base_dir, category_mapping, skip, max_objects_per_conversation, image_index, template
+                )
+                for record in image_records
+            ]
+            # Records that were skipped are converted (and reported) again on the next run
+            if cache is not None and all(converted):
+                cache.store_sft(key, converted)
+        for sft_records in converted:
+            stats["total_images"] += 1
+            if progress is not None:
+                progress.advance(conversations=len(sft_records))
+            if not sft_records:
+                continue
+            stats["processed_images"] += 1
+            stats["conversations"] += len(sft_records)
+            yield from sft_records
+
+
+def iter_columnar_sft_records(
+    columnar_tasks: "ColumnarTasks",
+    images_base_dir: str,
+    category_mapping: Dict[int, str],
+    stats: Dict[str, int],
+    skip: SkipTracker,
+    max_objects_per_conversation: Optional[int] = None,
+    cache: Optional[ConversionCache] = None,
+    cache_settings: str = "",
+    image_index: Optional[ImageIndex] = None,
+    template: Optional[DetectionTemplate] = None,
+    progress: Optional[StageMetrics] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    `iter_sft_records` for a columnar task directory (see `tasks/columnar.py`): each image's box and
+    category id column slices are formatted straight into answer strings, without building its task
+    record or a dict per detection. Cache entries are shared with the record-based path.
+    """
+    if image_index is None:
+        image_index = ImageIndex(images_base_dir)
+    if template is None:
+        template = load_detection_template()
+    fingerprints = cache.annotation_fingerprints() if cache is not None else {}
+    for i, image_file in enumerate(columnar_tasks.image_files):
+        rows = columnar_tasks.image_slice(i)
+        category_ids = columnar_tasks.category_ids[rows].tolist()
+        stats["total_images"] += 1
+        sft_records = None
+        if cache is not None:
+            key = _sft_cache_key(
+                fingerprints, image_file, 1, len(category_ids), lambda: [columnar_tasks.task_record(i)], cache_settings
+            )
+            if image_index.exists(image_file):
+                cached = cache.lookup_sft(key)
+                if cached is not None:
+                    sft_records = cached[0]
+                    for category_id in category_ids:
+                        category_mapping.setdefault(category_id, f"class_{category_id}")
+        if sft_records is None:
+            sft_records = _convert_columnar_image(
+                image_file, columnar_tasks.box_values(rows), category_ids, images_base_dir, category_mapping, skip,
+                max_objects_per_conversation, image_index, template
+            )
+            if cache is not None and sft_records:
+                cache.store_sft(key, [sft_records])
+        if progress is not None:
+            progress.advance(conversations=len(sft_records))
+        if not sft_records:
+            continue
+        stats["processed_images"] += 1
+        stats["conversations"] += len(sft_records)
+        yield from sft_records
+
+
+class DetectionSFTBuilder:
+    """
+    Task builder for the registry (see `src/registry.py`): turns one parsed per-image annotation
+    record into detection QA records, so several task types can share a single pass.
+    """
+
+    task_type = "detection"
+
+    def __init__(
+        self,
+        images_base_dir: str,
+        category_mapping: Optional[Dict[int, str]] = None,
+        image_index: Optional[ImageIndex] = None,
+        max_objects_per_conversation: Optional[int] = None,
+        template_path: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        self.images_base_dir = images_base_dir
+        self.category_mapping = dict(category_mapping or {})
+        self.image_index = image_index if image_index is not None else ImageIndex(images_base_dir)
+        self.max_objects_per_conversation = max_objects_per_conversation
+        self.template = load_detection_template(template_path, seed)
+        self.stats = {"total_images": 0, "processed_images": 0, "conversations": 0}
+        self.skip = SkipTracker()
+
+    def build(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.stats["total_images"] += 1
+        sft_records = _convert_task_record(
+            record, self.images_base_dir, self.category_mapping, self.skip,
+            self.max_objects_per_conversation, self.image_index, self.template
+        )
+        if sft_records:
+            self.stats["processed_images"] += 1
+            self.stats["conversations"] += len(sft_records)
+        return sft_records
+
+    def summary(self) -> Dict[str, int]:
+        return {**self.stats, "skipped": self.skip.count}
+
+
+def convert_detection_tasks_to_sft_llava_debug(
+    detection_tasks_json_path: str,
+    output_sft_json_path: str,
+    images_base_dir: str,
+    category_mapping: Dict[int, str] = None,
+    max_objects_per_conversation: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    image_index_path: Optional[str] = None,
+    template_path: Optional[str] = None,
+    seed: Optional[int] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    compression_level: Optional[int] = None,
+    json_indent: Optional[int] = None
+) -> None:
+    """
+    Convert detection tasks into LLaVA-style SFT QA pairs.
+
+    The formats are picked from the file extensions: a `.jsonl` task file is read lazily
+    record by record, and a `.jsonl` output path makes the SFT records stream to disk one
+    per line as they are produced. Together they keep memory use constant in dataset size.
+    A `.json` output path streams a single JSON array, compact unless `json_indent` is given.
+
+    A `.gz` / `.zst` suffix on either path (e.g. `sft_detection_qa.jsonl.zst`) compresses the output
+    on the fly at `compression_level`, or decompresses the input as it is read (see `utils/compressed_io.py`).
+
+    Task files written with `group_by_image=True` yield one conversation per image, optionally
+    split into chunks of at most `max_objects_per_conversation` objects.
+
+    With `cache_dir`, only task records that are new or changed since the last run are converted;
+    cached SFT records are spliced into the output for the rest, and entries for records that
+    disappeared are dropped from the cache. Records are matched by the annotation file fingerprints
+    that `generate_detection_tasks` stored in the same `cache_dir`, so the task file must come from
+    the latest task generation with that cache (as in `pipeline.run_pipeline`).
+
+    `images_base_dir` is scanned once into an `ImageIndex` (persisted to `image_index_path` when
+    given) instead of checking every image with its own `stat` call.
+
+    Questions and answers are rendered from the template file `template_path` (default: the built-in
+    `DEFAULT_DETECTION_TEMPLATE`), loaded and compiled once. With a `seed`, question and
+    answer variants are picked reproducibly per conversation; without one the first variant is used.
+
+    With `instrumentation`, the conversion is recorded as the "sft_conversion" stage (see
+    `utils/instrumentation.py`) with per-record throughput and the bytes written.
+    """
+    if category_mapping is None:
+        category_mapping = {}
+
+    stats = {"total_images": 0, "processed_images": 0, "conversations": 0}
+    skip = SkipTracker()
+    cache = ConversionCache(cache_dir) if cache_dir else None
+    template = load_detection_template(template_path, seed)
+    cache_settings = settings_key({
+        "images_base_dir": images_base_dir,
+        "category_mapping": category_mapping,
+        "max_objects_per_conversation": max_objects_per_conversation,
+        "template": template.spec,
+        "seed": seed,
+    })
+    image_index = ImageIndex(images_base_dir, image_index_path)
 
     os.makedirs(os.path.dirname(output_sft_json_path), exist_ok=True)
-    with open(output_sft_json_path, 'w', encoding='utf-8') as f:
-        json.dump(sft_records, f, ensure_ascii=False, indent=2)
+    stage = instrumentation.stage("sft_conversion", unit="records") if instrumentation is not None else nullcontext()
+    with stage as progress:
+        if os.path.isdir(detection_tasks_json_path):
+            from tasks.columnar import ColumnarTasks  # requires NumPy, only imported when used
+
+            sft_records = iter_columnar_sft_records(
+                ColumnarTasks(detection_tasks_json_path), images_base_dir, category_mapping, stats, skip,
+                max_objects_per_conversation, cache, cache_settings, image_index, template, progress
+            )
+        else:
+            sft_records = iter_sft_records(
+                iter_detection_task_records(detection_tasks_json_path), images_base_dir, category_mapping, stats, skip,
+                max_objects_per_conversation, cache, cache_settings, image_index, template, progress
+            )
+        try:
+            if is_jsonl_path(output_sft_json_path):
+                write_jsonl_records(sft_records, output_sft_json_path, compression_level)
+            else:
+                write_json_array_records(sft_records, output_sft_json_path, json_indent, compression_level)
+            if cache is not None:
+                cache.prune_sft()
+        finally:
+            if cache is not None:
+                cache.close()
+        if progress is not None:
+            progress.count(bytes_written=path_bytes(output_sft_json_path))
 
     print("\n=== Processing Summary ===")
-    print(f"Total images: {total_images}")
-    print(f"Successfully processed: {processed_images}")
-    print(f"Skipped: {len(skipped_detections)}")
+    print(f"Total images: {stats['total_images']}")
+    print(f"Successfully processed: {stats['processed_images']}")
+    print(f"Conversations written: {stats['conversations']}")
+    print(f"Skipped: {skip.count}")
+    if cache is not None:
+        print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
 
-    if skipped_detections:
+    if skip.examples:
         print("\n🔍 First 10 skipped records:")
-        for item in skipped_detections[:10]:
+        for item in skip.examples:
             print(f"- {item.get('image_file')} | Reason: {item.get('reason')}")
 
     print(f"\n✅ SFT data saved to: {output_sft_json_path}")
     print("📝 Category ID to Name Mapping:")
     for k, v in sorted(category_mapping.items()):
-        print(f"  {k}: {v}")
\ No newline at end of file
+        print(f"  {k}: {v}")
@@ -0,0 +1,122 @@
+# src/converters/trajectory.py
+
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from converters.to_sft_format import SkipTracker
+from tasks.trajectory_task import DIRECTIONS, SequenceTrajectories
+from utils.image_index import ImageIndex
+
+
+class TrajectorySFTBuilder:
+    """
+    Task builder for trajectory QA over VisDrone-VID/MOT sequences (registered as "trajectory" in
+    `src/registry.py`, fed by the "visdrone_vid" reader).
+
+    Motion statistics of all tracks of a sequence are computed in one vectorized pass
+    (`SequenceTrajectories.motion_stats`); the longest tracks then each get one conversation about
+    their direction, speed and dwell time. `images_base_dir` is the folder holding one frame
+    directory per sequence.
+    """
+
+    task_type = "trajectory"
+
+    def __init__(
+        self,
+        images_base_dir: str,
+        category_mapping: Optional[Dict[int, str]] = None,
+        image_index: Optional[ImageIndex] = None,
+        min_track_frames: int = 10,
+        max_tracks_per_sequence: Optional[int] = 20,
+        stationary_ratio: float = 0.5,
+        fps: Optional[float] = None
+    ):
+        self.images_base_dir = images_base_dir
+        self.category_mapping = dict(category_mapping or {})
+        self.min_track_frames = min_track_frames
+        self.max_tracks_per_sequence = max_tracks_per_sequence
+        # A track counts as stationary if it ends less than this fraction of its first box size away
+        self.stationary_ratio = stationary_ratio
+        self.fps = fps
+        self.stats = {"total_sequences": 0, "processed_sequences": 0, "tracks": 0, "conversations": 0}
+        self.skip = SkipTracker()
+
+    def build(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.stats["total_sequences"] += 1
+        trajectories: SequenceTrajectories = record["trajectories"]
+        sequence_dir = os.path.join(self.images_base_dir, trajectories.sequence)
+        if not os.path.isdir(sequence_dir):
+            self.skip.add({"sequence": trajectories.sequence, "reason": "Sequence frame directory does not exist"})
+            return []
+        self.stats["tracks"] += len(trajectories)
+        if not len(trajectories):
+            self.skip.add({"sequence": trajectories.sequence, "reason": "No trajectories"})
+            return []
+
+        motion = trajectories.motion_stats()
+        selected = np.flatnonzero(motion["num_frames"] >= self.min_track_frames)
+        # Longest tracks first; the stable sort keeps target id order among ties
+        selected = selected[np.argsort(-motion["num_frames"][selected], kind="stable")]
+        if self.max_tracks_per_sequence:
+            selected = selected[:self.max_tracks_per_sequence]
+        if not len(selected):
+            self.skip.add({"sequence": trajectories.sequence, "reason": f"No track spans {self.min_track_frames} frames"})
+            return []
+
+        first_boxes = trajectories.boxes[trajectories.offsets[selected]]
+        stationary = motion["displacement"][selected] < self.stationary_ratio * first_boxes[:, 2:].max(axis=1)
+
+        sft_records = [
+            self._build_record(sequence_dir, trajectories, motion, track, box, is_stationary)
+            for track, box, is_stationary in zip(selected.tolist(), first_boxes.tolist(), stationary.tolist())
+        ]
+        self.stats["processed_sequences"] += 1
+        self.stats["conversations"] += len(sft_records)
+        return sft_records
+
+    def _build_record(
+        self,
+        sequence_dir: str,
+        trajectories: SequenceTrajectories,
+        motion: Dict[str, np.ndarray],
+        track: int,
+        box: List[float],
+        is_stationary: bool
+    ) -> Dict[str, Any]:
+        category_id = int(trajectories.categories[track])
+        name = self.category_mapping.get(category_id, f"class_{category_id}")
+        first_frame, last_frame = int(motion["first_frame"][track]), int(motion["last_frame"][track])
+        num_frames = int(motion["num_frames"][track])
+        speed = float(motion["speed"][track])
+        location = ", ".join(str(round(v)) for v in box)
+
+        if is_stationary:
+            direction_answer = "It stays roughly in place."
+        else:
+            direction_answer = f"It moves {DIRECTIONS[motion['direction'][track]]}."
+        speed_answer = f"About {speed:.1f} pixels per frame"
+        dwell_answer = f"It is visible in {num_frames} frames, from frame {first_frame} to frame {last_frame}"
+        if self.fps:
+            speed_answer += f" ({speed * self.fps:.1f} pixels per second)"
+            dwell_answer += f" (about {(last_frame - first_frame + 1) / self.fps:.1f} s)"
+
+        turns = [
+            (f"In which direction does the {name} at [{location}] in frame {first_frame} move?", direction_answer),
+            ("How fast does it move?", speed_answer + "."),
+            ("How long does it stay in view?", dwell_answer + "."),
+        ]
+        conversation = []
+        for question, answer in turns:
+            conversation.append({"from": "human", "value": question})
+            conversation.append({"from": "gpt", "value": answer})
+        return {
+            "video_path": sequence_dir,
+            "target_id": int(trajectories.target_ids[track]),
+            "frame_range": [first_frame, last_frame],
+            "conversation": conversation,
+        }
+
+    def summary(self) -> Dict[str, int]:
+        return {**self.stats, "skipped": self.skip.count}
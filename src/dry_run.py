@@ -0,0 +1,144 @@
+# src/dry_run.py
+#
+# Dry run: runs the pipeline on a random sample of the annotation files and extrapolates the record
+# count, output size, memory and runtime of the full job (used by `python src/main.py --dry-run`).
+
+import contextlib
+import io
+import math
+import os
+import random
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+from pipeline import run_pipeline
+from tasks.detection_task import list_annotation_files
+from utils.instrumentation import Instrumentation
+
+# Stages whose work is spread over `num_workers` processes in a full run
+PARALLEL_STAGES = ("detection_tasks", "sft_sharded")
+# Output formats whose task file is loaded whole for the conversion step (memory grows with the dataset)
+IN_MEMORY_FORMATS = ("json",)
+
+
+def _run_sample(sample_dir: str, output_dir: str, profile: Optional[str], pipeline_options: Dict[str, Any]) -> Instrumentation:
+    instrumentation = Instrumentation(report_interval=math.inf, profile=profile)
+    # The converters print per-run summaries; keep the dry run output to the estimate itself
+    with instrumentation, contextlib.redirect_stdout(io.StringIO()):
+        run_pipeline(sample_dir, output_dir=output_dir, instrumentation=instrumentation, **pipeline_options)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return instrumentation
+
+
+def estimate_pipeline(
+    annotations_folder: str,
+    images_base_dir: str,
+    output_format: str = "json",
+    num_workers: Optional[int] = None,
+    sample_fraction: float = 0.02,
+    min_sample_files: int = 20,
+    sample_seed: int = 0,
+    **pipeline_options: Any
+) -> Dict[str, Any]:
+    """
+    Estimate a full `run_pipeline` job from a sample of its annotation files.
+
+    A seeded random sample of `sample_fraction` of the files (at least `min_sample_files`) is copied
+    into a temporary folder and run through the real pipeline, serially and without cache, parse
+    report or image id table. The sample is run twice: once timed, once under `tracemalloc` for the
+    peak memory, since tracing slows the run down. Counts, sizes and times are scaled by the
+    ratio of total to sampled annotation bytes.
+
+    Runtime is given serially and for `num_workers` processes assuming ideal speed-up of the parallel
+    stages, so the latter is a lower bound. Peak memory is the traced Python heap of the main process:
+    kept as measured for the streaming formats and scaled with the data for "json", whose task array
+    is loaded whole for the conversion step.
+
+    Returns:
+        Dict[str, Any]: The sample size, the scale factor and the estimates per stage and in total.
+    """
+    txt_files = list_annotation_files(annotations_folder)
+    if not txt_files:
+        raise ValueError(f"No annotation files found in {annotations_folder}")
+    num_samples = min(len(txt_files), max(min_sample_files, math.ceil(len(txt_files) * sample_fraction)))
+    sample = sorted(random.Random(sample_seed).sample(txt_files, num_samples))
+
+    sizes = {entry.name: entry.stat().st_size for entry in os.scandir(annotations_folder) if entry.name.endswith('.txt')}
+    total_bytes = sum(sizes.values())
+    sample_bytes = sum(sizes[txt_file] for txt_file in sample)
+    scale = total_bytes / sample_bytes if sample_bytes else len(txt_files) / num_samples
+
+    pipeline_options = {
+        **pipeline_options,
+        "images_base_dir": images_base_dir,
+        "output_format": output_format,
+        "num_workers": 1,
+        "cache_dir": None,
+        "parse_report_path": None,
+        "image_id_table_path": None,
+    }
+    if output_format == "sharded":
+        # Keep the shard count proportional to the sample so per-shard overhead scales too
+        pipeline_options["num_shards"] = max(1, round(pipeline_options.get("num_shards", 64) / scale))
+    if pipeline_options.get("balanced_sample_size"):
+        # A sample drawn from the sample: shrink the target by the same factor
+        pipeline_options["balanced_sample_size"] = max(1, round(pipeline_options["balanced_sample_size"] / scale))
+
+    with tempfile.TemporaryDirectory(prefix="visdrone_dry_run_") as work_dir:
+        sample_dir = os.path.join(work_dir, "annotations")
+        os.makedirs(sample_dir)
+        for txt_file in sample:
+            shutil.copyfile(os.path.join(annotations_folder, txt_file), os.path.join(sample_dir, txt_file))
+
+        timed = _run_sample(sample_dir, os.path.join(work_dir, "outputs"), None, pipeline_options)
+        traced = _run_sample(sample_dir, os.path.join(work_dir, "outputs"), "tracemalloc", pipeline_options)
+
+    workers = num_workers if num_workers and num_workers > 0 else os.cpu_count() or 1
+    stages = {}
+    for name, metrics in timed.stages.items():
+        counters = metrics.counters
+        serial_seconds = metrics.seconds * scale
+        stages[name] = {
+            "sample_seconds": round(metrics.seconds, 4),
+            "estimated_seconds": round(serial_seconds, 2),
+            "estimated_wall_seconds": round(serial_seconds / workers if name in PARALLEL_STAGES else serial_seconds, 2),
+            "estimated_counters": {key: int(round(value * scale)) for key, value in sorted(counters.items())},
+        }
+
+    sample_peak = traced.profile_summary["peak_traced_bytes"]
+    output_bytes = sum(stage["estimated_counters"].get("bytes_written", 0) for stage in stages.values())
+    return {
+        "annotation_files": len(txt_files),
+        "annotation_bytes": total_bytes,
+        "sample_files": num_samples,
+        "sample_bytes": sample_bytes,
+        "scale": round(scale, 3),
+        "output_format": output_format,
+        "num_workers": workers,
+        "stages": stages,
+        "estimated_records": stages["detection_tasks"]["estimated_counters"].get("records_written", 0),
+        "estimated_detections": stages["detection_tasks"]["estimated_counters"].get("detections_written", 0),
+        "estimated_output_bytes": output_bytes,
+        "estimated_peak_memory_bytes": int(sample_peak * scale if output_format in IN_MEMORY_FORMATS else sample_peak),
+        "estimated_serial_seconds": round(sum(stage["estimated_seconds"] for stage in stages.values()), 2),
+        "estimated_wall_seconds": round(sum(stage["estimated_wall_seconds"] for stage in stages.values()), 2),
+    }
+
+
+def format_estimate(estimate: Dict[str, Any]) -> str:
+    """Human-readable summary of `estimate_pipeline` output."""
+    lines = [
+        "=== Dry Run Estimate ===",
+        f"Sampled {estimate['sample_files']} of {estimate['annotation_files']} annotation files "
+        f"({estimate['sample_bytes']} of {estimate['annotation_bytes']} bytes, scale x{estimate['scale']})",
+        f"Detection task records: ~{estimate['estimated_records']} (~{estimate['estimated_detections']} detections)",
+        f"Output size: ~{estimate['estimated_output_bytes'] / 2 ** 20:.1f} MiB",
+        f"Peak memory (Python heap, main process): ~{estimate['estimated_peak_memory_bytes'] / 2 ** 20:.1f} MiB",
+        f"Runtime: ~{estimate['estimated_serial_seconds']:.1f} s serial, "
+        f"~{estimate['estimated_wall_seconds']:.1f} s with {estimate['num_workers']} workers (ideal speed-up)",
+    ]
+    for name, stage in estimate["stages"].items():
+        counters = ", ".join(f"{key}={value}" for key, value in stage["estimated_counters"].items())
+        lines.append(f"- {name}: ~{stage['estimated_seconds']:.1f} s serial; {counters}")
+    return "\n".join(lines)
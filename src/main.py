@@ -1,53 +1,185 @@
 # src/main.py
+#
+# Command line entry point: VisDrone annotation files -> detection tasks -> SFT QA pairs.
+#
+#   python src/main.py --annotations datasets/VisDrone/VisDrone2019-DET-train/annotations \
+#                      --images datasets/VisDrone/VisDrone2019-DET-train/images --output-format jsonl
+#   python src/main.py --config configs/visdrone_train.json --num-workers 16
+#   python src/main.py --config configs/visdrone_train.json --dry-run
+#
+# Every option can also be set in a JSON --config file, keyed by the option name with underscores
+# (e.g. {"annotations": "...", "output_format": "sharded", "box_normalization": {"normalize_scale": 1000}});
+# options given on the command line take precedence over the file.
 
+import argparse
+import json
 import os
 
 # === Import task modules (responsible for task construction logic) ===
-from tasks.detection_task import generate_detection_tasks
+from pipeline import OUTPUT_FORMATS, check_pipeline_options, run_pipeline, sft_output_path
+from tasks.detection_task import LOG_FILE
 
-# === Import conversion modules (e.g., converting to SFT format) ===
-from converters.to_sft_format import convert_detection_tasks_to_sft_llava_debug
+# === Import utility modules (e.g., instrumentation, logging) ===
+from utils.compressed_io import COMPRESSIONS
+from utils.instrumentation import PROFILE_MODES, Instrumentation
+from utils.logger import set_log_level
 
-# === Import utility modules (e.g., category mapping, path utilities) ===
-from utils.category_mapping import VISDRONE_CATEGORY_MAPPING
-from utils.path_utils import ensure_dir_exists
+# Defaults are relative to the project root (the directory containing src/), see "Currently Used Dataset" in the README
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(PROJECT_ROOT, "datasets", "VisDrone", "VisDrone2019-DET-train")
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
 
 
-def main():
-    # ===============================
-    # ✅ You can modify these paths according to your environment!
-    # ===============================
-    # Path to the original dataset (VisDrone .txt annotation files and images)
-    annotations_folder = r"C:\Users\38487\Desktop\Low-Altitude-Intelligence\datasets\VisDrone\VisDrone2019-DET-train\annotations"
-    images_base_dir = r"C:\Users\38487\Desktop\Low-Altitude-Intelligence\datasets\VisDrone\VisDrone2019-DET-train\images"
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(description="VisDrone -> detection tasks -> SFT QA pairs")
+    arg_parser.add_argument("--config", default=None, help="JSON file with option defaults (keys = option names with underscores)")
 
-    # Directory where the generated detection tasks will be saved (detection_tasks.json)
-    output_detection_tasks_dir = r"C:\Users\38487\Desktop\Low-Altitude-Intelligence\outputs\tasks"
+    paths = arg_parser.add_argument_group("paths")
+    paths.add_argument("--annotations", default=os.path.join(DATASET_DIR, "annotations"),
+                       help="folder of VisDrone .txt annotation files")
+    paths.add_argument("--images", default=os.path.join(DATASET_DIR, "images"), help="folder of the images")
+    paths.add_argument("--output-dir", default=os.path.join(PROJECT_ROOT, "outputs"),
+                       help="receives tasks/ (detection tasks) and sft/ (SFT output and metrics.json)")
+    paths.add_argument("--cache-dir", default=None,
+                       help="enable the incremental conversion cache in this directory (e.g. outputs/cache): only new "
+                            "or changed files / task records are reprocessed (default: no cache)")
+    paths.add_argument("--no-cache", action="store_true", help="disable the conversion cache, e.g. one set by --config")
+    paths.add_argument("--parse-report", default=os.path.join(PROJECT_ROOT, "logs", "visdrone_parse_report.json"),
+                       help="machine-readable parse report (counts per file, per error type and per category)")
+    paths.add_argument("--no-parse-report", action="store_true", help="do not write the parse report")
+    paths.add_argument("--image-id-table", default=None,
+                       help="persisted filename -> integer image id table (default: stable digest ids)")
 
-    # Final output path for the SFT format data (human + gpt QA pairs)
-    output_sft_json_path = r"C:\Users\38487\Desktop\Low-Altitude-Intelligence\outputs\sft\sft_detection_qa.json"
+    processing = arg_parser.add_argument_group("processing")
+    processing.add_argument("--output-format", default="json", choices=OUTPUT_FORMATS,
+                            help="json: streamed arrays, compact unless --pretty-json (indent=2); jsonl: streamed, "
+                                 "constant memory; columnar: binary task columns (NumPy) + JSONL SFT; sharded: JSONL "
+                                 "tasks + parallel numbered SFT shards")
+    processing.add_argument("--compression", default=None, choices=COMPRESSIONS,
+                            help="compress the task and SFT files while streaming them (.gz / .zst; zstd needs "
+                                 "Python 3.14+ or the zstandard package)")
+    processing.add_argument("--compression-level", type=int, default=None,
+                            help="gzip 1-9 / zstd 1-22 (default: gzip 6, zstd 3)")
+    processing.add_argument("--pretty-json", action="store_true",
+                            help="indent json outputs for reading (default: compact separators)")
+    processing.add_argument("--num-shards", type=int, default=64, help="number of SFT shards for --output-format sharded")
+    processing.add_argument("--task-types", nargs="+", default=["detection"],
+                            help="SFT task types registered in registry.py, e.g. detection counting relation "
+                                 "(several types need --output-format jsonl or columnar)")
+    processing.add_argument("--task-options", type=json.loads, default=None,
+                            help='JSON keyword arguments per task builder, e.g. \'{"tiling": {"tile_size": 800, '
+                                 '"overlap": 0.25, "crop_dir": "outputs/crops"}}\'')
+    processing.add_argument("--statistics", action="store_true",
+                            help="write per-category, per-image and box-size histograms to <output-dir>/tasks/dataset_statistics.json")
+    processing.add_argument("--balanced-sample-size", type=int, default=None,
+                            help="convert only a category-balanced sample of this many task records (implies --statistics)")
+    processing.add_argument("--balanced-sample-seed", type=int, default=0, help="seed of the balanced sample")
+    processing.add_argument("--num-workers", type=int, default=None, help="parser processes (default / <= 0: one per CPU core)")
+    processing.add_argument("--chunksize", type=int, default=16, help="annotation files handed to a worker at a time")
+    processing.add_argument("--parser", default="python", choices=("python", "bulk"),
+                            help="annotation parser: line by line, or vectorized (requires NumPy)")
+    processing.add_argument("--per-detection", action="store_true",
+                            help="one task / conversation per detection instead of one per image")
+    processing.add_argument("--max-objects-per-conversation", type=int, default=None,
+                            help="split image conversations into chunks of at most this many objects")
+    processing.add_argument("--template", default=None, help="QA template JSON file (default: the built-in template in converters/prompt_templates.py)")
+    processing.add_argument("--seed", type=int, default=None, help="seed for picking question / answer variants")
+    processing.add_argument("--box-normalization", type=json.loads, default=None,
+                            help='JSON options of the box validation / normalization stage (requires NumPy), '
+                                 'e.g. \'{}\' for the defaults or \'{"normalize_scale": 1000}\'')
 
-    # ===============================
-    # Step 1: Call the task module to generate detection tasks (detection_tasks.json)
-    # ===============================
-    # The generated tasks will be saved in the file: detection_tasks.json inside output_detection_tasks_dir
-    generate_detection_tasks(annotations_folder, output_detection_tasks_dir)
+    run = arg_parser.add_argument_group("logging and diagnostics")
+    run.add_argument("--log-level", default="INFO", choices=LOG_LEVELS, type=str.upper, help="level of the package loggers")
+    run.add_argument("--progress-interval", type=float, default=30.0,
+                     help="seconds between progress / throughput / ETA log lines")
+    run.add_argument("--profile", default=None, choices=PROFILE_MODES,
+                     help="profile the run with cProfile or tracemalloc; summarized in metrics.json")
+    run.add_argument("--dry-run", action="store_true",
+                     help="run a sample of the annotation files and estimate records, output size, memory and runtime")
+    run.add_argument("--sample-fraction", type=float, default=0.02, help="fraction of annotation files sampled by --dry-run")
+    run.add_argument("--sample-seed", type=int, default=0, help="seed of the --dry-run sample")
+    return arg_parser
 
-    # ===============================
-    # Step 2: Call the conversion module to convert detection_tasks.json to SFT format (QA pairs)
-    # ===============================
-    detection_tasks_json_path = os.path.join(output_detection_tasks_dir, "detection_tasks.json")
-    ensure_dir_exists(os.path.dirname(output_sft_json_path))  # Ensure the SFT output directory exists
 
-    convert_detection_tasks_to_sft_llava_debug(
-        detection_tasks_json_path,
-        output_sft_json_path,
-        images_base_dir,
-        category_mapping=VISDRONE_CATEGORY_MAPPING
-    )
+def parse_args(argv=None) -> argparse.Namespace:
+    arg_parser = build_arg_parser()
+    config_args, _ = arg_parser.parse_known_args(argv)
+    if config_args.config:
+        with open(config_args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        unknown = sorted(set(config) - {action.dest for action in arg_parser._actions})
+        if unknown:
+            arg_parser.error(f"unknown option(s) in {config_args.config}: {', '.join(unknown)}")
+        arg_parser.set_defaults(**config)
+    args = arg_parser.parse_args(argv)
+    try:
+        check_pipeline_options(args.output_format, args.task_types, None if args.no_cache else args.cache_dir)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    set_log_level(args.log_level)
+
+    pipeline_options = {
+        "images_base_dir": args.images,
+        "output_format": args.output_format,
+        "task_types": args.task_types,
+        "num_workers": args.num_workers,
+        "chunksize": args.chunksize,
+        "parser": args.parser,
+        "group_by_image": not args.per_detection,
+        "max_objects_per_conversation": args.max_objects_per_conversation,
+        "template_path": args.template,
+        "seed": args.seed,
+        "box_normalization": args.box_normalization,
+        "num_shards": args.num_shards,
+        "compression": args.compression,
+        "compression_level": args.compression_level,
+        "json_indent": 2 if args.pretty_json else None,
+        "task_options": args.task_options,
+        "balanced_sample_size": args.balanced_sample_size,
+        "balanced_sample_seed": args.balanced_sample_seed,
+    }
+
+    if args.dry_run:
+        from dry_run import estimate_pipeline, format_estimate
+
+        estimate = estimate_pipeline(
+            args.annotations, sample_fraction=args.sample_fraction, sample_seed=args.sample_seed, **pipeline_options
+        )
+        print(format_estimate(estimate))
+        os.makedirs(args.output_dir, exist_ok=True)
+        estimate_path = os.path.join(args.output_dir, "dry_run_estimate.json")
+        with open(estimate_path, 'w', encoding='utf-8') as f:
+            json.dump(estimate, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Estimate saved to: {estimate_path}")
+        return
+
+    statistics_path = None
+    if args.statistics or args.balanced_sample_size:
+        statistics_path = os.path.join(args.output_dir, "tasks", "dataset_statistics.json")
+
+    # Per-stage timers, counters and progress lines; metrics.json is written next to the SFT output
+    instrumentation = Instrumentation(report_interval=args.progress_interval, profile=args.profile, log_file=LOG_FILE)
+    with instrumentation:
+        run_pipeline(
+            args.annotations,
+            output_dir=args.output_dir,
+            cache_dir=None if args.no_cache else args.cache_dir,
+            image_id_table_path=args.image_id_table,
+            parse_report_path=None if args.no_parse_report else args.parse_report,
+            statistics_path=statistics_path,
+            instrumentation=instrumentation,
+            **pipeline_options
+        )
+    metrics_dir = os.path.dirname(sft_output_path(args.output_dir, args.output_format))
+    instrumentation.write_metrics(os.path.join(metrics_dir, "metrics.json"))
 
     print("✅ All tasks executed successfully!")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
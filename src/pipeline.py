@@ -0,0 +1,252 @@
+# src/pipeline.py
+#
+# The two pipeline steps (annotation files -> detection tasks -> SFT QA pairs) behind one function,
+# shared by the command line entry point (main.py) and the dry-run estimator (dry_run.py).
+
+import os
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, Optional
+
+from tasks.detection_task import generate_detection_tasks
+from utils.category_mapping import VISDRONE_CATEGORY_MAPPING
+from utils.compressed_io import with_compression_suffix
+from utils.instrumentation import Instrumentation, path_bytes
+from utils.jsonl_utils import write_jsonl_records
+from utils.path_utils import ensure_dir_exists
+
+# "sharded" writes JSONL detection tasks and converts them into numbered SFT shards in parallel
+OUTPUT_FORMATS = ("json", "jsonl", "columnar", "sharded")
+
+
+def sft_output_path(output_dir: str, output_format: str, compression: Optional[str] = None) -> str:
+    """Path of the single-file SFT output inside `output_dir` (the shards of "sharded" go into `sft/shards/`)."""
+    extension = ".json" if output_format == "json" else ".jsonl"
+    return with_compression_suffix(os.path.join(output_dir, "sft", "sft_detection_qa" + extension), compression)
+
+
+def check_pipeline_options(output_format: str, task_types: Iterable[str], cache_dir: Optional[str] = None) -> None:
+    """Raise ValueError for option combinations `run_pipeline` cannot honour, before any work is done."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format!r} (expected one of {', '.join(OUTPUT_FORMATS)})")
+    if list(task_types) != ["detection"] and output_format in ("json", "sharded"):
+        raise ValueError(
+            f"Output format {output_format!r} only applies to the detection task type; several task types are "
+            "written as one sft_<task>.jsonl per type, use 'jsonl' or 'columnar'"
+        )
+    if output_format == "sharded" and cache_dir:
+        raise ValueError(
+            "The conversion cache is not supported with the 'sharded' output format (shards are converted in "
+            "parallel without it); use 'jsonl' or 'columnar' for incremental runs, or run without a cache directory"
+        )
+
+
+def _statistics_and_sampling(
+    detection_tasks_path: str,
+    tasks_dir: str,
+    statistics_path: Optional[str],
+    balanced_sample_size: Optional[int],
+    balanced_sample_seed: Optional[int],
+    instrumentation: Optional[Instrumentation],
+    compression: Optional[str],
+    compression_level: Optional[int]
+) -> str:
+    """Compute the dataset statistics and optionally draw the balanced sample; returns the task file to convert."""
+    from converters.to_sft_format import iter_detection_task_records
+    from tasks.dataset_statistics import compute_dataset_statistics
+
+    stage = instrumentation.stage("dataset_statistics", unit="records") if instrumentation is not None else nullcontext()
+    with stage as progress:
+        statistics = compute_dataset_statistics(
+            iter_detection_task_records(detection_tasks_path), VISDRONE_CATEGORY_MAPPING, progress=progress
+        )
+    print(statistics.summary())
+    if statistics_path:
+        statistics.save(statistics_path)
+        print(f"✅ Dataset statistics saved to: {statistics_path}")
+    if not balanced_sample_size:
+        return detection_tasks_path
+
+    from tasks.balanced_sampling import CategoryBalancedSampler
+
+    sampler = CategoryBalancedSampler(statistics, balanced_sample_size, balanced_sample_seed)
+    sample_path = with_compression_suffix(os.path.join(tasks_dir, "detection_tasks_balanced.jsonl"), compression)
+    stage = instrumentation.stage("balanced_sampling", unit="records") if instrumentation is not None else nullcontext()
+    with stage as progress:
+        if progress is not None:
+            progress.total = statistics.records
+        sampled = write_jsonl_records(
+            sampler.sample(iter_detection_task_records(detection_tasks_path), progress), sample_path, compression_level
+        )
+        if progress is not None:
+            progress.count(records_written=sampled, bytes_written=path_bytes(sample_path))
+    print(sampler.summary())
+    print(f"✅ Balanced task sample generated: {sample_path}, Total records: {sampled}")
+    return sample_path
+
+
+def run_pipeline(
+    annotations_folder: str,
+    images_base_dir: str,
+    output_dir: str,
+    output_format: str = "json",
+    task_types: Iterable[str] = ("detection",),
+    num_workers: Optional[int] = None,
+    chunksize: int = 16,
+    parser: str = "python",
+    group_by_image: bool = True,
+    max_objects_per_conversation: Optional[int] = None,
+    template_path: Optional[str] = None,
+    seed: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    box_normalization: Optional[Dict[str, Any]] = None,
+    image_id_table_path: Optional[str] = None,
+    parse_report_path: Optional[str] = None,
+    num_shards: int = 64,
+    instrumentation: Optional[Instrumentation] = None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    json_indent: Optional[int] = None,
+    task_options: Optional[Dict[str, Dict[str, Any]]] = None,
+    statistics_path: Optional[str] = None,
+    balanced_sample_size: Optional[int] = None,
+    balanced_sample_seed: Optional[int] = 0
+) -> Dict[str, str]:
+    """
+    Generate detection tasks from `annotations_folder` and convert them into SFT QA pairs.
+
+    Detection tasks are written to `output_dir/tasks/` and the SFT output to `output_dir/sft/`:
+    `sft_detection_qa.json` / `.jsonl` for one task type, one `sft_<task>.jsonl` per task type for several
+    (built in one pass, see `registry.run_sft_tasks`), or numbered shards in `sft/shards/` for "sharded".
+
+    Args:
+        output_format (str): "json" (single arrays; the task array is loaded whole for conversion), "jsonl" (constant memory),
+                             "columnar" (binary task columns, requires NumPy; SFT as JSONL) or
+                             "sharded" (JSONL tasks, SFT written as `num_shards` shards in parallel).
+        compression (Optional[str]): "gzip" or "zstd" compresses the task and SFT files as they are written
+                                     (not the columnar task directory); see `utils/compressed_io.py`.
+        compression_level (Optional[int]): Compression level; None uses the codec default.
+        json_indent (Optional[int]): Pretty-print "json" outputs with this indent; None writes compact JSON.
+        task_options (Optional[Dict[str, Dict[str, Any]]]): Extra keyword arguments per task builder when
+                                                            several task types are built, e.g.
+                                                            `{"tiling": {"tile_size": 800, "crop_dir": "outputs/crops"}}`.
+        statistics_path (Optional[str]): If given, per-category, per-image and box-size histograms of the
+                                         detection tasks are written there (see `tasks/dataset_statistics.py`).
+        balanced_sample_size (Optional[int]): Convert only a category-balanced sample of this many task records
+                                              (`tasks/balanced_sampling.py`), written to
+                                              `tasks/detection_tasks_balanced.jsonl`; None converts all of them.
+        balanced_sample_seed (Optional[int]): Seed of the balanced sample.
+        Other arguments are passed through to `generate_detection_tasks` and the SFT converters.
+
+    Several task types need the "jsonl" or "columnar" format; with them `cache_dir` covers the parsed
+    annotations and the image index (the task builders do not cache). "sharded" does not take a `cache_dir`.
+    Unsupported combinations raise ValueError (see `check_pipeline_options`).
+
+    Returns:
+        Dict[str, str]: {"tasks": task file path (the balanced sample, if one was drawn), "sft": SFT output file or directory}.
+    """
+    task_types = list(task_types)
+    check_pipeline_options(output_format, task_types, cache_dir)
+    task_format = "jsonl" if output_format == "sharded" else output_format
+
+    # One image index (existence and, for box normalization, image sizes) shared by both steps
+    image_index_path = os.path.join(cache_dir, "image_index.json") if cache_dir else None
+
+    # ===============================
+    # Step 1: Generate detection tasks (detection_tasks.json / .jsonl / columnar directory)
+    # ===============================
+    detection_tasks_path = generate_detection_tasks(
+        annotations_folder,
+        os.path.join(output_dir, "tasks"),
+        output_format=task_format,
+        num_workers=num_workers,
+        chunksize=chunksize,
+        parse_report_path=parse_report_path,
+        group_by_image=group_by_image,
+        parser=parser,
+        cache_dir=cache_dir,
+        image_id_table_path=image_id_table_path,
+        images_base_dir=images_base_dir,
+        box_normalization=box_normalization,
+        instrumentation=instrumentation,
+        compression=None if output_format == "columnar" else compression,
+        compression_level=compression_level,
+        json_indent=json_indent,
+        image_index_path=image_index_path
+    )
+
+    if statistics_path or balanced_sample_size:
+        detection_tasks_path = _statistics_and_sampling(
+            detection_tasks_path, os.path.join(output_dir, "tasks"), statistics_path, balanced_sample_size,
+            balanced_sample_seed, instrumentation, None if output_format == "columnar" else compression, compression_level
+        )
+
+    # ===============================
+    # Step 2: Convert the detection tasks to SFT format (QA pairs)
+    # ===============================
+    output_sft_path = sft_output_path(output_dir, output_format, compression)
+    ensure_dir_exists(os.path.dirname(output_sft_path))  # Ensure the SFT output directory exists
+
+    if task_types != ["detection"]:
+        from registry import run_sft_tasks
+
+        run_sft_tasks(
+            "detection_tasks",
+            detection_tasks_path,
+            task_types,
+            images_base_dir,
+            os.path.dirname(output_sft_path),
+            category_mapping=VISDRONE_CATEGORY_MAPPING,
+            task_options={
+                **(task_options or {}),
+                "detection": {
+                    "max_objects_per_conversation": max_objects_per_conversation,
+                    "template_path": template_path,
+                    "seed": seed,
+                    **(task_options or {}).get("detection", {}),
+                },
+            },
+            image_index_path=image_index_path,
+            instrumentation=instrumentation,
+            compression=compression,
+            compression_level=compression_level
+        )
+        output_sft_path = os.path.dirname(output_sft_path)
+    elif output_format == "sharded":
+        from converters.sharded import convert_detection_tasks_to_sft_sharded
+
+        output_sft_path = os.path.join(os.path.dirname(output_sft_path), "shards")
+        convert_detection_tasks_to_sft_sharded(
+            detection_tasks_path,
+            output_sft_path,
+            images_base_dir,
+            category_mapping=VISDRONE_CATEGORY_MAPPING,
+            num_shards=num_shards,
+            num_workers=num_workers,
+            max_objects_per_conversation=max_objects_per_conversation,
+            image_index_path=image_index_path,
+            template_path=template_path,
+            seed=seed,
+            instrumentation=instrumentation,
+            compression=compression,
+            compression_level=compression_level
+        )
+    else:
+        from converters.to_sft_format import convert_detection_tasks_to_sft_llava_debug
+
+        convert_detection_tasks_to_sft_llava_debug(
+            detection_tasks_path,
+            output_sft_path,
+            images_base_dir,
+            category_mapping=VISDRONE_CATEGORY_MAPPING,
+            max_objects_per_conversation=max_objects_per_conversation,
+            # Cached conversions are matched by position within the image, which a sample of
+            # per-detection records does not preserve
+            cache_dir=cache_dir if group_by_image or not balanced_sample_size else None,
+            image_index_path=image_index_path,
+            template_path=template_path,
+            seed=seed,
+            instrumentation=instrumentation,
+            compression_level=compression_level,
+            json_indent=json_indent
+        )
+    return {"tasks": detection_tasks_path, "sft": output_sft_path}
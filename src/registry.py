@@ -0,0 +1,170 @@
+# src/registry.py
+
+import importlib
+import os
+from contextlib import nullcontext
+from importlib import metadata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from utils.compressed_io import open_text, with_compression_suffix
+from utils.image_index import ImageIndex
+from utils.instrumentation import Instrumentation, path_bytes
+from utils.jsonl_utils import dumps_compact
+
+# Third-party packages can add readers / builders through these entry point groups, e.g. in pyproject.toml:
+#   [project.entry-points."low_altitude_intelligence.task_builders"]
+#   my_task = "my_package.builders:MyTaskBuilder"
+DATASET_READER_GROUP = "low_altitude_intelligence.dataset_readers"
+TASK_BUILDER_GROUP = "low_altitude_intelligence.task_builders"
+
+# Built-in entries are "module:attribute" strings and are only imported when first requested,
+# so a run only pays for the modules it actually uses.
+#
+# A dataset reader is a callable `reader(source, **options)` yielding parsed records; image readers yield one per image:
+#   {"image_id": ..., "image_file": ..., "detections": [{"x1", "y1", "x2", "y2", "label", "category_id"}, ...]}
+# and video readers ("visdrone_vid") one per sequence: {"sequence": ..., "trajectories": SequenceTrajectories}.
+# Builders only understand the record layout of their own kind of reader.
+# A task builder is a class `Builder(images_base_dir, category_mapping=None, image_index=None, **options)`
+# with `build(record) -> List[sft record]` and `summary() -> Dict[str, int]`; a builder class setting
+# `needs_image_dimensions = True` gets an image index that also holds the image sizes.
+DATASET_READERS: Dict[str, Union[str, Callable]] = {
+    "visdrone_det": "tasks.detection_task:iter_visdrone_det_records",
+    "detection_tasks": "converters.to_sft_format:iter_detection_task_records",
+    "visdrone_vid": "tasks.trajectory_task:iter_visdrone_vid_records",
+}
+TASK_BUILDERS: Dict[str, Union[str, Callable]] = {
+    "detection": "converters.to_sft_format:DetectionSFTBuilder",
+    "counting": "converters.counting:CountingSFTBuilder",
+    "trajectory": "converters.trajectory:TrajectorySFTBuilder",
+    "relation": "converters.relations:RelationSFTBuilder",
+    "tiling": "converters.tiling:TilingSFTBuilder",
+}
+
+
+def _load(target: Union[str, Callable]) -> Callable:
+    if not isinstance(target, str):
+        return target
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _resolve(registry: Dict[str, Union[str, Callable]], group: str, name: str, kind: str) -> Callable:
+    if name not in registry:
+        matches = [ep for ep in metadata.entry_points(group=group) if ep.name == name]
+        if not matches:
+            raise KeyError(f"Unknown {kind} {name!r}; available: {', '.join(_available(registry, group))}")
+        registry[name] = matches[0].load()
+    registry[name] = _load(registry[name])
+    return registry[name]
+
+
+def _available(registry: Dict[str, Any], group: str) -> List[str]:
+    return sorted(set(registry) | {ep.name for ep in metadata.entry_points(group=group)})
+
+
+def register_dataset_reader(name: str, target: Union[str, Callable]) -> None:
+    """Register a dataset reader under `name`, as a callable or a lazily imported "module:attribute" string."""
+    DATASET_READERS[name] = target
+
+
+def register_task_builder(name: str, target: Union[str, Callable]) -> None:
+    """Register a task builder class under `name`, as a class or a lazily imported "module:attribute" string."""
+    TASK_BUILDERS[name] = target
+
+
+def get_dataset_reader(name: str) -> Callable:
+    return _resolve(DATASET_READERS, DATASET_READER_GROUP, name, "dataset reader")
+
+
+def get_task_builder(name: str) -> Callable:
+    return _resolve(TASK_BUILDERS, TASK_BUILDER_GROUP, name, "task builder")
+
+
+def available_dataset_readers() -> List[str]:
+    return _available(DATASET_READERS, DATASET_READER_GROUP)
+
+
+def available_task_builders() -> List[str]:
+    return _available(TASK_BUILDERS, TASK_BUILDER_GROUP)
+
+
+def run_sft_tasks(
+    dataset: str,
+    source: str,
+    task_types: Iterable[str],
+    images_base_dir: str,
+    output_dir: str,
+    category_mapping: Optional[Dict[int, str]] = None,
+    reader_options: Optional[Dict[str, Any]] = None,
+    task_options: Optional[Dict[str, Dict[str, Any]]] = None,
+    image_index_path: Optional[str] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    Convert one dataset into SFT QA pairs for several task types in a single pass.
+
+    Every annotation record produced by the dataset reader is handed to each task builder in turn,
+    so the annotations are parsed once no matter how many task types are generated. Each task type
+    is streamed to its own `sft_<task>.jsonl` file in `output_dir`.
+
+    Args:
+        dataset (str): Dataset reader name, e.g. "visdrone_det" (raw annotation folder) or
+                       "detection_tasks" (an existing detection task file).
+        source (str): Path handed to the reader.
+        task_types (Iterable[str]): Task builder names, e.g. ["detection", "counting"].
+        images_base_dir (str): Directory containing the images.
+        output_dir (str): Directory receiving one `sft_<task>.jsonl` file per task type.
+        category_mapping (Optional[Dict[int, str]]): Category ID to name mapping shared by all builders.
+        reader_options (Optional[Dict[str, Any]]): Extra keyword arguments for the reader.
+        task_options (Optional[Dict[str, Dict[str, Any]]]): Extra keyword arguments per task builder.
+        image_index_path (Optional[str]): Where the shared image index is persisted.
+        instrumentation (Optional[Instrumentation]): Records the pass as the "sft_tasks" stage, with
+                                                     records and conversations per task type counted.
+        compression (Optional[str]): "gzip" or "zstd" writes `sft_<task>.jsonl.gz` / `.zst`, compressed on the fly.
+        compression_level (Optional[int]): Compression level; None uses the codec default.
+
+    Returns:
+        Dict[str, str]: Task type -> output path.
+    """
+    task_types = list(task_types)
+    task_options = task_options or {}
+    reader = get_dataset_reader(dataset)
+    builder_classes = {task: get_task_builder(task) for task in task_types}
+    read_dimensions = any(getattr(cls, "needs_image_dimensions", False) for cls in builder_classes.values())
+    image_index = ImageIndex(images_base_dir, image_index_path, read_dimensions=read_dimensions)
+    builders = {
+        task: cls(images_base_dir, category_mapping=category_mapping, image_index=image_index, **task_options.get(task, {}))
+        for task, cls in builder_classes.items()
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_paths = {
+        task: with_compression_suffix(os.path.join(output_dir, f"sft_{task}.jsonl"), compression) for task in task_types
+    }
+    handles = {task: open_text(path, 'w', compression_level) for task, path in output_paths.items()}
+    stage = instrumentation.stage("sft_tasks", unit="records") if instrumentation is not None else nullcontext()
+    with stage as progress:
+        try:
+            for record in reader(source, **(reader_options or {})):
+                for task, builder in builders.items():
+                    sft_records = builder.build(record)
+                    for sft_record in sft_records:
+                        handles[task].write(dumps_compact(sft_record))
+                        handles[task].write("\n")
+                    if progress is not None and sft_records:
+                        progress.count(**{f"{task}_conversations": len(sft_records)})
+                if progress is not None:
+                    progress.advance()
+        finally:
+            for handle in handles.values():
+                handle.close()
+        if progress is not None:
+            progress.count(bytes_written=sum(path_bytes(path) for path in output_paths.values()))
+
+    print("\n=== Multi-task Processing Summary ===")
+    for task, builder in builders.items():
+        summary = ", ".join(f"{k}={v}" for k, v in builder.summary().items())
+        print(f"- {task}: {summary} → {output_paths[task]}")
+    return output_paths
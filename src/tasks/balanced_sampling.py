@@ -0,0 +1,134 @@
+# src/tasks/balanced_sampling.py
+
+import random
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from tasks.dataset_statistics import DatasetStatistics, record_categories
+from utils.instrumentation import StageMetrics
+
+# "ignored" regions (category 0) mark areas without annotations; they never decide a record's stratum
+DEFAULT_IGNORE_CATEGORIES = (0,)
+
+
+def balanced_quotas(stratum_sizes: Dict[Hashable, int], target_size: int) -> Dict[Hashable, int]:
+    """
+    Split `target_size` as evenly as possible over the strata (water-filling).
+
+    Strata smaller than their equal share are taken whole and the rest of their share goes to the
+    larger strata, so the quotas add up to `min(target_size, total size)`.
+    """
+    quotas = {}
+    remaining = target_size
+    # Smallest strata first; the key's string form breaks ties reproducibly
+    pending = sorted(stratum_sizes.items(), key=lambda item: (item[1], str(item[0])))
+    for n, (stratum, size) in enumerate(pending):
+        share = -(-remaining // (len(pending) - n))  # ceil, so the division remainder is not lost
+        quotas[stratum] = min(size, share)
+        remaining -= quotas[stratum]
+    return quotas
+
+
+class StratifiedReservoirSampler:
+    """
+    Seeded reservoir sampling (Algorithm R) with a fixed quota per stratum.
+
+    Each stratum keeps a uniform random sample of `quotas[stratum]` of the items offered to it, in
+    memory proportional to the quotas rather than to the stream. Items of strata without a quota
+    are dropped as they arrive. The same seed and stream give the same sample.
+    """
+
+    def __init__(self, quotas: Dict[Hashable, int], seed: Optional[int] = 0):
+        self.quotas = quotas
+        self.rng = random.Random(seed)
+        self.seen: Counter = Counter()
+        self.reservoirs: Dict[Hashable, List[Tuple[int, Any]]] = {stratum: [] for stratum in quotas}
+        self.offered = 0
+
+    def offer(self, stratum: Hashable, item: Any) -> None:
+        index = self.offered
+        self.offered += 1
+        quota = self.quotas.get(stratum, 0)
+        if not quota:
+            return
+        seen = self.seen[stratum]
+        self.seen[stratum] = seen + 1
+        reservoir = self.reservoirs[stratum]
+        if seen < quota:
+            reservoir.append((index, item))
+        else:
+            slot = self.rng.randrange(seen + 1)
+            if slot < quota:
+                reservoir[slot] = (index, item)
+
+    def samples(self) -> List[Any]:
+        """The sampled items of all strata, in the order they were offered."""
+        kept = sorted((entry for reservoir in self.reservoirs.values() for entry in reservoir), key=lambda entry: entry[0])
+        return [item for _, item in kept]
+
+
+class CategoryBalancedSampler:
+    """
+    Draws a category-balanced subset of `target_size` detection task records from a record stream.
+
+    Every record is assigned to the stratum of its rarest category (fewest images in `statistics`,
+    ignoring `ignore_categories`), so an image with one bus among fifty cars counts as a bus image.
+    Records with only ignored categories have no category to balance and are dropped, so the whole
+    target is shared by the real categories; `keep_ignored_only` samples them as one more stratum.
+    The `statistics` pass gives the exact number of records per stratum up front, which fixes the
+    quotas (`balanced_quotas`) before sampling; the sample itself is then drawn in a single pass with
+    `StratifiedReservoirSampler`, holding at most `target_size` records in memory.
+
+    `statistics` must come from the same records in the same order (see `compute_dataset_statistics`).
+    """
+
+    def __init__(
+        self,
+        statistics: DatasetStatistics,
+        target_size: int,
+        seed: Optional[int] = 0,
+        ignore_categories: Iterable[int] = DEFAULT_IGNORE_CATEGORIES,
+        keep_ignored_only: bool = False
+    ):
+        if target_size <= 0:
+            raise ValueError(f"target_size must be positive, got {target_size}")
+        self.statistics = statistics
+        self.target_size = target_size
+        self.ignore_categories = frozenset(ignore_categories)
+        self.stratum_sizes: Counter = Counter()
+        for categories, count in statistics.record_signatures.items():
+            self.stratum_sizes[self.stratum(categories)] += count
+        # Strata without a quota are dropped by the sampler
+        if not keep_ignored_only:
+            self.stratum_sizes.pop(None, None)
+        self.quotas = balanced_quotas(self.stratum_sizes, target_size)
+        self.sampler = StratifiedReservoirSampler(self.quotas, seed)
+
+    def stratum(self, categories: Iterable[int]) -> Optional[int]:
+        """The rarest category among `categories`, or None if only ignored categories are present."""
+        candidates = [category_id for category_id in categories if category_id not in self.ignore_categories]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda category_id: (self.statistics.category_images[category_id], category_id))
+
+    def sample(self, records: Iterable[Dict[str, Any]], progress: Optional[StageMetrics] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Offer every record to the sampler, then yield the sampled records in their original order.
+        `progress` (see `utils/instrumentation.py`) is advanced once per record offered.
+        """
+        for record in records:
+            self.sampler.offer(self.stratum(record_categories(record)), record)
+            if progress is not None:
+                progress.advance()
+        yield from self.sampler.samples()
+
+    def summary(self) -> str:
+        strata = ", ".join(
+            f"{self.statistics.category_name(stratum) if stratum is not None else 'ignored_only'}="
+            f"{quota}/{self.stratum_sizes[stratum]}"
+            for stratum, quota in sorted(self.quotas.items(), key=lambda item: -item[1])
+        )
+        excluded = self.statistics.records - sum(self.stratum_sizes.values())
+        return (f"[Balanced sample] {sum(self.quotas.values())} of {self.statistics.records} records "
+                f"(target {self.target_size}, {excluded} with only ignored categories left out); "
+                f"sampled/available per rarest category: {strata}")
@@ -0,0 +1,182 @@
+# src/tasks/box_normalization.py
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tasks.bulk_parser import parse_annotation_files
+from tasks.parse_report import new_file_stats
+from utils.image_index import ImageIndex
+
+# Reasons a parsed box is filtered out, in the order they are checked; each box counts once, for the first match
+FILTER_REASONS = ("ignored_category", "truncated", "occluded", "unknown_image_size", "too_small")
+
+
+class BoxNormalizer:
+    """
+    Vectorized validation / normalization stage for VisDrone boxes, applied to whole per-image arrays.
+
+    Steps, each a single NumPy expression over all boxes of an image:
+      1. drop ignored categories (VisDrone 0 "ignored regions" and 11 "others" by default)
+      2. drop boxes whose truncation / occlusion level exceeds the configured maximum
+         (VisDrone truncation: 0 none, 1 partial; occlusion: 0 none, 1 partial, 2 heavy)
+      3. convert (left, top, width, height) to (x1, y1, x2, y2)
+      4. clip to the image bounds, looked up in an `ImageIndex` of `images_base_dir` (read from the headers once)
+      5. drop boxes narrower or shorter than `min_size` pixels after clipping (zero-area boxes)
+      6. optionally rescale to an integer 0..`normalize_scale` grid (e.g. 1000 for VLMs)
+
+    An instance is a picklable, per-file parse function returning (detections, file_stats), so it
+    runs inside the parser worker processes; `parse_batch` does the same for a batch of files in one
+    vectorized pass, which is how `iter_parsed_files` runs it. Filtered boxes are counted into
+    `file_stats["filtered"]`.
+
+    `image_index` is the shared index of `images_base_dir` built with `read_dimensions=True`; without
+    one it is built here when image sizes are needed, persisted to `image_index_path` when given.
+    """
+
+    def __init__(
+        self,
+        images_base_dir: Optional[str] = None,
+        excluded_categories: Sequence[int] = (0, 11),
+        max_truncation: Optional[int] = 1,
+        max_occlusion: Optional[int] = 1,
+        clip_to_image: bool = True,
+        min_size: float = 1.0,
+        normalize_scale: Optional[int] = None,
+        image_index: Optional[ImageIndex] = None,
+        image_index_path: Optional[str] = None
+    ):
+        if normalize_scale and not images_base_dir:
+            raise ValueError("normalize_scale needs images_base_dir to read the image sizes")
+        self.images_base_dir = images_base_dir
+        self.excluded_categories = tuple(excluded_categories)
+        self.max_truncation = max_truncation
+        self.max_occlusion = max_occlusion
+        self.clip_to_image = clip_to_image
+        self.min_size = min_size
+        self.normalize_scale = normalize_scale
+        self.image_index = None
+        if self.uses_image_size:
+            if image_index is None:
+                image_index = ImageIndex(images_base_dir, image_index_path, read_dimensions=True)
+            elif not image_index.read_dimensions:
+                raise ValueError("BoxNormalizer needs an ImageIndex built with read_dimensions=True")
+            self.image_index = image_index
+
+    @property
+    def uses_image_size(self) -> bool:
+        return bool(self.images_base_dir) and (self.clip_to_image or bool(self.normalize_scale))
+
+    def settings(self) -> Dict[str, Any]:
+        """Settings that change the output, for cache keys; the image sizes are keyed per file (`image_size`)."""
+        return {
+            "images_base_dir": os.path.abspath(self.images_base_dir) if self.uses_image_size else None,
+            "excluded_categories": list(self.excluded_categories),
+            "max_truncation": self.max_truncation,
+            "max_occlusion": self.max_occlusion,
+            "clip_to_image": self.clip_to_image,
+            "min_size": self.min_size,
+            "normalize_scale": self.normalize_scale,
+        }
+
+    def image_size(self, txt_path: str) -> Optional[Tuple[int, int]]:
+        """(width, height) of the image of an annotation file from the image index, or None if unknown or unused."""
+        if self.image_index is None:
+            return None
+        return self.image_index.dimensions(os.path.basename(txt_path).replace('.txt', '.jpg'))
+
+    def apply(
+        self,
+        values: np.ndarray,
+        image_size: Optional[Tuple[int, int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+        """
+        Normalize an (N, 8) array of VisDrone-DET rows (see `tasks/bulk_parser.py`).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, Dict[str, int]]: (kept boxes (M, 4) as x1, y1, x2, y2,
+                                                            their category ids (M,), filtered count per reason)
+        """
+        sizes = np.tile(np.array(image_size if image_size is not None else (np.nan, np.nan), dtype=np.float64),
+                        (len(values), 1))
+        boxes, category_ids, reasons = self._normalize_rows(values, sizes)
+        counts = np.bincount(reasons, minlength=len(FILTER_REASONS) + 1)[1:]
+        filtered = {reason: int(count) for reason, count in zip(FILTER_REASONS, counts.tolist()) if count}
+        keep = reasons == 0
+        return boxes[keep], category_ids[keep], filtered
+
+    def _normalize_rows(self, values: np.ndarray, sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Steps 1-6 over rows of any number of images; `sizes` holds the (width, height) of each row's
+        image, NaN if unknown. Returns (boxes (N, 4), category ids (N,), filter reason code per row, 0 = kept).
+        """
+        category_ids = values[:, 5].astype(np.int64)
+        boxes = np.empty((len(values), 4), dtype=np.float64)
+        boxes[:, :2] = values[:, 0:2]
+        boxes[:, 2:] = values[:, 0:2] + values[:, 2:4]
+        known_size = ~np.isnan(sizes[:, 0])
+
+        if self.clip_to_image:
+            limits = np.tile(sizes, 2)
+            clipped = np.clip(boxes, 0, limits)
+            boxes = np.where(known_size[:, None], clipped, boxes)
+
+        # NaN (missing optional columns) compares False and therefore never filters a box
+        reasons = np.zeros(len(values), dtype=np.uint8)
+        checks = [
+            np.isin(category_ids, self.excluded_categories),
+            values[:, 6] > self.max_truncation if self.max_truncation is not None else None,
+            values[:, 7] > self.max_occlusion if self.max_occlusion is not None else None,
+            ~known_size if self.normalize_scale else None,
+            ((boxes[:, 2] - boxes[:, 0]) < self.min_size) | ((boxes[:, 3] - boxes[:, 1]) < self.min_size),
+        ]
+        # Assign in reverse so the first matching reason wins
+        for code in range(len(checks), 0, -1):
+            if checks[code - 1] is not None:
+                reasons[checks[code - 1]] = code
+
+        if self.normalize_scale:
+            boxes = np.rint(boxes * self.normalize_scale / np.tile(sizes, 2))
+        return boxes, category_ids, reasons
+
+    def parse_batch(self, txt_paths: Sequence[str]) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Parse and normalize a batch of annotation files at once and return one (detections, file_stats)
+        pair per file. The files are parsed as one buffer (`bulk_parser.parse_annotation_files`) and
+        normalized in a single pass over all of their rows, with each row's image size looked up per file.
+        """
+        file_stats = [new_file_stats() for _ in txt_paths]
+        values, offsets, _ = parse_annotation_files(txt_paths, file_stats)
+        rows_per_file = np.diff(offsets)
+        file_sizes = np.array([self.image_size(txt_path) or (np.nan, np.nan) for txt_path in txt_paths],
+                              dtype=np.float64).reshape(len(txt_paths), 2)
+        boxes, category_ids, reasons = self._normalize_rows(values, np.repeat(file_sizes, rows_per_file, axis=0))
+
+        # Filter counts of all files with one bincount over (file, reason) keys
+        file_index = np.repeat(np.arange(len(txt_paths)), rows_per_file)
+        num_codes = len(FILTER_REASONS) + 1
+        counts = np.bincount(file_index * num_codes + reasons, minlength=len(txt_paths) * num_codes)
+        counts = counts.reshape(len(txt_paths), num_codes)[:, 1:].tolist()
+
+        keep = reasons == 0
+        boxes, category_ids = boxes[keep], category_ids[keep]
+        if self.normalize_scale:
+            boxes = boxes.astype(np.int64)
+        kept_offsets = np.concatenate(([0], np.cumsum(np.bincount(file_index[keep], minlength=len(txt_paths))))).tolist()
+        box_rows, category_rows = boxes.tolist(), category_ids.tolist()
+        labels = {category_id: f"class_{category_id}" for category_id in set(category_rows)}
+
+        results = []
+        for i, stats in enumerate(file_stats):
+            stats["filtered"] = {reason: count for reason, count in zip(FILTER_REASONS, counts[i]) if count}
+            start, end = kept_offsets[i], kept_offsets[i + 1]
+            detections = [
+                {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "label": labels[category_id], "category_id": category_id}
+                for (x1, y1, x2, y2), category_id in zip(box_rows[start:end], category_rows[start:end])
+            ]
+            results.append((detections, stats))
+        return results
+
+    def __call__(self, txt_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        return self.parse_batch([txt_path])[0]
@@ -0,0 +1,382 @@
+# src/tasks/bulk_parser.py
+
+import io
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tasks.parse_report import new_file_stats
+from utils.jsonl_utils import dumps_compact
+from utils.logger import get_parser_logger
+
+# Same logger and log file as tasks/detection_task.py
+logger = get_parser_logger()
+
+# The eight VisDrone-DET annotation columns, in file order
+VISDRONE_DET_COLUMNS = (
+    "bbox_left", "bbox_top", "bbox_width", "bbox_height",
+    "score", "object_category", "truncation", "occlusion",
+)
+NUM_COLUMNS = len(VISDRONE_DET_COLUMNS)
+# Columns that must be present and numeric for a row to be kept (same rule as parse_visdrone_txt)
+REQUIRED_COLUMNS = (0, 1, 2, 3, 5)
+MIN_FIELDS = max(REQUIRED_COLUMNS) + 1
+
+# Row error codes used by the vectorized masks; code 0 means the row is valid
+ERROR_TYPES = ("", "empty_line", "insufficient_fields", "value_error", "nan_value", "negative_size")
+(OK, EMPTY_LINE, INSUFFICIENT_FIELDS, VALUE_ERROR, NAN_VALUE, NEGATIVE_SIZE) = range(len(ERROR_TYPES))
+
+
+def _parse_row_slow(
+    row: bytes,
+    num_columns: int = NUM_COLUMNS,
+    required_columns: Sequence[int] = REQUIRED_COLUMNS
+) -> Tuple[np.ndarray, int]:
+    """Parse a single row the slow way; returns (values, error code)."""
+    values = np.full(num_columns, np.nan)
+    for col, token in enumerate(row.split(b',')[:num_columns]):
+        token = token.strip()
+        if not token and col not in required_columns:
+            continue
+        try:
+            values[col] = float(token)
+        except ValueError:
+            if col in required_columns:
+                return values, VALUE_ERROR
+    return values, OK
+
+
+# Per-byte weights of the vectorized row checks: one lookup and one `cumsum` count, per line, the
+# non-whitespace bytes, the commas and the bytes outside the numeric set ("nan", stray letters, ...),
+# each in its own bit field. Rows with non-numeric bytes are parsed row by row instead of by `np.loadtxt`.
+_COUNT_BITS = 20
+_BYTE_WEIGHTS = np.ones(256, dtype=np.int64) + (np.int64(1) << (2 * _COUNT_BITS))
+_BYTE_WEIGHTS[np.frombuffer(b" \t\r\n\x0b\x0c", dtype=np.uint8)] = 0
+_BYTE_WEIGHTS[np.frombuffer(b"0123456789.+-eE", dtype=np.uint8)] = 1
+_BYTE_WEIGHTS[ord(",")] = 1 + (1 << _COUNT_BITS)
+# Bytes that only occur in non-integer numbers ("4.0", "4e0", "inf"); `int()` rejects them in a category
+_NON_INTEGER_BYTES = np.zeros(256, dtype=bool)
+_NON_INTEGER_BYTES[np.frombuffer(b".eEiI", dtype=np.uint8)] = True
+# Annotation files parsed together by `parse_visdrone_batch_with_stats`; large enough to amortize the
+# fixed cost of the NumPy calls, small enough to keep every worker of a process pool busy
+BULK_BATCH_FILES = 256
+
+
+def _line_byte_counts(buf: np.ndarray, line_ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per line: (non-whitespace bytes, commas, non-numeric bytes), given the positions of the line-ending newlines."""
+    line_lengths = np.diff(line_ends, prepend=-1)
+    if line_lengths.max() >= 1 << _COUNT_BITS:
+        raise ValueError(f"Annotation lines longer than {1 << _COUNT_BITS} bytes are not supported")
+    packed = np.diff(np.cumsum(_BYTE_WEIGHTS[buf])[line_ends], prepend=0)
+    field_mask = (1 << _COUNT_BITS) - 1
+    return packed & field_mask, (packed >> _COUNT_BITS) & field_mask, packed >> (2 * _COUNT_BITS)
+
+
+def _lines_with_bytes_in_field(
+    buf: np.ndarray,
+    line_starts: np.ndarray,
+    line_ends: np.ndarray,
+    column: int,
+    byte_mask: np.ndarray
+) -> np.ndarray:
+    """Per line: True if field `column` contains a byte selected by `byte_mask` (a 256-entry lookup table)."""
+    flagged = np.zeros(len(line_ends), dtype=bool)
+    positions = np.flatnonzero(byte_mask[buf])
+    if not len(positions):
+        return flagged
+    # Field index of a byte = commas between its line start and the byte
+    comma_positions = np.flatnonzero(buf == ord(","))
+    lines = np.searchsorted(line_ends, positions)
+    fields = np.searchsorted(comma_positions, positions) - np.searchsorted(comma_positions, line_starts[lines])
+    flagged[lines[fields == column]] = True
+    return flagged
+
+
+def _load_rows(
+    buf: np.ndarray,
+    line_starts: np.ndarray,
+    line_ends: np.ndarray,
+    rows: np.ndarray,
+    num_fields: int
+) -> Optional[np.ndarray]:
+    """
+    Convert the selected rows of `buf` with NumPy's C tokenizer in one call; None if the block
+    contains a malformed token (the caller then falls back to row-by-row parsing).
+    """
+    if len(rows) == len(line_ends):
+        block = buf
+    else:
+        selected = np.zeros(len(line_ends), dtype=bool)
+        selected[rows] = True
+        block = buf[np.repeat(selected, line_ends - line_starts + 1)]
+    try:
+        values = np.loadtxt(
+            io.BytesIO(block.tobytes()), delimiter=',', usecols=range(num_fields), comments=None, ndmin=2,
+            dtype=np.float64
+        )
+    except ValueError:
+        return None
+    return values if len(values) == len(rows) else None
+
+
+def parse_annotation_buffer(
+    data: bytes,
+    num_columns: int = NUM_COLUMNS,
+    required_columns: Sequence[int] = REQUIRED_COLUMNS,
+    category_column: int = 5,
+    size_columns: Tuple[int, int] = (2, 3)
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse and validate every line of a buffer of comma-separated rows with whole-buffer NumPy operations.
+
+    Blank lines, field counts and non-numeric bytes are found with per-line byte counts (a single
+    table lookup and `cumsum` over the buffer), the plain numeric rows of each field count are converted by a single
+    `np.loadtxt` call, and only rows with other content (e.g. "nan" or stray letters) are
+    parsed one by one. Rows need every required column; `category_column` must hold an
+    integer written as one (as `int()` in `parse_visdrone_txt` requires, so "4.0" is rejected)
+    and `size_columns` must not be negative.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: (values of shape (L, num_columns), NaN where
+                                                                missing; error code per line (0 = valid);
+                                                                line start and end offsets in `data`)
+    """
+    if data and not data.endswith(b"\n"):
+        data += b"\n"
+    buf = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(buf == ord("\n"))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1)).astype(np.int64)
+    values = np.full((len(line_ends), num_columns), np.nan)
+    errors = np.zeros(len(line_ends), dtype=np.uint8)
+    if not len(line_ends):
+        return values, errors, line_starts, line_ends
+
+    non_whitespace, commas, non_numeric = _line_byte_counts(buf, line_ends)
+    blank = non_whitespace == 0
+    num_fields = commas + 1
+    plain = non_numeric == 0
+    errors[blank] = EMPTY_LINE
+    errors[~blank & (num_fields < max(required_columns) + 1)] = INSUFFICIENT_FIELDS
+
+    candidates = errors == OK
+    slow = candidates & ~plain
+    used_fields = np.minimum(num_fields, num_columns)
+    for field_count in np.unique(used_fields[candidates & plain]).tolist():
+        rows = np.flatnonzero(candidates & plain & (used_fields == field_count))
+        block_values = _load_rows(buf, line_starts, line_ends, rows, field_count)
+        if block_values is None:
+            slow[rows] = True
+        else:
+            values[rows, :field_count] = block_values
+    for i in np.flatnonzero(slow).tolist():
+        values[i], errors[i] = _parse_row_slow(
+            data[line_starts[i]:line_ends[i]].strip(), num_columns, required_columns
+        )
+
+    parsed = errors == OK
+    nan_value = parsed & np.isnan(values[:, list(required_columns)]).any(axis=1)
+    category = values[:, category_column]
+    bad_category = parsed & ~nan_value & (
+        ~np.isfinite(category) | (category != np.floor(category))
+        | _lines_with_bytes_in_field(buf, line_starts, line_ends, category_column, _NON_INTEGER_BYTES)
+    )
+    width, height = values[:, size_columns[0]], values[:, size_columns[1]]
+    negative_size = parsed & ~nan_value & ((width < 0) | (height < 0))
+    errors[negative_size] = NEGATIVE_SIZE
+    errors[bad_category] = VALUE_ERROR
+    errors[nan_value] = NAN_VALUE
+    return values, errors, line_starts, line_ends
+
+
+def parse_visdrone_array(
+    txt_path: str,
+    file_stats: Optional[Dict[str, Any]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a whole VisDrone annotation file into a 2-D float array in one pass.
+
+    Rows are validated with vectorized masks (field count, numeric values, NaN, integral
+    category, negative box size) and converted by `np.loadtxt` (see `parse_annotation_buffer`).
+    All eight VisDrone columns are kept; optional columns missing from short rows are NaN.
+    Invalid rows are logged with their line numbers and counted into `file_stats`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (values of shape (N, 8) ordered as `VISDRONE_DET_COLUMNS`,
+                                        1-based line numbers of the kept rows)
+    """
+    return parse_annotation_array(txt_path, file_stats)
+
+
+def parse_annotation_array(
+    txt_path: str,
+    file_stats: Optional[Dict[str, Any]] = None,
+    num_columns: int = NUM_COLUMNS,
+    required_columns: Sequence[int] = REQUIRED_COLUMNS,
+    category_column: int = 5,
+    size_columns: Tuple[int, int] = (2, 3)
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    `parse_visdrone_array` for any comma-separated VisDrone-style column layout (e.g. the ten
+    VisDrone-VID/MOT columns in `tasks/trajectory_task.py`).
+    """
+    values, _, line_numbers = parse_annotation_files(
+        [txt_path], None if file_stats is None else [file_stats], num_columns, required_columns, category_column,
+        size_columns
+    )
+    return values, line_numbers
+
+
+def parse_annotation_files(
+    txt_paths: Sequence[str],
+    file_stats: Optional[Sequence[Dict[str, Any]]] = None,
+    num_columns: int = NUM_COLUMNS,
+    required_columns: Sequence[int] = REQUIRED_COLUMNS,
+    category_column: int = 5,
+    size_columns: Tuple[int, int] = (2, 3)
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a batch of annotation files as one concatenated buffer (see `parse_annotation_buffer`),
+    so the fixed cost of the NumPy calls is paid once per batch instead of once per file.
+    `file_stats` holds one counter dict per file (see `parse_report.new_file_stats`).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (kept values of all files, shape (N, num_columns);
+                                                    file offsets: file i owns rows [offsets[i], offsets[i + 1]);
+                                                    1-based line numbers of the kept rows within their file)
+    """
+    chunks = []
+    for txt_path in txt_paths:
+        with open(txt_path, 'rb') as f:
+            chunk = f.read()
+        chunks.append(chunk if not chunk or chunk.endswith(b"\n") else chunk + b"\n")
+    data = b"".join(chunks)
+    values, errors, line_starts, line_ends = parse_annotation_buffer(
+        data, num_columns, required_columns, category_column, size_columns
+    )
+
+    lines_per_file = np.fromiter((chunk.count(b"\n") for chunk in chunks), dtype=np.int64, count=len(chunks))
+    file_of_line = np.repeat(np.arange(len(chunks)), lines_per_file)
+    first_line = np.concatenate(([0], np.cumsum(lines_per_file)))
+    keep = errors == OK
+    kept_files = file_of_line[keep]
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(kept_files, minlength=len(chunks))))).astype(np.int64)
+    line_numbers = np.flatnonzero(keep) - first_line[kept_files] + 1
+
+    for i in np.flatnonzero(~keep).tolist():
+        error_type = ERROR_TYPES[errors[i]]
+        file_index = file_of_line[i]
+        if file_stats is not None:
+            file_errors = file_stats[file_index]["errors"]
+            file_errors[error_type] = file_errors.get(error_type, 0) + 1
+        if error_type == "empty_line":
+            continue
+        content = data[line_starts[i]:line_ends[i]].decode('utf-8', errors='replace').strip()
+        logger.warning(f"{txt_paths[file_index]} [Line {i - first_line[file_index] + 1}] ❌ Parsing failed "
+                       f"({error_type.replace('_', ' ')}): {content}")
+
+    kept_values = values[keep]
+    if file_stats is not None:
+        _count_categories(file_stats, kept_files, kept_values[:, category_column], lines_per_file, offsets)
+    return kept_values, offsets, line_numbers
+
+
+def _count_categories(
+    file_stats: Sequence[Dict[str, Any]],
+    kept_files: np.ndarray,
+    categories: np.ndarray,
+    lines_per_file: np.ndarray,
+    offsets: np.ndarray
+) -> None:
+    """Add line, valid-row and per-category counts to every file's counters with one `np.unique`."""
+    for stats, total_lines, valid in zip(file_stats, lines_per_file.tolist(), np.diff(offsets).tolist()):
+        stats["total_lines"] += total_lines
+        stats["valid"] += valid
+    if not len(categories):
+        return
+    categories = categories.astype(np.int64)
+    low = int(categories.min())
+    span = int(categories.max()) - low + 1
+    keys, counts = np.unique(kept_files * span + (categories - low), return_counts=True)
+    for key, count in zip(keys.tolist(), counts.tolist()):
+        file_index, category_id = divmod(key, span)
+        file_categories = file_stats[file_index]["categories"]
+        category_id += low
+        file_categories[category_id] = file_categories.get(category_id, 0) + count
+
+
+def parse_visdrone_files_array(
+    txt_paths: Sequence[str],
+    file_stats: Optional[Dict[str, Any]] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a batch of annotation files into one array, with all counters merged into `file_stats`.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (values of shape (N, 8), index of the source file
+                                                    in `txt_paths` per row, 1-based line numbers)
+    """
+    per_file = [new_file_stats() for _ in txt_paths] if file_stats is not None else None
+    values, offsets, line_numbers = parse_annotation_files(txt_paths, per_file)
+    if per_file is not None:
+        for stats in per_file:
+            file_stats["total_lines"] += stats["total_lines"]
+            file_stats["valid"] += stats["valid"]
+            for key in ("errors", "categories"):
+                for name, count in stats[key].items():
+                    file_stats[key][name] = file_stats[key].get(name, 0) + count
+    file_index = np.repeat(np.arange(len(txt_paths), dtype=np.int64), np.diff(offsets))
+    return values, file_index, line_numbers
+
+
+def detections_from_array(values: np.ndarray) -> List[Dict[str, Any]]:
+    """Turn rows of a parsed array into the detection dicts returned by `parse_visdrone_txt`."""
+    return [
+        {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "label": f"class_{category_id}", "category_id": category_id}
+        for (x1, y1, x2, y2), category_id in zip(values[:, :4].tolist(), values[:, 5].astype(np.int64).tolist())
+    ]
+
+
+# Compact JSON of one detection dict of `detections_from_array`; float %r matches `json.dumps`
+_DETECTION_JSON = '{"x1":%r,"y1":%r,"x2":%r,"y2":%r,"label":"class_%d","category_id":%d}'
+
+
+def encode_task_record(record: Dict[str, Any]) -> str:
+    """
+    `dumps_compact` for task records whose "detections" (the last field) may still be a parsed
+    array; the detection JSON is formatted straight from the array rows, without a dict per box.
+    """
+    values = record["detections"]
+    if not isinstance(values, np.ndarray) or not np.isfinite(values[:, :4]).all():
+        return dumps_compact({**record, "detections": detections_from_array(values)} if isinstance(values, np.ndarray)
+                             else record)
+    head = dumps_compact({key: value for key, value in record.items() if key != "detections"})
+    detections = ",".join([
+        _DETECTION_JSON % (x1, y1, x2, y2, category_id, category_id)
+        for (x1, y1, x2, y2), category_id in zip(values[:, :4].tolist(), values[:, 5].astype(np.int64).tolist())
+    ])
+    return f'{head[:-1]},"detections":[{detections}]}}'
+
+
+def arrays_from_detections(detections: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Inverse of `detections_from_array`: pack detection dicts into (boxes of shape (N, 4) in x1, y1, x2, y2
+    field order, category ids of shape (N,)). Missing coordinates become NaN.
+    """
+    if not detections:
+        return np.empty((0, 4), dtype=np.float64), np.empty(0, dtype=np.int64)
+    boxes = np.array(
+        [(det.get("x1"), det.get("y1"), det.get("x2"), det.get("y2")) for det in detections], dtype=np.float64
+    )
+    category_ids = np.fromiter((det.get("category_id", -1) for det in detections), dtype=np.int64, count=len(detections))
+    return boxes, category_ids
+
+
+def parse_visdrone_batch_with_stats(txt_paths: Sequence[str]) -> List[Tuple[np.ndarray, Dict[str, Any]]]:
+    """
+    Parse a batch of annotation files at once (see `parse_annotation_files`) and return one
+    (values of shape (N, 8), file_stats) pair per file. Detections stay arrays; they are
+    turned into dicts (`detections_from_array`) only where a JSON writer needs them.
+    """
+    file_stats = [new_file_stats() for _ in txt_paths]
+    values, offsets, _ = parse_annotation_files(txt_paths, file_stats)
+    return [(values[offsets[i]:offsets[i + 1]], file_stats[i]) for i in range(len(txt_paths))]
@@ -0,0 +1,193 @@
+# src/tasks/columnar.py
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+COLUMNAR_FORMAT = "detection_columnar"
+COLUMNAR_VERSION = 1
+META_FILE = "meta.json"
+IMAGE_FILES_FILE = "image_files.json"
+
+# Column name -> (file name, dtype, number of values per row)
+COLUMNS = {
+    "boxes": ("boxes.f32", np.float32, 4),             # x1, y1, x2, y2 fields of the task records
+    "category_ids": ("category_ids.i32", np.int32, 1),
+    "image_index": ("image_index.i32", np.int32, 1),   # row -> position in the image string table
+    "image_offsets": ("image_offsets.i64", np.int64, 1),  # image i owns rows [offsets[i], offsets[i + 1])
+    "image_ids": ("image_ids.i64", np.int64, 1),
+}
+
+
+def is_columnar_path(path: str) -> bool:
+    """Return True if the path is a columnar task directory written by `ColumnarTaskWriter`."""
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class ColumnarTaskWriter:
+    """
+    Streams per-image detections into a directory of contiguous binary columns.
+
+    Each column is appended to its own raw little-endian file as images arrive, so writing
+    needs constant memory; the image string table and `meta.json` are written on `close()`.
+    A directory without `meta.json` is an incomplete write and is not picked up by readers.
+    """
+
+    def __init__(self, output_dir: str, record_fields: Optional[Dict[str, Any]] = None):
+        self.output_dir = output_dir
+        # Fields shared by every task record (e.g. "box_format"), restored by `ColumnarTasks`
+        self.record_fields = dict(record_fields or {})
+        os.makedirs(output_dir, exist_ok=True)
+        meta_path = os.path.join(output_dir, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        self._handles = {
+            name: open(os.path.join(output_dir, file_name), 'wb')
+            for name, (file_name, _, _) in COLUMNS.items()
+        }
+        self.image_files: List[str] = []
+        self.num_detections = 0
+        self._write("image_offsets", np.zeros(1, dtype=np.int64))
+
+    def _write(self, name: str, values: np.ndarray) -> None:
+        _, dtype, _ = COLUMNS[name]
+        np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tofile(self._handles[name])
+
+    def add_image(self, image_id: int, image_file: str, detections: Union[List[Dict[str, Any]], np.ndarray]) -> None:
+        """
+        Append one image. `detections` are detection dicts, or an (N, 8) array of VisDrone rows
+        from the bulk parser (boxes in columns 0-3, category in column 5), written without a dict per box.
+        """
+        count = len(detections)
+        if isinstance(detections, np.ndarray):
+            boxes, category_ids = detections[:, :4], detections[:, 5]
+        else:
+            boxes = np.array([(d["x1"], d["y1"], d["x2"], d["y2"]) for d in detections], dtype=np.float32).reshape(count, 4)
+            category_ids = np.fromiter((d["category_id"] for d in detections), dtype=np.int32, count=count)
+
+        self._write("boxes", boxes)
+        self._write("category_ids", category_ids)
+        self._write("image_index", np.full(count, len(self.image_files), dtype=np.int32))
+        self.num_detections += count
+        self._write("image_offsets", np.array([self.num_detections], dtype=np.int64))
+        self._write("image_ids", np.array([image_id], dtype=np.int64))
+        self.image_files.append(image_file)
+
+    def close(self) -> None:
+        for handle in self._handles.values():
+            handle.close()
+
+        with open(os.path.join(self.output_dir, IMAGE_FILES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.image_files, f, ensure_ascii=False)
+
+        num_images = len(self.image_files)
+        rows = {
+            "boxes": self.num_detections,
+            "category_ids": self.num_detections,
+            "image_index": self.num_detections,
+            "image_offsets": num_images + 1,
+            "image_ids": num_images,
+        }
+        meta = {
+            "format": COLUMNAR_FORMAT,
+            "version": COLUMNAR_VERSION,
+            "num_images": num_images,
+            "num_detections": self.num_detections,
+            "record_fields": self.record_fields,
+            "columns": {
+                name: {
+                    "file": file_name,
+                    "dtype": np.dtype(dtype).newbyteorder('<').str,
+                    "shape": [rows[name], width] if width > 1 else [rows[name]],
+                }
+                for name, (file_name, dtype, width) in COLUMNS.items()
+            },
+        }
+        with open(os.path.join(self.output_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self) -> "ColumnarTaskWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            for handle in self._handles.values():
+                handle.close()
+
+
+class ColumnarTasks:
+    """
+    Read-only, memory-mapped view of a columnar task directory.
+
+    Columns are exposed as NumPy arrays backed by `np.memmap`, so slicing per image is zero-copy.
+    """
+
+    def __init__(self, tasks_dir: str):
+        self.tasks_dir = tasks_dir
+        with open(os.path.join(tasks_dir, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != COLUMNAR_FORMAT:
+            raise ValueError(f"{tasks_dir} is not a columnar detection task directory")
+
+        with open(os.path.join(tasks_dir, IMAGE_FILES_FILE), 'r', encoding='utf-8') as f:
+            self.image_files: List[str] = json.load(f)
+
+        self.boxes = self._map("boxes")
+        self.category_ids = self._map("category_ids")
+        self.image_index = self._map("image_index")
+        self.image_offsets = self._map("image_offsets")
+        self.image_ids = self._map("image_ids")
+
+    def _map(self, name: str) -> np.ndarray:
+        column = self.meta["columns"][name]
+        shape = tuple(column["shape"])
+        path = os.path.join(self.tasks_dir, column["file"])
+        if shape[0] == 0:
+            return np.empty(shape, dtype=column["dtype"])
+        return np.memmap(path, dtype=column["dtype"], mode='r', shape=shape)
+
+    @property
+    def num_images(self) -> int:
+        return len(self.image_files)
+
+    def image_slice(self, i: int) -> slice:
+        return slice(int(self.image_offsets[i]), int(self.image_offsets[i + 1]))
+
+    def box_values(self, rows: slice) -> List[List[Union[float, int]]]:
+        """
+        Boxes of `rows` as Python lists. Boxes rescaled to an integer grid (a `coordinate_scale` in the
+        record fields) come back as ints, as they are in the json / jsonl task files.
+        """
+        boxes = self.boxes[rows]
+        if self.meta.get("record_fields", {}).get("coordinate_scale"):
+            boxes = boxes.astype(np.int64)
+        return boxes.tolist()
+
+    def task_record(self, i: int) -> Dict[str, Any]:
+        """The grouped task record of image `i`, in the same shape as a line of `detection_tasks.jsonl`."""
+        rows = self.image_slice(i)
+        boxes = self.box_values(rows)
+        category_ids = self.category_ids[rows].tolist()
+        return {
+            "image_id": int(self.image_ids[i]),
+            "image_file": self.image_files[i],
+            "task_type": "detection",
+            **self.meta.get("record_fields", {}),
+            "detections": [
+                {"x1": x1, "y1": y1, "x2": x2, "y2": y2, "label": f"class_{cid}", "category_id": cid}
+                for (x1, y1, x2, y2), cid in zip(boxes, category_ids)
+            ]
+        }
+
+    def iter_task_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield one grouped task record per image. The SFT converter reads the columns directly
+        (`converters.to_sft_format.iter_columnar_sft_records`); this is for the record-based consumers.
+        """
+        for i in range(self.num_images):
+            yield self.task_record(i)
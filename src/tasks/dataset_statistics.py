@@ -0,0 +1,196 @@
+# src/tasks/dataset_statistics.py
+
+import json
+import os
+from bisect import bisect_right
+from collections import Counter
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from utils.category_mapping import VISDRONE_CATEGORY_MAPPING
+from utils.instrumentation import StageMetrics
+
+# Histogram bin edges: a value v falls into the bin [edges[i], edges[i + 1]), the last bin is open-ended
+BOXES_PER_IMAGE_EDGES = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Box size = sqrt(width * height) in the units of the records (pixels for raw VisDrone boxes)
+BOX_SIZE_EDGES = (0, 8, 16, 32, 64, 128, 256, 512)
+# COCO-style area classes: small < 32², medium < 96², large otherwise
+SIZE_CLASS_EDGES = (32 ** 2, 96 ** 2)
+SIZE_CLASSES = ("small", "medium", "large")
+
+
+def _bin_labels(edges: Sequence[int], integer: bool) -> List[str]:
+    labels = []
+    for low, high in zip(edges, edges[1:]):
+        if integer:
+            labels.append(str(low) if high == low + 1 else f"{low}-{high - 1}")
+        else:
+            labels.append(f"{low}-{high}")
+    labels.append(f">={edges[-1]}")
+    return labels
+
+
+BOXES_PER_IMAGE_LABELS = _bin_labels(BOXES_PER_IMAGE_EDGES, integer=True)
+BOX_SIZE_LABELS = _bin_labels(BOX_SIZE_EDGES, integer=False)
+
+
+def _bin_index(edges: Sequence[float], value: float) -> int:
+    return max(0, bisect_right(edges, value) - 1)
+
+
+def record_categories(record: Dict[str, Any]) -> FrozenSet[int]:
+    """Category ids of the detections of a task record that have all four coordinates."""
+    return frozenset(
+        det.get("category_id", -1) for det in record.get("detections", [])
+        if None not in (det.get("x1"), det.get("y1"), det.get("x2"), det.get("y2"))
+    )
+
+
+class DatasetStatistics:
+    """
+    Dataset-level histograms accumulated in one pass over detection task records.
+
+    Per category: box count, number of images containing it, box-size histogram and COCO-style
+    small / medium / large counts. Per image: boxes-per-image and categories-per-image histograms.
+    Records of the same image must be consecutive, as in the task files (one record per image, or
+    one per detection in filename order). Call `finish()` after the last record.
+
+    `record_signatures` counts the category sets of the records, so the category balance of any
+    record grouping can be worked out after the pass (see `tasks/balanced_sampling.py`).
+    """
+
+    def __init__(self, category_mapping: Optional[Dict[int, str]] = None, box_format: str = "xywh"):
+        self.category_mapping = dict(VISDRONE_CATEGORY_MAPPING if category_mapping is None else category_mapping)
+        # Raw VisDrone boxes are (left, top, width, height); normalized records say "xyxy" themselves
+        self.box_format = box_format
+        self.records = 0
+        self.images = 0
+        self.boxes = 0
+        self.category_boxes: Counter = Counter()
+        self.category_images: Counter = Counter()
+        self.category_box_sizes: Dict[int, List[int]] = {}
+        self.category_size_classes: Dict[int, List[int]] = {}
+        self.boxes_per_image = [0] * len(BOXES_PER_IMAGE_LABELS)
+        self.categories_per_image: Counter = Counter()
+        self.max_boxes_per_image = 0
+        self.record_signatures: Counter = Counter()
+        self.coordinate_scales = set()
+        self._image_open = False
+        self._image_file = None
+        self._image_boxes = 0
+        self._image_categories = set()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        image_file = record.get("image_file")
+        if self._image_open and image_file != self._image_file:
+            self._finish_image()
+        self._image_open = True
+        self._image_file = image_file
+        self.records += 1
+        if record.get("coordinate_scale"):
+            self.coordinate_scales.add(record["coordinate_scale"])
+        xyxy = record.get("box_format", self.box_format) == "xyxy"
+
+        categories = set()
+        for det in record.get("detections", []):
+            x1, y1, x2, y2 = det.get("x1"), det.get("y1"), det.get("x2"), det.get("y2")
+            if None in (x1, y1, x2, y2):
+                continue
+            category_id = det.get("category_id", -1)
+            if category_id not in self.category_mapping:
+                self.category_mapping[category_id] = det.get("label", f"class_{category_id}")
+            if category_id not in self.category_box_sizes:
+                self.category_box_sizes[category_id] = [0] * len(BOX_SIZE_LABELS)
+                self.category_size_classes[category_id] = [0] * len(SIZE_CLASSES)
+            width, height = (x2 - x1, y2 - y1) if xyxy else (x2, y2)
+            area = max(width, 0) * max(height, 0)
+            self.category_box_sizes[category_id][_bin_index(BOX_SIZE_EDGES, area ** 0.5)] += 1
+            self.category_size_classes[category_id][bisect_right(SIZE_CLASS_EDGES, area)] += 1
+            self.category_boxes[category_id] += 1
+            self._image_boxes += 1
+            categories.add(category_id)
+        self._image_categories |= categories
+        self.record_signatures[frozenset(categories)] += 1
+
+    def _finish_image(self) -> None:
+        self.images += 1
+        self.boxes += self._image_boxes
+        self.boxes_per_image[_bin_index(BOXES_PER_IMAGE_EDGES, self._image_boxes)] += 1
+        self.max_boxes_per_image = max(self.max_boxes_per_image, self._image_boxes)
+        self.categories_per_image[len(self._image_categories)] += 1
+        self.category_images.update(self._image_categories)
+        self._image_open = False
+        self._image_boxes = 0
+        self._image_categories = set()
+
+    def finish(self) -> "DatasetStatistics":
+        """Close the last image; call once after the last `add`."""
+        if self._image_open:
+            self._finish_image()
+        return self
+
+    def category_name(self, category_id: Optional[int]) -> str:
+        return self.category_mapping.get(category_id, f"class_{category_id}")
+
+    def summary(self) -> str:
+        categories = ", ".join(
+            f"{self.category_name(k)}={v}" for k, v in sorted(self.category_boxes.items(), key=lambda kv: -kv[1])
+        )
+        return (f"[Statistics] Records={self.records}, Images={self.images}, Boxes={self.boxes}, "
+                f"Boxes per image: mean={self.boxes / max(self.images, 1):.1f}, max={self.max_boxes_per_image}; "
+                f"Boxes per category: {categories or 'none'}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        box_sizes = [sum(column) for column in zip(*self.category_box_sizes.values())] or [0] * len(BOX_SIZE_LABELS)
+        size_classes = [sum(column) for column in zip(*self.category_size_classes.values())] or [0] * len(SIZE_CLASSES)
+        return {
+            "totals": {
+                "records": self.records,
+                "images": self.images,
+                "boxes": self.boxes,
+                "mean_boxes_per_image": round(self.boxes / self.images, 2) if self.images else 0,
+                "max_boxes_per_image": self.max_boxes_per_image,
+            },
+            # Box sizes are in pixels, or in 1/coordinate_scale of the image side for rescaled records
+            "coordinate_scales": sorted(self.coordinate_scales),
+            "categories": {
+                self.category_name(category_id): {
+                    "category_id": category_id,
+                    "boxes": self.category_boxes[category_id],
+                    "images": self.category_images[category_id],
+                    "box_share": round(self.category_boxes[category_id] / self.boxes, 4) if self.boxes else 0,
+                    "size_classes": dict(zip(SIZE_CLASSES, self.category_size_classes[category_id])),
+                    "box_sizes": dict(zip(BOX_SIZE_LABELS, self.category_box_sizes[category_id])),
+                }
+                for category_id in sorted(self.category_boxes)
+            },
+            "boxes_per_image": dict(zip(BOXES_PER_IMAGE_LABELS, self.boxes_per_image)),
+            "categories_per_image": {str(k): v for k, v in sorted(self.categories_per_image.items())},
+            "size_classes": dict(zip(SIZE_CLASSES, size_classes)),
+            "box_sizes": dict(zip(BOX_SIZE_LABELS, box_sizes)),
+        }
+
+    def save(self, statistics_path: str) -> None:
+        """Write the histograms as JSON, keyed by category name."""
+        statistics_dir = os.path.dirname(statistics_path)
+        if statistics_dir:
+            os.makedirs(statistics_dir, exist_ok=True)
+        with open(statistics_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+def compute_dataset_statistics(
+    records: Iterable[Dict[str, Any]],
+    category_mapping: Optional[Dict[int, str]] = None,
+    box_format: str = "xywh",
+    progress: Optional[StageMetrics] = None
+) -> DatasetStatistics:
+    """
+    Build `DatasetStatistics` in one streaming pass over task records (e.g. `iter_detection_task_records`).
+    `progress` (see `utils/instrumentation.py`) is advanced once per record.
+    """
+    statistics = DatasetStatistics(category_mapping, box_format)
+    for record in records:
+        statistics.add(record)
+        if progress is not None:
+            progress.advance()
+    return statistics.finish()
@@ -1,41 +1,61 @@
 # src/tasks/detection_task.py
 
-import json
 import os
 import logging
-from utils.logger import setup_logger
+from contextlib import nullcontext
+from utils.logger import PARSE_LOG_FILE, get_parser_logger
 
-logger = setup_logger(
-    name="visdrone_parser",
-    log_file="logs/visdrone_parse_log.txt",
-    log_level=logging.INFO,
-)
-from typing import List, Dict, Any
+LOG_DIR = os.path.dirname(PARSE_LOG_FILE)
+LOG_FILE = PARSE_LOG_FILE
 
+logger = get_parser_logger()
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Tuple
 
-LOG_DIR = "logs"
-LOG_FILE = os.path.join(LOG_DIR, "visdrone_parse_log.txt")
+from tasks.parse_report import ParseReport, new_file_stats
+from utils.cache import ConversionCache, settings_key
+from utils.image_id import ImageIdTable, stable_image_id
+from utils.instrumentation import Instrumentation, StageMetrics, path_bytes
+from utils.compressed_io import with_compression_suffix
+from utils.jsonl_utils import dumps_compact, write_json_array_records, write_jsonl_records
+from utils.parallel import ordered_parallel_map, resolve_num_workers
 
+if TYPE_CHECKING:
+    from tasks.box_normalization import BoxNormalizer
 
-def parse_visdrone_txt(txt_path: str) -> List[Dict[str, Any]]:
+
+def _count_error(file_stats: Optional[Dict[str, Any]], error_type: str) -> None:
+    if file_stats is not None:
+        errors = file_stats["errors"]
+        errors[error_type] = errors.get(error_type, 0) + 1
+
+
+def parse_visdrone_txt(txt_path: str, file_stats: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Parse one VisDrone annotation file into a list of detection dicts.
+
+    Failures are logged at WARNING level and per-line successes only at DEBUG level. When
+    `file_stats` (see `parse_report.new_file_stats`) is given, line, error-type and category
+    counters are accumulated into it instead of being written to the log.
+    """
     detections = []
     total_lines = 0
     valid_lines = 0
-    LOG_DIR = "logs"
-    LOG_FILE = os.path.join(LOG_DIR, "visdrone_parse_log.txt")
+    log_debug = logger.isEnabledFor(logging.DEBUG)
+    categories = file_stats["categories"] if file_stats is not None else None
 
-    os.makedirs(LOG_DIR, exist_ok=True)
-
-    with open(txt_path, 'r', encoding='utf-8') as f, open(LOG_FILE, 'a', encoding='utf-8') as log_f:
+    with open(txt_path, 'r', encoding='utf-8') as f:
         for line_num, line in enumerate(f, 1):
             total_lines += 1
             line = line.strip()
             if not line:
-                log_f.write(f"[Line {line_num}] ⚠️ Empty line, skipping\n")
+                _count_error(file_stats, "empty_line")
+                if log_debug:
+                    logger.debug(f"{txt_path} [Line {line_num}] ⚠️ Empty line, skipping")
                 continue
             parts = line.split(',')
             if len(parts) < 6:
-                log_f.write(f"[Line {line_num}] ❌ Insufficient fields: only {len(parts)} found. Content: {line}\n")
+                _count_error(file_stats, "insufficient_fields")
+                logger.warning(f"{txt_path} [Line {line_num}] ❌ Insufficient fields: only {len(parts)} found. Content: {line}")
                 continue
             try:
                 x1 = float(parts[0])
@@ -52,40 +72,410 @@ def parse_visdrone_txt(txt_path: str) -> List[Dict[str, Any]]:
                     "category_id": category_id
                 })
                 valid_lines += 1
-                log_f.write(
-                    f"[Line {line_num}] ✅ Parsed successfully → category_id={category_id}, box=[{x1},{y1},{x2},{y2}]\n")
+                if categories is not None:
+                    categories[category_id] = categories.get(category_id, 0) + 1
+                if log_debug:
+                    logger.debug(
+                        f"{txt_path} [Line {line_num}] ✅ Parsed successfully → category_id={category_id}, box=[{x1},{y1},{x2},{y2}]")
             except ValueError as ve:
-                log_f.write(f"[Line {line_num}] ❌ Parsing failed (value error): {line}, Error: {ve}\n")
+                _count_error(file_stats, "value_error")
+                logger.warning(f"{txt_path} [Line {line_num}] ❌ Parsing failed (value error): {line}, Error: {ve}")
             except Exception as e:
-                log_f.write(f"[Line {line_num}] ❌ Parsing failed (unknown error): {line}, Error: {e}\n")
+                _count_error(file_stats, "unknown_error")
+                logger.warning(f"{txt_path} [Line {line_num}] ❌ Parsing failed (unknown error): {line}, Error: {e}")
 
-        log_f.write(
-            f"[Summary] File {txt_path}: Total lines={total_lines}, Successfully parsed={valid_lines}, Failed={total_lines - valid_lines}\n\n")
+    if file_stats is not None:
+        file_stats["total_lines"] += total_lines
+        file_stats["valid"] += valid_lines
+    if log_debug:
+        logger.debug(
+            f"[Summary] File {txt_path}: Total lines={total_lines}, Successfully parsed={valid_lines}, Failed={total_lines - valid_lines}")
 
     return detections
 
 
-def generate_detection_tasks(annotations_folder: str, output_dir: str) -> None:
-    all_tasks = []
-    for txt_file in os.listdir(annotations_folder):
-        if not txt_file.endswith('.txt'):
-            continue
-        txt_path = os.path.join(annotations_folder, txt_file)
-        detections = parse_visdrone_txt(txt_path)
+def parse_visdrone_txt_with_stats(txt_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Parse one annotation file and return its detections together with its per-file counters."""
+    file_stats = new_file_stats()
+    detections = parse_visdrone_txt(txt_path, file_stats)
+    return detections, file_stats
+
+
+def get_parse_function(parser: str):
+    """
+    Return the per-file parse function of a parser name. Only the "python" parser (line by line)
+    parses one file per call; the "bulk" parser (`tasks/bulk_parser.py`) and `BoxNormalizer`
+    parse batches of files, see `iter_parsed_files`.
+    """
+    if parser == "python":
+        return parse_visdrone_txt_with_stats
+    if parser == "bulk":
+        raise ValueError("The bulk parser parses batches of files; use iter_parsed_files")
+    raise ValueError(f"Unsupported parser: {parser!r} (expected 'python' or 'bulk')")
+
+
+def iter_parsed_files(
+    txt_paths: List[str],
+    parser: str = "python",
+    normalizer: Optional["BoxNormalizer"] = None,
+    num_workers: Optional[int] = 1,
+    chunksize: int = 16
+) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """
+    Yield (detections, file_stats) per annotation file in input order, parsed in a process pool.
+
+    The "bulk" parser works on batches of up to `BULK_BATCH_FILES` files, each parsed as one
+    concatenated buffer (`tasks/bulk_parser.py`), and yields its detections as (N, 8) NumPy
+    arrays of VisDrone rows; `detections_from_array` turns them into dicts where a writer needs them.
+    A `normalizer` runs on the same batches (`BoxNormalizer.parse_batch`, whatever the parser) and
+    yields detection dicts. The "python" parser handles one file per call and yields detection dicts.
+    """
+    if parser != "bulk" and normalizer is None:
+        parsed = ordered_parallel_map(get_parse_function(parser), txt_paths, num_workers, chunksize)
+        try:
+            yield from parsed
+        finally:
+            parsed.close()
+        return
+
+    from tasks.bulk_parser import BULK_BATCH_FILES, parse_visdrone_batch_with_stats  # requires NumPy
+
+    parse_batch = normalizer.parse_batch if normalizer is not None else parse_visdrone_batch_with_stats
+    # Split evenly over the workers for small inputs, so a pool is not left with a single batch
+    batch_size = max(1, min(BULK_BATCH_FILES, -(-len(txt_paths) // resolve_num_workers(num_workers))))
+    batches = [txt_paths[start:start + batch_size] for start in range(0, len(txt_paths), batch_size)]
+    parsed_batches = ordered_parallel_map(parse_batch, batches, num_workers, chunksize=1)
+    try:
+        for parsed_batch in parsed_batches:
+            yield from parsed_batch
+    finally:
+        parsed_batches.close()
+
+
+def list_annotation_files(annotations_folder: str) -> List[str]:
+    """Return the `.txt` annotation file names in the folder, sorted by filename."""
+    return sorted(f for f in os.listdir(annotations_folder) if f.endswith('.txt'))
+
+
+def _iter_parsed_with_cache(
+    txt_paths: List[str],
+    parser: str,
+    num_workers: Optional[int],
+    chunksize: int,
+    cache: ConversionCache,
+    normalizer: Optional["BoxNormalizer"] = None
+) -> Iterator[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Yield (detections, file_stats) per file in input order, re-parsing only files that are new or
+    changed since the cached run and loading the rest from `cache`.
+    """
+    settings = {"parser": parser}
+    if normalizer is not None:
+        settings["box_normalization"] = normalizer.settings()
+    if normalizer is not None and normalizer.uses_image_size:
+        # A replaced image of another size changes the clipped / rescaled boxes of its file
+        file_settings = [settings_key({**settings, "image_size": normalizer.image_size(txt_path)}) for txt_path in txt_paths]
+    else:
+        file_settings = [settings_key(settings)] * len(txt_paths)
+    fresh = [cache.annotation_is_fresh(txt_path, file_setting) for txt_path, file_setting in zip(txt_paths, file_settings)]
+    stale_paths = [txt_path for txt_path, is_fresh in zip(txt_paths, fresh) if not is_fresh]
+    logger.info(f"Cache: {len(txt_paths) - len(stale_paths)} annotation files unchanged, {len(stale_paths)} to parse")
+
+    parsed = iter_parsed_files(stale_paths, parser, normalizer, num_workers, chunksize)
+    try:
+        for txt_path, file_setting, is_fresh in zip(txt_paths, file_settings, fresh):
+            if is_fresh:
+                yield cache.load_annotation(txt_path)
+                continue
+            detections, file_stats = next(parsed)
+            if not isinstance(detections, list):
+                from tasks.bulk_parser import detections_from_array  # bulk arrays are cached as dicts
+
+                detections = detections_from_array(detections)
+            cache.store_annotation(txt_path, file_setting, detections, file_stats)
+            yield detections, file_stats
+    finally:
+        parsed.close()
+
+
+def iter_detection_tasks(
+    annotations_folder: str,
+    num_workers: Optional[int] = 1,
+    chunksize: int = 16,
+    report: Optional[ParseReport] = None,
+    group_by_image: bool = False,
+    parser: str = "python",
+    cache: Optional[ConversionCache] = None,
+    image_id_table: Optional[ImageIdTable] = None,
+    normalizer: Optional["BoxNormalizer"] = None,
+    progress: Optional[StageMetrics] = None,
+    detection_arrays: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield detection task records, in filename order.
+
+    By default one record is yielded per detection. With `group_by_image` a single record per
+    image carries all of its detections; images without detections are skipped in both modes.
+
+    Annotation files are parsed in a process pool when `num_workers` > 1; results are merged
+    back in sorted filename order, so the output is identical to a serial run. Per-file parse
+    counters are merged into `report` when one is given. With a `cache`, only new or changed
+    annotation files are parsed; unchanged ones are spliced in from the cache.
+
+    `image_id` is `stable_image_id` of the file name, or a dense integer from `image_id_table`.
+
+    With a `normalizer` boxes are validated and converted to (x1, y1, x2, y2) while parsing, and
+    every record carries `"box_format": "xyxy"` (plus `"coordinate_scale"` if rescaled); without
+    one the raw VisDrone (left, top, width, height) values are passed through unchanged.
+
+    `progress` (see `utils/instrumentation.py`) is advanced once per annotation file with its
+    line and kept / dropped box counts.
 
-        image_file = txt_file.replace('.txt', '.jpg')
-        image_id = hash(txt_file)
+    With `detection_arrays` and `group_by_image`, detections of the "bulk" parser stay (N, 8)
+    NumPy arrays of VisDrone rows in the yielded records instead of being turned into dicts;
+    `ColumnarTaskWriter` and `bulk_parser.encode_task_record` write them without a dict per box.
+    """
+    txt_files = list_annotation_files(annotations_folder)
+    if progress is not None:
+        progress.total = len(txt_files)
+    txt_paths = [os.path.join(annotations_folder, txt_file) for txt_file in txt_files]
+    if cache is None:
+        parsed = iter_parsed_files(txt_paths, parser, normalizer, num_workers, chunksize)
+    else:
+        parsed = _iter_parsed_with_cache(txt_paths, parser, num_workers, chunksize, cache, normalizer)
+    box_fields = normalized_record_fields(normalizer)
+    to_dicts = None
+    if parser == "bulk" and normalizer is None and not (detection_arrays and group_by_image):
+        from tasks.bulk_parser import detections_from_array as to_dicts
 
-        for det in detections:
-            all_tasks.append({
-                "image_id": image_id,
-                "image_file": image_file,
-                "task_type": "detection",
-                "detections": [det]
-            })
+    try:
+        for txt_file, (detections, file_stats) in zip(txt_files, parsed):
+            if to_dicts is not None and not isinstance(detections, list):
+                detections = to_dicts(detections)
+            if report is not None:
+                report.add_file(txt_file, file_stats)
+            if progress is not None:
+                lines = file_stats["total_lines"] - file_stats["errors"].get("empty_line", 0)
+                progress.advance(lines_parsed=lines, boxes_kept=len(detections), boxes_dropped=lines - len(detections))
 
+            image_file = txt_file.replace('.txt', '.jpg')
+            image_id = image_id_table.get(txt_file) if image_id_table is not None else stable_image_id(txt_file)
+
+            if group_by_image:
+                if len(detections):
+                    yield {
+                        "image_id": image_id,
+                        "image_file": image_file,
+                        "task_type": "detection",
+                        **box_fields,
+                        "detections": detections
+                    }
+                continue
+
+            for det in detections:
+                yield {
+                    "image_id": image_id,
+                    "image_file": image_file,
+                    "task_type": "detection",
+                    **box_fields,
+                    "detections": [det]
+                }
+    finally:
+        parsed.close()
+
+    if cache is not None:
+        # Drop cache rows of annotation files that no longer exist
+        removed = cache.prune_annotations(txt_files)
+        if removed:
+            logger.info(f"Cache: dropped {removed} deleted annotation files")
+
+
+def normalized_record_fields(normalizer: Optional["BoxNormalizer"]) -> Dict[str, Any]:
+    """Record fields describing the coordinates produced by `normalizer` (none for raw boxes)."""
+    if normalizer is None:
+        return {}
+    fields = {"box_format": "xyxy"}
+    if normalizer.normalize_scale:
+        fields["coordinate_scale"] = normalizer.normalize_scale
+    return fields
+
+
+def iter_visdrone_det_records(
+    annotations_folder: str,
+    num_workers: Optional[int] = 1,
+    chunksize: int = 16,
+    parser: str = "python",
+    report: Optional[ParseReport] = None,
+    images_base_dir: Optional[str] = None,
+    box_normalization: Optional[Dict[str, Any]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Dataset reader for the registry (see `src/registry.py`): one record per annotated VisDrone-DET image.
+    `box_normalization` holds `BoxNormalizer` options (see `generate_detection_tasks`).
+    """
+    return iter_detection_tasks(
+        annotations_folder, num_workers, chunksize, report, group_by_image=True, parser=parser,
+        normalizer=_make_normalizer(images_base_dir, box_normalization)
+    )
+
+
+def _make_normalizer(
+    images_base_dir: Optional[str],
+    box_normalization: Optional[Dict[str, Any]],
+    image_index_path: Optional[str] = None
+):
+    if box_normalization is None:
+        return None
+    from tasks.box_normalization import BoxNormalizer  # requires NumPy, only imported when used
+
+    return BoxNormalizer(images_base_dir, image_index_path=image_index_path, **box_normalization)
+
+
+def generate_detection_tasks(
+    annotations_folder: str,
+    output_dir: str,
+    output_format: str = "json",
+    num_workers: Optional[int] = 1,
+    chunksize: int = 16,
+    parse_report_path: Optional[str] = None,
+    group_by_image: bool = False,
+    parser: str = "python",
+    cache_dir: Optional[str] = None,
+    image_id_table_path: Optional[str] = None,
+    images_base_dir: Optional[str] = None,
+    box_normalization: Optional[Dict[str, Any]] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    json_indent: Optional[int] = None,
+    image_index_path: Optional[str] = None
+) -> str:
+    """
+    Generate detection tasks from a folder of VisDrone annotation files.
+
+    Args:
+        annotations_folder (str): Folder containing the VisDrone `.txt` annotation files.
+        output_dir (str): Directory where the task file is written.
+        output_format (str): "json" streams a single `detection_tasks.json` array; "jsonl" streams
+                             one task per line to `detection_tasks.jsonl`; "columnar" streams per-image
+                             binary columns (see `tasks/columnar.py`) to the `detection_tasks_columnar`
+                             directory. All three are written in constant memory as files are parsed.
+        num_workers (Optional[int]): Number of parser processes; None or <= 0 uses all CPU cores.
+        chunksize (int): Number of annotation files handed to a worker at a time.
+        parse_report_path (Optional[str]): If given, a JSON parse report with counts per file,
+                                           per error type and per category is written there.
+        group_by_image (bool): Emit one task per image with all of its detections instead of
+                               one task per detection. Always on for the columnar format.
+        parser (str): "python" for the line-by-line parser or "bulk" for the vectorized NumPy parser,
+                      which also rejects NaN values and negative box sizes.
+        cache_dir (Optional[str]): Directory of the incremental conversion cache. When given, only
+                                   annotation files that are new or changed since the last run
+                                   (by size, mtime and content hash) are parsed again.
+        image_id_table_path (Optional[str]): Persisted name -> integer id table. When given, image ids are
+                                             dense integers kept stable across runs through this table;
+                                             otherwise they are `utils.image_id.stable_image_id` digests.
+        images_base_dir (Optional[str]): Directory containing the images; needed by `box_normalization`
+                                         for clipping to and rescaling by the image size.
+        box_normalization (Optional[Dict[str, Any]]): Options of the vectorized validation / normalization
+                                                      stage (`tasks.box_normalization.BoxNormalizer`), e.g.
+                                                      `{"normalize_scale": 1000}`; `{}` uses the defaults.
+                                                      None keeps the raw VisDrone boxes.
+        instrumentation (Optional[Instrumentation]): Records the "detection_tasks" stage timer, file
+                                                     progress / ETA and line, box and byte counters
+                                                     (see `utils/instrumentation.py`).
+        compression (Optional[str]): "gzip" or "zstd" compresses the json / jsonl task file on the fly
+                                     (`detection_tasks.jsonl.gz` / `.zst`, see `utils/compressed_io.py`);
+                                     not supported for the memory-mapped columnar format.
+        compression_level (Optional[int]): Compression level; None uses the codec default.
+        json_indent (Optional[int]): Pretty-print the json format with this indent; None writes compact JSON.
+        image_index_path (Optional[str]): Persisted `ImageIndex` of `images_base_dir` (see `utils/image_index.py`),
+                                          from which `box_normalization` looks up the image sizes; the SFT
+                                          converter reuses it.
+
+    Returns:
+        str: Path of the written task file (or directory, for the columnar format).
+    """
+    if compression is not None and output_format == "columnar":
+        raise ValueError("The columnar format is memory-mapped and cannot be compressed")
     os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, "detection_tasks.json")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_tasks, f, ensure_ascii=False, indent=2)
-    print(f"✅ Detection tasks generated: {output_path}, Total records: {len(all_tasks)}")
\ No newline at end of file
+    report = ParseReport(keep_files=parse_report_path is not None)
+    group_by_image = group_by_image or output_format == "columnar"
+    cache = ConversionCache(cache_dir) if cache_dir else None
+    image_id_table = ImageIdTable(image_id_table_path) if image_id_table_path else None
+    normalizer = _make_normalizer(images_base_dir, box_normalization, image_index_path)
+
+    # Bulk-parsed detections stay arrays up to the writer, which formats them straight to JSON text or columns
+    detection_arrays = parser == "bulk" and normalizer is None and (output_format == "columnar" or json_indent is None)
+
+    stage = instrumentation.stage("detection_tasks", unit="files") if instrumentation is not None else nullcontext()
+    with stage as progress:
+        tasks = iter_detection_tasks(
+            annotations_folder, num_workers, chunksize, report, group_by_image, parser, cache, image_id_table,
+            normalizer, progress, detection_arrays
+        )
+        try:
+            output_path, total_records, total_detections = _write_tasks(
+                tasks, output_dir, output_format, normalized_record_fields(normalizer), compression, compression_level,
+                json_indent, detection_arrays
+            )
+        finally:
+            if cache is not None:
+                cache.close()
+            if image_id_table is not None:
+                image_id_table.save()
+        if progress is not None:
+            progress.count(
+                records_written=total_records, detections_written=total_detections, bytes_written=path_bytes(output_path)
+            )
+
+    logger.info(report.summary())
+    if parse_report_path:
+        report.save(parse_report_path)
+        logger.info(f"Parse report written to: {parse_report_path}")
+
+    print(f"✅ Detection tasks generated: {output_path}, Total records: {total_records} ({total_detections} detections)")
+    return output_path
+
+
+def _write_tasks(
+    tasks: Iterator[Dict[str, Any]],
+    output_dir: str,
+    output_format: str,
+    record_fields: Optional[Dict[str, Any]] = None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    json_indent: Optional[int] = None,
+    detection_arrays: bool = False
+) -> Tuple[str, int, int]:
+    """Write the task records in `output_format`; returns (output path, records written, detections written)."""
+    encode = dumps_compact
+    if detection_arrays:
+        from tasks.bulk_parser import encode_task_record as encode  # records may carry parsed arrays
+
+    total_detections = 0
+
+    def count_detections(records: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        nonlocal total_detections
+        for record in records:
+            total_detections += len(record["detections"])
+            yield record
+
+    if output_format == "jsonl":
+        output_path = with_compression_suffix(os.path.join(output_dir, "detection_tasks.jsonl"), compression)
+        total_records = write_jsonl_records(count_detections(tasks), output_path, compression_level, encode)
+    elif output_format == "json":
+        output_path = with_compression_suffix(os.path.join(output_dir, "detection_tasks.json"), compression)
+        total_records = write_json_array_records(count_detections(tasks), output_path, json_indent, compression_level, encode)
+    elif output_format == "columnar":
+        from tasks.columnar import ColumnarTaskWriter  # requires NumPy, only imported when used
+
+        output_path = os.path.join(output_dir, "detection_tasks_columnar")
+        with ColumnarTaskWriter(output_path, record_fields) as writer:
+            for task in tasks:
+                writer.add_image(task["image_id"], task["image_file"], task["detections"])
+        # One record (row) per image, as `ColumnarTasks.iter_task_records` reads them back
+        total_records = len(writer.image_files)
+        total_detections = writer.num_detections
+    else:
+        raise ValueError(f"Unsupported output format: {output_format!r} (expected 'json', 'jsonl' or 'columnar')")
+    return output_path, total_records, total_detections
@@ -0,0 +1,84 @@
+# src/tasks/parse_report.py
+
+import json
+import os
+from collections import Counter
+from typing import Any, Dict
+
+
+def new_file_stats() -> Dict[str, Any]:
+    """Return an empty per-file counter dict, filled in by `parse_visdrone_txt`."""
+    return {
+        "total_lines": 0,
+        "valid": 0,
+        "errors": {},        # error type -> count
+        "categories": {},    # category_id -> count
+    }
+
+
+class ParseReport:
+    """
+    Aggregates per-file parse counters into run-level totals.
+
+    Per-file stats are small dicts (see `new_file_stats`), so they can be produced in
+    worker processes and merged here in the parent.
+    """
+
+    def __init__(self, keep_files: bool = True):
+        self.keep_files = keep_files
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.total_files = 0
+        self.total_lines = 0
+        self.valid_lines = 0
+        self.error_counts: Counter = Counter()
+        self.category_counts: Counter = Counter()
+        # Valid boxes dropped by the box normalization stage, per reason
+        self.filtered_counts: Counter = Counter()
+
+    def add_file(self, txt_file: str, file_stats: Dict[str, Any]) -> None:
+        self.total_files += 1
+        self.total_lines += file_stats["total_lines"]
+        self.valid_lines += file_stats["valid"]
+        self.error_counts.update(file_stats["errors"])
+        self.category_counts.update(file_stats["categories"])
+        self.filtered_counts.update(file_stats.get("filtered", {}))
+        if self.keep_files:
+            self.files[txt_file] = file_stats
+
+    @property
+    def failed_lines(self) -> int:
+        return self.total_lines - self.valid_lines
+
+    def summary(self) -> str:
+        errors = ", ".join(f"{k}={v}" for k, v in sorted(self.error_counts.items())) or "none"
+        summary = (f"[Summary] Files={self.total_files}, Total lines={self.total_lines}, "
+                   f"Successfully parsed={self.valid_lines}, Failed={self.failed_lines} ({errors})")
+        if self.filtered_counts:
+            filtered = ", ".join(f"{k}={v}" for k, v in sorted(self.filtered_counts.items()))
+            summary += f", Filtered={sum(self.filtered_counts.values())} ({filtered})"
+        return summary
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "totals": {
+                "files": self.total_files,
+                "lines": self.total_lines,
+                "valid": self.valid_lines,
+                "failed": self.failed_lines,
+            },
+            "errors": dict(sorted(self.error_counts.items())),
+            "filtered": dict(sorted(self.filtered_counts.items())),
+            "categories": {str(k): v for k, v in sorted(self.category_counts.items())},
+            "files": {
+                name: {**stats, "categories": {str(k): v for k, v in sorted(stats["categories"].items())}}
+                for name, stats in self.files.items()
+            },
+        }
+
+    def save(self, report_path: str) -> None:
+        """Write the report as JSON (counts per file, per error type and per category)."""
+        report_dir = os.path.dirname(report_path)
+        if report_dir:
+            os.makedirs(report_dir, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
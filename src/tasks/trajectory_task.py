@@ -0,0 +1,172 @@
+# src/tasks/trajectory_task.py
+
+import os
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tasks.bulk_parser import parse_annotation_array
+from tasks.parse_report import ParseReport, new_file_stats
+from utils.parallel import ordered_parallel_map
+
+# The ten VisDrone-VID / VisDrone-MOT annotation columns, in file order
+VISDRONE_VID_COLUMNS = (
+    "frame_index", "target_id", "bbox_left", "bbox_top", "bbox_width", "bbox_height",
+    "score", "object_category", "truncation", "occlusion",
+)
+VID_REQUIRED_COLUMNS = (0, 1, 2, 3, 4, 5, 7)
+VID_CATEGORY_COLUMN = 7
+VID_SIZE_COLUMNS = (4, 5)
+# Category 0 marks ignored regions (target id 0) and 11 "others"; neither forms a trajectory
+DEFAULT_EXCLUDED_CATEGORIES = (0, 11)
+
+# Compass directions in image coordinates (y grows downwards), counter-clockwise from "right"
+DIRECTIONS = ("right", "upper-right", "up", "upper-left", "left", "lower-left", "down", "lower-right")
+
+
+class SequenceTrajectories:
+    """
+    All trajectories of one video sequence in compact, contiguous arrays.
+
+    Boxes are sorted by (target id, frame), so the boxes of track `i` are the slice
+    `offsets[i]:offsets[i + 1]` of `frames` / `boxes`; no per-track Python objects are created.
+
+    - `target_ids` (T,) int64, `categories` (T,) int64 (category of the first box of the track)
+    - `offsets` (T + 1,) int64
+    - `frames` (N,) int32, `boxes` (N, 4) float32 as (left, top, width, height)
+    """
+
+    def __init__(self, sequence: str, frames: np.ndarray, target_ids: np.ndarray, boxes: np.ndarray,
+                 categories: np.ndarray):
+        self.sequence = sequence
+        order = np.lexsort((frames, target_ids))
+        sorted_ids = target_ids[order]
+        self.frames = frames[order].astype(np.int32)
+        self.boxes = boxes[order].astype(np.float32)
+        self.target_ids, starts = np.unique(sorted_ids, return_index=True)
+        self.offsets = np.append(starts, len(sorted_ids)).astype(np.int64)
+        self.categories = categories[order][starts].astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.target_ids)
+
+    @property
+    def num_boxes(self) -> int:
+        return len(self.frames)
+
+    def track(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (frames, boxes) of track `i`."""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.frames[start:end], self.boxes[start:end]
+
+    def motion_stats(self) -> Dict[str, np.ndarray]:
+        """
+        Per-track motion statistics, computed for all tracks at once with segment reductions.
+
+        Returns arrays of shape (T,): `first_frame`, `last_frame`, `num_frames` (frames with a box),
+        `displacement` (pixels between the first and last box center), `dx`, `dy`, `path_length`
+        (sum of center steps), `speed` (path length per elapsed frame) and `direction` (index
+        into `DIRECTIONS` of the overall displacement).
+        """
+        starts, ends = self.offsets[:-1], self.offsets[1:] - 1
+        cx = self.boxes[:, 0].astype(np.float64) + self.boxes[:, 2] / 2
+        cy = self.boxes[:, 1].astype(np.float64) + self.boxes[:, 3] / 2
+
+        steps = np.hypot(np.diff(cx), np.diff(cy))
+        # Steps across a track boundary belong to no track
+        steps[ends[:-1]] = 0.0
+        cumulative = np.concatenate(([0.0], np.cumsum(steps)))
+        path_length = cumulative[ends] - cumulative[starts]
+
+        dx, dy = cx[ends] - cx[starts], cy[ends] - cy[starts]
+        elapsed = (self.frames[ends] - self.frames[starts]).astype(np.float64)
+        angle = np.arctan2(-dy, dx)  # image y axis points down
+        direction = np.round(angle / (np.pi / 4)).astype(np.int64) % len(DIRECTIONS)
+        return {
+            "first_frame": self.frames[starts],
+            "last_frame": self.frames[ends],
+            "num_frames": ends - starts + 1,
+            "displacement": np.hypot(dx, dy),
+            "dx": dx,
+            "dy": dy,
+            "path_length": path_length,
+            "speed": np.divide(path_length, elapsed, out=np.zeros_like(path_length), where=elapsed > 0),
+            "direction": direction,
+        }
+
+
+def parse_visdrone_vid_array(
+    txt_path: str,
+    file_stats: Optional[Dict[str, Any]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse one VisDrone-VID/MOT sequence file into an (N, 10) float array ordered as
+    `VISDRONE_VID_COLUMNS`, with the same validation and error reporting as the bulk DET parser.
+    """
+    return parse_annotation_array(
+        txt_path, file_stats, len(VISDRONE_VID_COLUMNS), VID_REQUIRED_COLUMNS, VID_CATEGORY_COLUMN, VID_SIZE_COLUMNS
+    )
+
+
+def load_sequence_trajectories(
+    txt_path: str,
+    excluded_categories: Sequence[int] = DEFAULT_EXCLUDED_CATEGORIES
+) -> Tuple[SequenceTrajectories, Dict[str, Any]]:
+    """Parse one sequence file and group its boxes by target id (runs in a worker process)."""
+    file_stats = new_file_stats()
+    values, _ = parse_visdrone_vid_array(txt_path, file_stats)
+    category_ids = values[:, VID_CATEGORY_COLUMN].astype(np.int64)
+    keep = ~np.isin(category_ids, list(excluded_categories))
+    values, category_ids = values[keep], category_ids[keep]
+    sequence = os.path.splitext(os.path.basename(txt_path))[0]
+    trajectories = SequenceTrajectories(
+        sequence,
+        values[:, 0].astype(np.int64),
+        values[:, 1].astype(np.int64),
+        values[:, 2:6],
+        category_ids
+    )
+    return trajectories, file_stats
+
+
+def _load_sequence_job(job: Tuple[str, Tuple[int, ...]]) -> Tuple[SequenceTrajectories, Dict[str, Any]]:
+    return load_sequence_trajectories(*job)
+
+
+def iter_sequence_trajectories(
+    annotations_folder: str,
+    num_workers: Optional[int] = 1,
+    report: Optional[ParseReport] = None,
+    excluded_categories: Sequence[int] = DEFAULT_EXCLUDED_CATEGORIES
+) -> Iterator[SequenceTrajectories]:
+    """
+    Lazily yield the trajectories of every sequence file in `annotations_folder`, in filename order.
+
+    Sequences are parsed one at a time (or one per worker process), so memory holds only the
+    sequences in flight, never the whole dataset.
+    """
+    txt_files = sorted(f for f in os.listdir(annotations_folder) if f.endswith('.txt'))
+    jobs = [(os.path.join(annotations_folder, txt_file), tuple(excluded_categories)) for txt_file in txt_files]
+    parsed = ordered_parallel_map(_load_sequence_job, jobs, num_workers, chunksize=1)
+    try:
+        for txt_file, (trajectories, file_stats) in zip(txt_files, parsed):
+            if report is not None:
+                report.add_file(txt_file, file_stats)
+            yield trajectories
+    finally:
+        parsed.close()
+
+
+def iter_visdrone_vid_records(
+    annotations_folder: str,
+    num_workers: Optional[int] = 1,
+    report: Optional[ParseReport] = None,
+    excluded_categories: Sequence[int] = DEFAULT_EXCLUDED_CATEGORIES
+) -> Iterator[Dict[str, Any]]:
+    """Dataset reader for the registry (see `src/registry.py`): one trajectory record per video sequence."""
+    for trajectories in iter_sequence_trajectories(annotations_folder, num_workers, report, excluded_categories):
+        yield {
+            "sequence": trajectories.sequence,
+            "task_type": "trajectory",
+            "trajectories": trajectories,
+        }
@@ -0,0 +1,200 @@
+# src/utils/cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CACHE_FILE = "conversion_cache.sqlite"
+# Pending writes are committed in batches so an interrupted run keeps most of its work
+COMMIT_EVERY = 1000
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Return a content hash of a file (BLAKE2b, 128 bit, hex)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def settings_key(settings: Dict[str, Any]) -> str:
+    """Serialize stage settings to a canonical string, so any change invalidates cached results."""
+    return json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def record_key(record: Any, settings: str) -> str:
+    """Return a content hash of a task record (or list of records) combined with the converter settings."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    h.update(settings.encode('utf-8'))
+    return h.hexdigest()
+
+
+def fingerprint_key(name: str, fingerprint: str, settings: str) -> str:
+    """
+    Return a hash of a record name and the fingerprint of the annotation file it was parsed from
+    (see `ConversionCache.annotation_fingerprints`), combined with the converter settings.
+    Unlike `record_key` it does not serialize the record.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in (name, fingerprint, settings):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class ConversionCache:
+    """
+    On-disk manifest and result cache for incremental re-runs, stored in a single SQLite file.
+
+    - `annotations`: one row per annotation file, keyed on its name and fingerprinted by size,
+      mtime and content hash plus the parser settings; holds the parsed detections and parse counters.
+    - `sft`: one row per image, keyed on the fingerprint of its annotation file (or, for
+      records of files parsed elsewhere, a hash of the records) plus the converter settings;
+      holds the converted SFT records of each of the image's task records.
+
+    Rows for files or records not seen during a run are dropped by the `prune_*` methods.
+    """
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILE)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS annotations (
+                txt_file TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                detections TEXT NOT NULL,
+                file_stats TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sft (
+                key TEXT PRIMARY KEY,
+                records TEXT NOT NULL
+            );
+        """)
+        self._pending = 0
+        # SFT lookups, reported in the converter summary, and the keys used during this run
+        self.hits = 0
+        self.misses = 0
+        self.seen_sft_keys = set()
+
+    # ---------- annotation files ----------
+
+    def annotation_is_fresh(self, txt_path: str, settings: str) -> bool:
+        """
+        Return True if the cached result for an annotation file is still valid.
+
+        Size and mtime are compared first; if only the mtime changed (e.g. a fresh checkout),
+        the content hash decides and the stored mtime is refreshed on a match.
+        """
+        txt_file = os.path.basename(txt_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, digest, settings FROM annotations WHERE txt_file = ?", (txt_file,)
+        ).fetchone()
+        if row is None:
+            return False
+        size, mtime_ns, digest, cached_settings = row
+        if cached_settings != settings:
+            return False
+
+        st = os.stat(txt_path)
+        if st.st_size != size:
+            return False
+        if st.st_mtime_ns != mtime_ns:
+            if file_digest(txt_path) != digest:
+                return False
+            self.conn.execute("UPDATE annotations SET mtime_ns = ? WHERE txt_file = ?", (st.st_mtime_ns, txt_file))
+            self._maybe_commit()
+        return True
+
+    def load_annotation(self, txt_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Return the cached (detections, file_stats) of an annotation file checked with `annotation_is_fresh`."""
+        detections, file_stats = self.conn.execute(
+            "SELECT detections, file_stats FROM annotations WHERE txt_file = ?", (os.path.basename(txt_path),)
+        ).fetchone()
+        return json.loads(detections), _int_categories(json.loads(file_stats))
+
+    def store_annotation(
+        self,
+        txt_path: str,
+        settings: str,
+        detections: List[Dict[str, Any]],
+        file_stats: Dict[str, Any]
+    ) -> None:
+        st = os.stat(txt_path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (os.path.basename(txt_path), st.st_size, st.st_mtime_ns, file_digest(txt_path), settings,
+             json.dumps(detections, ensure_ascii=False), json.dumps(file_stats, ensure_ascii=False))
+        )
+        self._maybe_commit()
+
+    def annotation_fingerprints(self) -> Dict[str, str]:
+        """
+        Return {annotation file name: content digest and parser settings} of all cached annotation files,
+        which identifies the task records generated from them without reading the records.
+        """
+        return {
+            txt_file: f"{digest}:{settings}"
+            for txt_file, digest, settings in self.conn.execute("SELECT txt_file, digest, settings FROM annotations")
+        }
+
+    def prune_annotations(self, seen_files: Iterable[str]) -> int:
+        """Drop rows of annotation files that no longer exist; returns the number of rows removed."""
+        return self._prune("annotations", "txt_file", seen_files)
+
+    # ---------- SFT records ----------
+
+    def lookup_sft(self, key: str) -> Optional[List[List[Dict[str, Any]]]]:
+        self.seen_sft_keys.add(key)
+        row = self.conn.execute("SELECT records FROM sft WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def store_sft(self, key: str, records: List[List[Dict[str, Any]]]) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO sft VALUES (?, ?)", (key, json.dumps(records, ensure_ascii=False)))
+        self._maybe_commit()
+
+    def prune_sft(self) -> int:
+        """Drop cached SFT records of task records that were not looked up during this run."""
+        return self._prune("sft", "key", self.seen_sft_keys)
+
+    # ---------- housekeeping ----------
+
+    def _prune(self, table: str, column: str, seen: Iterable[str]) -> int:
+        seen = set(seen)
+        stale = [(name,) for (name,) in self.conn.execute(f"SELECT {column} FROM {table}") if name not in seen]
+        self.conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", stale)
+        self.conn.commit()
+        return len(stale)
+
+    def _maybe_commit(self) -> None:
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def __enter__(self) -> "ConversionCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def _int_categories(file_stats: Dict[str, Any]) -> Dict[str, Any]:
+    # JSON turns the integer category keys into strings; restore them
+    file_stats["categories"] = {int(k): v for k, v in file_stats["categories"].items()}
+    return file_stats
@@ -1,16 +1,17 @@
 # utils/category_mapping.py
 
+# Official VisDrone2019-DET / VID / MOT object categories
 VISDRONE_CATEGORY_MAPPING = {
-    0: "pedestrian",
-    1: "person",
-    2: "bicycle",
-    3: "car",
-    4: "van",
-    5: "truck",
-    6: "tricycle",
-    7: "awning_tricycle",
-    8: "bus",
-    9: "motorcycle",
-    10: "others",
-    11: "ignored"
+    0: "ignored",
+    1: "pedestrian",
+    2: "people",
+    3: "bicycle",
+    4: "car",
+    5: "van",
+    6: "truck",
+    7: "tricycle",
+    8: "awning_tricycle",
+    9: "bus",
+    10: "motor",
+    11: "others"
 }
\ No newline at end of file
@@ -0,0 +1,85 @@
+# src/utils/compressed_io.py
+
+import gzip
+import io
+from typing import IO, Optional
+
+# Compression name -> file name suffix; the suffix picks the codec when a file is opened
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSIONS = tuple(COMPRESSION_SUFFIXES)
+# Defaults balance speed against size for multi-GB streaming outputs (gzip's own default, 9, is much slower)
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+
+def compression_from_path(path: str) -> Optional[str]:
+    """Return the compression implied by the file name suffix ("gzip", "zstd"), or None."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def strip_compression_suffix(path: str) -> str:
+    compression = compression_from_path(path)
+    return path[:-len(COMPRESSION_SUFFIXES[compression])] if compression else path
+
+
+def with_compression_suffix(path: str, compression: Optional[str]) -> str:
+    """Append the suffix of `compression` to `path` (None leaves it unchanged)."""
+    if compression is None:
+        return path
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression!r} (expected one of {', '.join(COMPRESSIONS)})")
+    return strip_compression_suffix(path) + COMPRESSION_SUFFIXES[compression]
+
+
+def _open_zstd(path: str, mode: str, level: int) -> IO[str]:
+    try:
+        from compression import zstd  # Python 3.14+
+    except ImportError:
+        zstd = None
+    if zstd is not None:
+        options = {"level": level} if mode == "w" else {}
+        return zstd.open(path, mode + "t", encoding="utf-8", **options)
+
+    try:
+        import zstandard  # optional dependency before Python 3.14
+    except ImportError:
+        raise ImportError("zstd compression requires Python 3.14+ or the 'zstandard' package (pip install zstandard)")
+    raw = open(path, mode + "b")
+    if mode == "w":
+        stream = zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=True)
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def open_text(path: str, mode: str = "r", level: Optional[int] = None) -> IO[str]:
+    """
+    Open a UTF-8 text file for streaming reads or writes, compressed according to its suffix.
+
+    `.gz` files go through `gzip`, `.zst` files through zstd (the standard library module on
+    Python 3.14+, otherwise the optional `zstandard` package); anything else is a plain file.
+    Data is (de)compressed incrementally as it is written or read, so memory use does not depend
+    on the file size.
+
+    Args:
+        path (str): File path; its suffix selects the codec.
+        mode (str): "r" or "w".
+        level (Optional[int]): Compression level for writing (gzip 1-9, zstd 1-22); None uses `DEFAULT_LEVELS`.
+
+    Returns:
+        IO[str]: A text file object; close it (or use it as a context manager) to finish the stream.
+    """
+    if mode not in ("r", "w"):
+        raise ValueError(f"Unsupported mode: {mode!r} (expected 'r' or 'w')")
+    compression = compression_from_path(path)
+    if compression is None:
+        return open(path, mode, encoding="utf-8")
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    if compression == "gzip":
+        # mtime=0 keeps the output byte-identical across runs
+        raw = gzip.GzipFile(path, mode + "b", compresslevel=level, mtime=0) if mode == "w" else gzip.open(path, "rb")
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return _open_zstd(path, mode, level)
@@ -0,0 +1,59 @@
+# src/utils/image_id.py
+
+import hashlib
+import json
+import os
+from typing import Dict
+
+
+def image_key(file_name: str) -> str:
+    """Return the extension-less base name shared by an annotation file and its image ("0001.txt" -> "0001")."""
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+
+def stable_image_id(file_name: str) -> int:
+    """
+    Return a deterministic, non-negative 63-bit id for an image or annotation file name.
+
+    Unlike the built-in `hash()`, which is salted per process (PYTHONHASHSEED), the id is a
+    BLAKE2b digest of the base name without extension. It is the same across runs, machines and
+    worker processes, and the same for `0001.txt` and `0001.jpg`.
+    """
+    digest = hashlib.blake2b(image_key(file_name).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> 1
+
+
+class ImageIdTable:
+    """
+    Persisted name -> dense integer id table, for pipelines that prefer small sequential ids.
+
+    Ids are assigned in first-seen order and never reused, so a table saved after one run keeps
+    every existing id stable in the next run and only appends new names.
+    """
+
+    def __init__(self, table_path: str):
+        self.table_path = table_path
+        self.ids: Dict[str, int] = {}
+        if os.path.exists(table_path):
+            with open(table_path, 'r', encoding='utf-8') as f:
+                self.ids = json.load(f)
+        self._dirty = False
+
+    def get(self, file_name: str) -> int:
+        key = image_key(file_name)
+        image_id = self.ids.get(key)
+        if image_id is None:
+            image_id = len(self.ids)
+            self.ids[key] = image_id
+            self._dirty = True
+        return image_id
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        table_dir = os.path.dirname(self.table_path)
+        if table_dir:
+            os.makedirs(table_dir, exist_ok=True)
+        with open(self.table_path, 'w', encoding='utf-8') as f:
+            json.dump(self.ids, f, ensure_ascii=False)
+        self._dirty = False
@@ -0,0 +1,165 @@
+# src/utils/image_index.py
+
+import json
+import logging
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("visdrone_logger")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+INDEX_VERSION = 1
+
+# JPEG start-of-frame markers carrying the image size (all SOFn except DHT, JPG and DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def read_image_size(image_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Return (width, height) from a JPEG or PNG header without decoding the image.
+
+    For JPEG the marker segments are walked up to the first start-of-frame marker, so only a
+    few hundred bytes are usually read. Returns None for unknown or truncated files.
+    """
+    try:
+        with open(image_path, 'rb') as f:
+            head = f.read(24)
+            if head.startswith(_PNG_SIGNATURE) and head[12:16] == b"IHDR":
+                width, height = struct.unpack(">II", head[16:24])
+                return width, height
+            if not head.startswith(b"\xff\xd8"):
+                return None
+
+            f.seek(2)
+            while True:
+                byte = f.read(1)
+                while byte and byte != b"\xff":
+                    byte = f.read(1)
+                while byte == b"\xff":  # markers may be padded with extra 0xFF bytes
+                    byte = f.read(1)
+                if not byte:
+                    return None
+                marker = byte[0]
+                if marker == 0xD9:
+                    return None  # end of image without a frame header
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                    continue  # standalone markers without a length field
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                length = struct.unpack(">H", length_bytes)[0]
+                if marker in _SOF_MARKERS:
+                    frame = f.read(5)
+                    if len(frame) < 5:
+                        return None
+                    height, width = struct.unpack(">HH", frame[1:5])
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+class ImageIndex:
+    """
+    One-pass index of the image directory: existence, size, mtime and (optionally) width/height.
+
+    The directory is listed once with `os.scandir` instead of one `os.path.exists` per task
+    record. With `index_path` the index is persisted as JSON; on the next run, if the directory
+    mtime is unchanged (no file added, removed or renamed) the saved index is reused without
+    touching the images at all, otherwise only new or changed files have their headers re-read.
+    With `read_dimensions` the directory is always listed again (one `stat` per image) so that
+    images replaced in place get their headers re-read too.
+    """
+
+    def __init__(self, images_base_dir: str, index_path: Optional[str] = None, read_dimensions: bool = False):
+        self.images_base_dir = images_base_dir
+        self.index_path = index_path
+        self.read_dimensions = read_dimensions
+        # image file name -> [size, mtime_ns, width, height] (width/height are None if not read)
+        self.images: Dict[str, List[Optional[int]]] = {}
+        self._build()
+
+    def _load_saved(self) -> Optional[dict]:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable image index {self.index_path}: {e}")
+            return None
+        if (saved.get("version") != INDEX_VERSION
+                or saved.get("images_base_dir") != os.path.abspath(self.images_base_dir)
+                or (self.read_dimensions and not saved.get("read_dimensions"))):
+            return None
+        return saved
+
+    def _build(self) -> None:
+        if not os.path.isdir(self.images_base_dir):
+            logger.warning(f"⚠️ Image directory does not exist: {self.images_base_dir}")
+            return
+
+        dir_mtime_ns = os.stat(self.images_base_dir).st_mtime_ns
+        saved = self._load_saved()
+        # Replacing a file in place leaves the directory mtime alone, so sizes are re-checked per file
+        if saved is not None and saved["dir_mtime_ns"] == dir_mtime_ns and not self.read_dimensions:
+            self.images = saved["images"]
+            return
+
+        previous = saved["images"] if saved is not None else {}
+        images = {}
+        with os.scandir(self.images_base_dir) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                    continue
+                st = entry.stat()
+                info = [st.st_size, st.st_mtime_ns, None, None]
+                old = previous.get(entry.name)
+                if old is not None and old[0] == info[0] and old[1] == info[1]:
+                    info[2], info[3] = old[2], old[3]
+                elif self.read_dimensions:
+                    size = read_image_size(entry.path)
+                    if size is not None:
+                        info[2], info[3] = size
+                images[entry.name] = info
+        self.images = images
+
+        if self.index_path:
+            self._save(dir_mtime_ns)
+
+    def _save(self, dir_mtime_ns: int) -> None:
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "images_base_dir": os.path.abspath(self.images_base_dir),
+                "dir_mtime_ns": dir_mtime_ns,
+                "read_dimensions": self.read_dimensions,
+                "images": self.images,
+            }, f, ensure_ascii=False)
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def exists(self, image_file: str) -> bool:
+        if image_file in self.images:
+            return True
+        if os.path.basename(image_file) != image_file:
+            # Paths into subdirectories are not indexed; fall back to a stat call
+            return os.path.exists(os.path.join(self.images_base_dir, image_file))
+        return False
+
+    def file_size(self, image_file: str) -> Optional[int]:
+        info = self.images.get(image_file)
+        return info[0] if info is not None else None
+
+    def dimensions(self, image_file: str) -> Optional[Tuple[int, int]]:
+        """Return (width, height) of an indexed image, or None if unknown."""
+        info = self.images.get(image_file)
+        if info is None or info[2] is None:
+            return None
+        return info[2], info[3]
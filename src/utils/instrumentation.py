@@ -0,0 +1,214 @@
+# src/utils/instrumentation.py
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.logger import setup_logger
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# Number of functions / allocation sites kept in the metrics JSON
+PROFILE_TOP_N = 20
+
+
+def path_bytes(path: str) -> int:
+    """Size of an output file, or the total size of the files in an output directory."""
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class StageMetrics:
+    """
+    Timer, counters and progress of one pipeline stage.
+
+    The stage calls `advance()` once per unit of work (file, task record, shard) with any counters
+    to add; a progress line with throughput and, if `total` is known, the ETA is logged at most
+    every `report_interval` seconds, so the overhead is one clock read per call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        logger: logging.Logger,
+        report_interval: float = 30.0,
+        total: Optional[int] = None,
+        unit: str = "items"
+    ):
+        self.name = name
+        self.logger = logger
+        self.report_interval = report_interval
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.counters: Counter = Counter()
+        self.seconds = 0.0
+        self._start: Optional[float] = None
+        self._last_report = 0.0
+
+    def start(self) -> None:
+        self._start = self._last_report = time.perf_counter()
+
+    def stop(self) -> None:
+        if self._start is not None:
+            self.seconds = time.perf_counter() - self._start
+            self._start = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start if self._start is not None else self.seconds
+
+    def count(self, **counters: int) -> None:
+        """Add to named counters without advancing the progress."""
+        self.counters.update(counters)
+
+    def advance(self, n: int = 1, **counters: int) -> None:
+        self.done += n
+        if counters:
+            self.counters.update(counters)
+        now = time.perf_counter()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.logger.info(self.progress_line())
+
+    def progress_line(self) -> str:
+        elapsed = self.elapsed
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        if self.total:
+            line = f"[{self.name}] {self.done}/{self.total} {self.unit} ({self.done / self.total:.1%}), {rate:.1f} {self.unit}/s"
+            if rate > 0:
+                line += f", ETA {_format_seconds((self.total - self.done) / rate)}"
+        else:
+            line = f"[{self.name}] {self.done} {self.unit}, {rate:.1f} {self.unit}/s"
+        if self.counters:
+            line += ", " + ", ".join(f"{k}={v}" for k, v in sorted(self.counters.items()))
+        return line
+
+    def to_dict(self) -> Dict[str, Any]:
+        seconds = self.elapsed
+        return {
+            "seconds": round(seconds, 4),
+            "unit": self.unit,
+            "done": self.done,
+            "total": self.total,
+            "per_second": round(self.done / seconds, 2) if seconds > 0 else None,
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+class Instrumentation:
+    """
+    Run-level instrumentation: per-stage timers / counters, periodic progress and ETA lines,
+    optional profiling and a final metrics JSON.
+
+    Used as a context manager around the whole run; stages are opened with `stage()`:
+
+        with Instrumentation(profile="cprofile") as instrumentation:
+            generate_detection_tasks(..., instrumentation=instrumentation)
+        instrumentation.write_metrics("outputs/sft/metrics.json")
+
+    `profile="cprofile"` profiles the main process (parser worker processes are not covered) and
+    saves the raw stats as `<metrics name>.prof`; `profile="tracemalloc"` records the peak traced
+    memory and the top allocation sites. Both are summarized in the metrics JSON.
+    """
+
+    def __init__(
+        self,
+        report_interval: float = 30.0,
+        profile: Optional[str] = None,
+        log_file: Optional[str] = None,
+        log_level: int = logging.INFO
+    ):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {profile!r} (expected one of {', '.join(PROFILE_MODES)})")
+        self.report_interval = report_interval
+        self.profile = profile
+        self.logger = setup_logger(name="visdrone_metrics", log_file=log_file, log_level=log_level)
+        self.stages: Dict[str, StageMetrics] = {}
+        self.seconds = 0.0
+        self._start: Optional[float] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self.profile_summary: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str, total: Optional[int] = None, unit: str = "items") -> Iterator[StageMetrics]:
+        metrics = StageMetrics(name, self.logger, self.report_interval, total, unit)
+        self.stages[name] = metrics
+        metrics.start()
+        try:
+            yield metrics
+        finally:
+            metrics.stop()
+            self.logger.info(f"{metrics.progress_line()} — done in {_format_seconds(metrics.seconds)}")
+
+    def __enter__(self) -> "Instrumentation":
+        self._start = time.perf_counter()
+        if self.profile == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "tracemalloc":
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile_summary = {"mode": "cprofile", "top_cumulative": self._cprofile_top()}
+        elif self.profile == "tracemalloc":
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.profile_summary = {
+                "mode": "tracemalloc",
+                "peak_traced_bytes": peak,
+                "top_allocations": [
+                    {"location": str(stat.traceback[0]), "bytes": stat.size, "blocks": stat.count}
+                    for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+                ],
+            }
+
+    def _cprofile_top(self) -> List[Dict[str, Any]]:
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows = []
+        for (file_name, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(file_name)}:{line}({function})",
+                "calls": calls,
+                "own_seconds": round(own, 4),
+                "cumulative_seconds": round(cumulative, 4),
+            })
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        return rows[:PROFILE_TOP_N]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": round(self.seconds, 4),
+            "stages": {name: metrics.to_dict() for name, metrics in self.stages.items()},
+            "profile": self.profile_summary or None,
+        }
+
+    def write_metrics(self, metrics_path: str) -> None:
+        """Write the metrics JSON (and, with cProfile, the raw `.prof` stats next to it)."""
+        metrics_dir = os.path.dirname(metrics_path)
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+        if self._profiler is not None:
+            self._profiler.dump_stats(os.path.splitext(metrics_path)[0] + ".prof")
+        with open(metrics_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        self.logger.info(f"Metrics written to: {metrics_path}")
@@ -0,0 +1,121 @@
+# src/utils/jsonl_utils.py
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from utils.compressed_io import open_text, strip_compression_suffix
+
+logger = logging.getLogger("visdrone_logger")
+
+# Machine outputs are written without the optional spaces after "," and ":"
+COMPACT_SEPARATORS = (",", ":")
+
+
+def is_jsonl_path(path: str) -> bool:
+    """Return True if the path points to a JSON Lines file (one record per line), compressed or not."""
+    return strip_compression_suffix(path).endswith(".jsonl")
+
+
+def dumps_compact(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+
+
+def write_jsonl_records(
+    records: Iterable[Dict[str, Any]],
+    output_path: str,
+    compression_level: Optional[int] = None,
+    encode: Callable[[Any], str] = dumps_compact
+) -> int:
+    """
+    Write records to a JSON Lines file as they are produced.
+
+    Every record is written as soon as the iterable yields it, so an interrupted
+    run still leaves all complete lines written so far on disk. A `.jsonl.gz` or
+    `.jsonl.zst` path is compressed on the fly (see `utils/compressed_io.py`).
+
+    Args:
+        records (Iterable[Dict[str, Any]]): Records to write, usually a generator.
+        output_path (str): Destination `.jsonl` file, optionally with a compression suffix.
+        compression_level (Optional[int]): Compression level; None uses the codec default.
+        encode (Callable[[Any], str]): Turns a record into one line of compact JSON.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    with open_text(output_path, 'w', compression_level) as f:
+        for record in records:
+            f.write(encode(record))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def write_json_array_records(
+    records: Iterable[Dict[str, Any]],
+    output_path: str,
+    indent: Optional[int] = None,
+    compression_level: Optional[int] = None,
+    encode: Callable[[Any], str] = dumps_compact
+) -> int:
+    """
+    Stream records into a single JSON array, one element at a time, instead of building the list first.
+
+    Without `indent` the array is written compactly; with `indent` the output is identical to
+    `json.dump(list(records), f, indent=indent)`. Compression follows the path suffix as in `write_jsonl_records`,
+    and compact elements are produced by `encode`.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    with open_text(output_path, 'w', compression_level) as f:
+        f.write("[")
+        for record in records:
+            if indent is None:
+                f.write("," if count else "")
+                f.write(encode(record))
+            else:
+                f.write(",\n" if count else "\n")
+                element = json.dumps(record, ensure_ascii=False, indent=indent)
+                f.write(" " * indent + element.replace("\n", "\n" + " " * indent))
+            count += 1
+        f.write("\n]" if indent is not None and count else "]")
+    return count
+
+
+def load_json(json_path: str) -> Any:
+    """Read a whole JSON file, decompressing `.gz` / `.zst` files on the fly."""
+    with open_text(json_path, 'r') as f:
+        return json.load(f)
+
+
+def iter_jsonl_records(jsonl_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily read a JSON Lines file, yielding one record at a time.
+
+    A truncated last line (left behind by an interrupted writer) is skipped with a
+    warning; a malformed line anywhere else raises `json.JSONDecodeError`.
+
+    Args:
+        jsonl_path (str): Path to the `.jsonl` file; `.jsonl.gz` / `.jsonl.zst` are decompressed on the fly.
+
+    Yields:
+        Dict[str, Any]: One decoded record per non-empty line.
+    """
+    with open_text(jsonl_path, 'r') as f:
+        pending = None
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if pending is not None:
+                # The broken line was not the last one, so the file is really corrupt
+                raise pending
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                pending = json.JSONDecodeError(f"{jsonl_path} line {line_num}: {e.msg}", e.doc, e.pos)
+        if pending is not None:
+            logger.warning(f"⚠️ Ignoring truncated last line in {jsonl_path}: {pending.msg}")
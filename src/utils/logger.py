@@ -2,7 +2,11 @@
 
 import logging
 import os
-from typing import Optional
+from typing import Dict, Optional
+
+# Levels set through set_log_level(); they take precedence over the log_level of later setup_logger() calls,
+# so modules imported after the command line is parsed do not reset them
+_LEVEL_OVERRIDES: Dict[str, int] = {}
 
 def setup_logger(
     name: str = "visdrone_logger",
@@ -25,7 +29,7 @@ def setup_logger(
     """
     # Create a logger
     logger = logging.getLogger(name)
-    logger.setLevel(log_level)
+    logger.setLevel(_LEVEL_OVERRIDES.get(name, log_level))
 
     # Avoid adding duplicate handlers (prevent duplicate log messages)
     if logger.handlers:
@@ -49,4 +53,37 @@ def setup_logger(
         file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
 
-    return logger
\ No newline at end of file
+    return logger
+
+# Loggers of this package: task modules, utilities / converters, and run metrics (utils/instrumentation.py)
+PACKAGE_LOGGERS = ("visdrone_parser", "visdrone_logger", "visdrone_metrics")
+
+# Parse log of the annotation parsers, relative to the working directory
+PARSE_LOG_FILE = os.path.join("logs", "visdrone_parse_log.txt")
+
+
+def get_parser_logger() -> logging.Logger:
+    """
+    Return the "visdrone_parser" logger with its console and `PARSE_LOG_FILE` handlers.
+
+    Every parser module gets its logger here rather than relying on another module having configured
+    it: parser worker processes started with "spawn" (the default on Windows and macOS) only import
+    the modules of the parse function they run.
+    """
+    return setup_logger(name="visdrone_parser", log_file=PARSE_LOG_FILE, log_level=logging.INFO)
+
+
+def set_log_level(log_level, names=PACKAGE_LOGGERS) -> None:
+    """
+    Set the level of the package loggers, e.g. from a `--log-level` command line option.
+
+    Args:
+        log_level (int | str): A logging level or its name, e.g. logging.DEBUG or "WARNING".
+        names (Iterable[str]): Logger names to update.
+    """
+    level = logging.getLevelName(log_level.upper()) if isinstance(log_level, str) else log_level
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {log_level!r}")
+    for name in names:
+        _LEVEL_OVERRIDES[name] = level
+        logging.getLogger(name).setLevel(level)
@@ -0,0 +1,77 @@
+# src/utils/parallel.py
+
+import multiprocessing
+import os
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# Chunks submitted to the pool ahead of the consumer, per worker process
+IN_FLIGHT_PER_WORKER = 2
+
+# `func` of the pool a worker process belongs to, handed over once by `_init_worker` rather than with every chunk
+_worker_func: Optional[Callable[[Any], Any]] = None
+
+
+def resolve_num_workers(num_workers: Optional[int]) -> int:
+    """Return a usable worker count; None or values <= 0 mean "one worker per CPU core"."""
+    if num_workers is None or num_workers <= 0:
+        return os.cpu_count() or 1
+    return num_workers
+
+
+def ordered_parallel_map(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    num_workers: Optional[int] = 1,
+    chunksize: int = 16
+) -> Iterator[Any]:
+    """
+    Apply `func` to every item in a process pool and yield the results in input order.
+
+    Results are merged back in the exact order of `items`, so the output of a parallel
+    run is identical to a serial one. With a single worker no pool is started at all.
+
+    Work is submitted with backpressure: at most `IN_FLIGHT_PER_WORKER * num_workers` chunks are
+    queued or unconsumed at any time, and the oldest one is collected before another is submitted.
+    A slow consumer (e.g. a writer) therefore holds at most that many chunks of results in memory,
+    and `items` is read only as far ahead as that bound.
+
+    Args:
+        func (Callable): A picklable, module-level function (or callable object, e.g. `BoxNormalizer`)
+                         applied to each item; it is sent to each worker process once.
+        items (Iterable): Work items, e.g. annotation file paths.
+        num_workers (Optional[int]): Number of worker processes; None or <= 0 uses all CPU cores.
+        chunksize (int): Number of items sent to a worker per dispatch. Larger chunks amortize
+                         inter-process overhead for many small files.
+
+    Yields:
+        Any: `func(item)` for each item, in input order.
+    """
+    num_workers = resolve_num_workers(num_workers)
+    if num_workers == 1:
+        yield from map(func, items)
+        return
+
+    items = iter(items)
+    chunksize = max(1, chunksize)
+    with multiprocessing.Pool(processes=num_workers, initializer=_init_worker, initargs=(func,)) as pool:
+        in_flight = deque()
+        while True:
+            while len(in_flight) < IN_FLIGHT_PER_WORKER * num_workers:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    break
+                in_flight.append(pool.apply_async(_apply_chunk, (chunk,)))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().get()
+
+
+def _init_worker(func: Callable[[Any], Any]) -> None:
+    global _worker_func
+    _worker_func = func
+
+
+def _apply_chunk(chunk: List[Any]) -> List[Any]:
+    return [_worker_func(item) for item in chunk]
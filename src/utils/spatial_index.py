@@ -0,0 +1,163 @@
+# src/utils/spatial_index.py
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# The grid has at most this many cells per side (so at most its square in total), whatever the
+# box sizes: degenerate boxes (median size 0) would otherwise ask for ~extent / 1e-6 cells per side
+MAX_GRID_SIDE = 256
+
+
+def to_xyxy(boxes: np.ndarray, box_format: str = "xywh") -> np.ndarray:
+    """Return (x1, y1, x2, y2) boxes; "xywh" boxes are (left, top, width, height) as in VisDrone files."""
+    if box_format == "xyxy":
+        return boxes
+    if box_format == "xywh":
+        return np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]], axis=1)
+    raise ValueError(f"Unknown box_format: {box_format!r} (expected 'xywh' or 'xyxy')")
+
+
+def box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """IoU of one (x1, y1, x2, y2) box with each row of `boxes`."""
+    iw = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    ih = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    inter = iw * ih
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    union = area + areas - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class GridIndex:
+    """
+    Uniform-grid spatial index over the (x1, y1, x2, y2) boxes of one image.
+
+    Every box is registered in each cell it overlaps. Cell membership is stored in CSR form
+    (`cell_start`, `cell_items`) and built with a handful of vectorized NumPy operations, so
+    building is O(boxes) and a query only inspects the boxes of the cells it touches instead of
+    all n boxes (O(n²) for all-pairs questions by brute force). The cell size defaults to the
+    median box size, so a typical box spans one to four cells; it is never smaller than
+    1 / `MAX_GRID_SIDE` of the scene extent, which caps the grid at `MAX_GRID_SIDE`² cells.
+    """
+
+    def __init__(self, boxes: np.ndarray, cell_size: Optional[float] = None):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        n = len(self.boxes)
+        self.centers = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+        if n:
+            self.origin = self.boxes[:, :2].min(axis=0)
+            extent = self.boxes[:, 2:].max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.ones(2)
+        if cell_size is None:
+            sizes = self.boxes[:, 2:] - self.boxes[:, :2]
+            cell_size = float(np.median(sizes.max(axis=1))) if n else 1.0
+        self.cell_size = max(cell_size, float(extent.max()) / MAX_GRID_SIDE, 1e-6)
+        self.grid_shape = tuple(np.clip(np.ceil(extent / self.cell_size).astype(np.int64), 1, MAX_GRID_SIDE).tolist())
+
+        c0 = self._cells(self.boxes[:, :2])
+        c1 = self._cells(self.boxes[:, 2:])
+        spans = c1 - c0 + 1
+        per_box = spans[:, 0] * spans[:, 1]
+        # Expand every box into one (box, cell) entry per overlapped cell
+        box_ids = np.repeat(np.arange(n), per_box)
+        local = np.arange(len(box_ids)) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+        cols = c0[box_ids, 0] + local % spans[box_ids, 0]
+        rows = c0[box_ids, 1] + local // spans[box_ids, 0]
+        cell_ids = rows * self.grid_shape[0] + cols
+
+        order = np.argsort(cell_ids, kind="stable")
+        self.cell_items = box_ids[order]
+        counts = np.bincount(cell_ids, minlength=self.grid_shape[0] * self.grid_shape[1])
+        self.cell_start = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, np.array(self.grid_shape) - 1)
+
+    def _candidates(self, col0: int, row0: int, col1: int, row1: int) -> np.ndarray:
+        """Unique ids of the boxes registered in the (clipped) cell rectangle."""
+        gx, gy = self.grid_shape
+        col0, col1 = max(col0, 0), min(col1, gx - 1)
+        row0, row1 = max(row0, 0), min(row1, gy - 1)
+        if col0 > col1 or row0 > row1:
+            return np.empty(0, dtype=np.int64)
+        # Cells of one grid row are contiguous in the CSR arrays
+        slices = [
+            self.cell_items[self.cell_start[row * gx + col0]:self.cell_start[row * gx + col1 + 1]]
+            for row in range(row0, row1 + 1)
+        ]
+        return np.unique(np.concatenate(slices))
+
+    def _region_candidates(self, region: np.ndarray) -> np.ndarray:
+        (col0, row0), (col1, row1) = np.floor((region.reshape(2, 2) - self.origin) / self.cell_size).astype(np.int64)
+        return self._candidates(col0, row0, col1, row1)
+
+    def query_region(self, region: Tuple[float, float, float, float], mode: str = "intersects") -> np.ndarray:
+        """
+        Ids of the boxes related to an (x1, y1, x2, y2) region, in ascending order.
+
+        `mode` is "intersects" (any overlap), "within" (box entirely inside the region) or
+        "center" (box center inside the region).
+        """
+        region = np.asarray(region, dtype=np.float64)
+        ids = self._region_candidates(region)
+        boxes = self.boxes[ids]
+        if mode == "intersects":
+            keep = (boxes[:, 0] < region[2]) & (boxes[:, 2] > region[0]) & (boxes[:, 1] < region[3]) & (boxes[:, 3] > region[1])
+        elif mode == "within":
+            keep = (boxes[:, 0] >= region[0]) & (boxes[:, 1] >= region[1]) & (boxes[:, 2] <= region[2]) & (boxes[:, 3] <= region[3])
+        elif mode == "center":
+            centers = self.centers[ids]
+            keep = ((centers[:, 0] >= region[0]) & (centers[:, 0] <= region[2])
+                    & (centers[:, 1] >= region[1]) & (centers[:, 1] <= region[3]))
+        else:
+            raise ValueError(f"Unknown region query mode: {mode!r}")
+        return ids[keep]
+
+    def overlapping(self, i: int, min_iou: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, IoUs) of the boxes whose IoU with box `i` exceeds `min_iou`, highest IoU first."""
+        ids = self._region_candidates(self.boxes[i])
+        ids = ids[ids != i]
+        ious = box_iou(self.boxes[i], self.boxes[ids])
+        keep = ious > min_iou
+        ids, ious = ids[keep], ious[keep]
+        order = np.argsort(-ious, kind="stable")
+        return ids[order], ious[order]
+
+    def nearest(self, point: Tuple[float, float], k: int = 1, exclude: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (ids, distances) of the `k` boxes whose centers are nearest to `point`, nearest first.
+
+        Rings of cells are searched outwards from the cell holding `point`. Every box whose center
+        lies within `r` cells of the query is registered in ring `r` or closer, so the search stops
+        as soon as `k` candidates are within `r * cell_size`, which no unvisited box can beat.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        available = len(self) - (exclude is not None)
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        col, row = np.floor((point - self.origin) / self.cell_size).astype(np.int64).tolist()
+        max_ring = max(self.grid_shape) + abs(col) + abs(row)
+        ring = 0
+        while True:
+            ids = self._candidates(col - ring, row - ring, col + ring, row + ring)
+            if exclude is not None:
+                ids = ids[ids != exclude]
+            distances = np.hypot(*(self.centers[ids] - point).T)
+            if (distances <= ring * self.cell_size).sum() >= k or ring >= max_ring:
+                break
+            ring += 1
+        order = np.argsort(distances, kind="stable")[:k]
+        return ids[order], distances[order]
+
+    def neighbours(self, i: int, k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """The `k` boxes whose centers are nearest to the center of box `i` (excluding `i` itself)."""
+        return self.nearest(self.centers[i], k, exclude=i)
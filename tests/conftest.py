@@ -0,0 +1,36 @@
+# tests/conftest.py
+
+import logging
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+# The modules under src/ import each other as top-level packages (tasks, converters, utils)
+sys.path.insert(0, SRC_DIR)
+
+from benchmarks.synthetic_dataset import generate_synthetic_dataset  # noqa: E402
+from utils.logger import set_log_level, setup_logger  # noqa: E402
+
+# Configure the parser logger first, console only, so the parser modules do not attach their
+# logs/visdrone_parse_log.txt handler and the tests leave the parse log of the project alone
+setup_logger("visdrone_parser")
+set_log_level(logging.ERROR)
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory):
+    """Synthetic VisDrone-DET dataset (60 files) with malformed lines and a few missing images."""
+    return generate_synthetic_dataset(
+        str(tmp_path_factory.mktemp("dataset")), num_files=60, mean_boxes=30, malformed_rate=0.02,
+        missing_image_rate=0.05, seed=1
+    )
+
+
+@pytest.fixture(scope="session")
+def valid_dataset(tmp_path_factory):
+    """Synthetic VisDrone-DET dataset without malformed lines."""
+    return generate_synthetic_dataset(
+        str(tmp_path_factory.mktemp("valid_dataset")), num_files=60, mean_boxes=30, malformed_rate=0.0, seed=2
+    )
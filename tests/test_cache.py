@@ -0,0 +1,100 @@
+# tests/test_cache.py
+
+import filecmp
+import os
+import re
+import shutil
+
+import pytest
+
+from converters.to_sft_format import convert_detection_tasks_to_sft_llava_debug
+from tasks.detection_task import generate_detection_tasks, list_annotation_files
+from utils.cache import ConversionCache, settings_key
+from utils.category_mapping import VISDRONE_CATEGORY_MAPPING
+
+
+def _bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_annotation_freshness(tmp_path):
+    settings = settings_key({"parser": "python"})
+    paths = {name: tmp_path / name for name in ("unchanged.txt", "touched.txt", "edited.txt", "deleted.txt")}
+    for path in paths.values():
+        path.write_text("1,2,3,4,1,4,0,0\n", encoding="utf-8")
+
+    with ConversionCache(str(tmp_path / "cache")) as cache:
+        for path in paths.values():
+            cache.store_annotation(str(path), settings, [{"category_id": 4}], {"categories": {4: 1}})
+
+        # Same content with a new mtime (e.g. a fresh checkout) is decided by the content hash
+        _bump_mtime(paths["touched.txt"])
+        # Same size, different content
+        paths["edited.txt"].write_text("1,2,3,4,1,5,0,0\n", encoding="utf-8")
+        _bump_mtime(paths["edited.txt"])
+        os.remove(paths["deleted.txt"])
+
+        assert cache.annotation_is_fresh(str(paths["unchanged.txt"]), settings)
+        assert cache.annotation_is_fresh(str(paths["touched.txt"]), settings)
+        assert not cache.annotation_is_fresh(str(paths["edited.txt"]), settings)
+        assert not cache.annotation_is_fresh(str(paths["unchanged.txt"]), settings_key({"parser": "bulk"}))
+        assert cache.load_annotation(str(paths["unchanged.txt"])) == ([{"category_id": 4}], {"categories": {4: 1}})
+
+        assert cache.prune_annotations(["unchanged.txt", "touched.txt", "edited.txt"]) == 1
+        assert set(cache.annotation_fingerprints()) == {"unchanged.txt", "touched.txt", "edited.txt"}
+
+
+def _run(dataset_dir, output_dir, cache_dir, parser):
+    tasks_path = generate_detection_tasks(
+        os.path.join(dataset_dir, "annotations"), os.path.join(output_dir, "tasks"), output_format="jsonl",
+        group_by_image=True, parser=parser, cache_dir=cache_dir
+    )
+    sft_path = os.path.join(output_dir, "sft_detection_qa.jsonl")
+    convert_detection_tasks_to_sft_llava_debug(
+        tasks_path, sft_path, os.path.join(dataset_dir, "images"), category_mapping=dict(VISDRONE_CATEGORY_MAPPING),
+        cache_dir=cache_dir
+    )
+    return tasks_path, sft_path
+
+
+@pytest.mark.parametrize("parser", ["python", "bulk"])
+def test_cached_rerun_matches_a_fresh_run(dataset, tmp_path, capsys, parser):
+    dataset_dir = str(tmp_path / "dataset")
+    shutil.copytree(os.path.dirname(dataset["annotations_dir"]), dataset_dir)
+    annotations_dir = os.path.join(dataset_dir, "annotations")
+    cache_dir = str(tmp_path / "cache")
+    _run(dataset_dir, str(tmp_path / "first"), cache_dir, parser)
+
+    # Files with detections and an image, so each one has a cached SFT row
+    txt_files = [
+        txt_file for txt_file in list_annotation_files(annotations_dir)
+        if os.path.getsize(os.path.join(annotations_dir, txt_file))
+        and os.path.exists(os.path.join(dataset_dir, "images", txt_file.replace(".txt", ".jpg")))
+    ]
+    appended, rewritten, deleted = txt_files[:3]
+    with open(os.path.join(annotations_dir, appended), 'a', encoding='utf-8') as f:
+        f.write("10,20,30,40,1,4,0,0\n")
+    # Same size, different content: the category of the first box is changed in place
+    rewritten_path = os.path.join(annotations_dir, rewritten)
+    with open(rewritten_path, 'r', encoding='utf-8') as f:
+        lines = f.read().split("\n")
+    i = next(i for i, line in enumerate(lines) if line.count(",") == 7 and line.split(",")[5] in "0123456789")
+    fields = lines[i].split(",")
+    fields[5] = "3" if fields[5] != "3" else "5"
+    lines[i] = ",".join(fields)
+    with open(rewritten_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    _bump_mtime(rewritten_path)
+    os.remove(os.path.join(annotations_dir, deleted))
+
+    capsys.readouterr()
+    cached_tasks, cached_sft = _run(dataset_dir, str(tmp_path / "second"), cache_dir, parser)
+    hits, misses = map(int, re.search(r"Cache hits: (\d+), misses: (\d+)", capsys.readouterr().out).groups())
+    fresh_tasks, fresh_sft = _run(dataset_dir, str(tmp_path / "fresh"), None, parser)
+
+    assert filecmp.cmp(cached_tasks, fresh_tasks, shallow=False)
+    assert filecmp.cmp(cached_sft, fresh_sft, shallow=False)
+    assert misses == 2 and hits > 0
+    with ConversionCache(cache_dir) as cache:
+        assert set(cache.annotation_fingerprints()) == set(list_annotation_files(annotations_dir))
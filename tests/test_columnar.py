@@ -0,0 +1,38 @@
+# tests/test_columnar.py
+
+import filecmp
+
+import pytest
+
+from converters.to_sft_format import convert_detection_tasks_to_sft_llava_debug
+from tasks.columnar import ColumnarTasks
+from tasks.detection_task import generate_detection_tasks
+from utils.category_mapping import VISDRONE_CATEGORY_MAPPING
+from utils.jsonl_utils import iter_jsonl_records
+
+
+def _tasks_and_sft(dataset, output_dir, output_format, box_normalization, max_objects_per_conversation=None):
+    tasks_path = generate_detection_tasks(
+        dataset["annotations_dir"], str(output_dir), output_format=output_format, group_by_image=True,
+        parser="bulk", images_base_dir=dataset["images_dir"], box_normalization=box_normalization
+    )
+    sft_path = str(output_dir / "sft_detection_qa.jsonl")
+    convert_detection_tasks_to_sft_llava_debug(
+        tasks_path, sft_path, dataset["images_dir"], category_mapping=dict(VISDRONE_CATEGORY_MAPPING),
+        max_objects_per_conversation=max_objects_per_conversation
+    )
+    return tasks_path, sft_path
+
+
+@pytest.mark.parametrize("box_normalization", [None, {}, {"normalize_scale": 1000}])
+@pytest.mark.parametrize("max_objects_per_conversation", [None, 8])
+def test_columnar_and_jsonl_give_the_same_sft_records(dataset, tmp_path, box_normalization, max_objects_per_conversation):
+    jsonl_tasks, jsonl_sft = _tasks_and_sft(
+        dataset, tmp_path / "jsonl", "jsonl", box_normalization, max_objects_per_conversation
+    )
+    columnar_tasks, columnar_sft = _tasks_and_sft(
+        dataset, tmp_path / "columnar", "columnar", box_normalization, max_objects_per_conversation
+    )
+    assert filecmp.cmp(jsonl_sft, columnar_sft, shallow=False)
+    # The record view of the columns matches the jsonl task records too
+    assert list(ColumnarTasks(columnar_tasks).iter_task_records()) == list(iter_jsonl_records(jsonl_tasks))
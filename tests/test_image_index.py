@@ -0,0 +1,70 @@
+# tests/test_image_index.py
+
+import os
+
+from benchmarks.synthetic_dataset import stub_jpeg
+from utils.image_index import ImageIndex
+
+
+def _write_image(path, width, height):
+    path.write_bytes(stub_jpeg(width, height))
+
+
+def _bump_mtime(path):
+    # Timestamps only move with the kernel clock tick, so changes made right after a build are
+    # pushed forward explicitly instead of relying on the test being slow enough
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_reused_index_follows_directory_changes(tmp_path):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    index_path = str(tmp_path / "cache" / "image_index.json")
+    _write_image(images_dir / "a.jpg", 100, 50)
+    _write_image(images_dir / "b.jpg", 64, 32)
+
+    index = ImageIndex(str(images_dir), index_path, read_dimensions=True)
+    assert index.dimensions("a.jpg") == (100, 50)
+    assert index.dimensions("b.jpg") == (64, 32)
+
+    # Unchanged directory: the saved index is reused as is
+    index = ImageIndex(str(images_dir), index_path, read_dimensions=True)
+    assert len(index) == 2 and index.dimensions("a.jpg") == (100, 50)
+
+    # Added, removed and replaced in place (same file size, new header)
+    _write_image(images_dir / "c.jpg", 320, 240)
+    os.remove(images_dir / "b.jpg")
+    _write_image(images_dir / "a.jpg", 200, 80)
+    _bump_mtime(images_dir / "a.jpg")
+    _bump_mtime(images_dir)
+
+    index = ImageIndex(str(images_dir), index_path, read_dimensions=True)
+    assert len(index) == 2
+    assert index.exists("a.jpg") and index.exists("c.jpg") and not index.exists("b.jpg")
+    assert index.dimensions("a.jpg") == (200, 80)
+    assert index.dimensions("c.jpg") == (320, 240)
+    assert index.dimensions("b.jpg") is None
+
+
+def test_existence_index_is_rebuilt_when_the_directory_changes(tmp_path):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    index_path = str(tmp_path / "image_index.json")
+    _write_image(images_dir / "a.jpg", 100, 50)
+
+    index = ImageIndex(str(images_dir), index_path)
+    assert index.exists("a.jpg") and not index.exists("b.jpg")
+    assert index.dimensions("a.jpg") is None
+
+    _write_image(images_dir / "b.jpg", 100, 50)
+    os.remove(images_dir / "a.jpg")
+    _bump_mtime(images_dir)
+
+    index = ImageIndex(str(images_dir), index_path)
+    assert index.exists("b.jpg") and not index.exists("a.jpg")
+    assert index.file_size("b.jpg") == len(stub_jpeg(100, 50))
+
+    # A dimensions index cannot be served from a saved existence-only index
+    index = ImageIndex(str(images_dir), index_path, read_dimensions=True)
+    assert index.dimensions("b.jpg") == (100, 50)
@@ -0,0 +1,55 @@
+# tests/test_parallel.py
+
+import filecmp
+import os
+
+import pytest
+
+from tasks.detection_task import generate_detection_tasks
+from utils.parallel import ordered_parallel_map
+
+
+def _square(x):
+    return x * x
+
+
+def _same_output(path_a: str, path_b: str) -> bool:
+    """Byte-for-byte comparison of two task files or two columnar task directories."""
+    if os.path.isfile(path_a):
+        return filecmp.cmp(path_a, path_b, shallow=False)
+    names = sorted(os.listdir(path_a))
+    return names == sorted(os.listdir(path_b)) and all(
+        filecmp.cmp(os.path.join(path_a, name), os.path.join(path_b, name), shallow=False) for name in names
+    )
+
+
+def test_ordered_parallel_map_keeps_input_order():
+    items = list(range(200))
+    # More chunks than the in-flight bound, so results are collected while work is still submitted
+    assert list(ordered_parallel_map(_square, items, num_workers=3, chunksize=7)) == [x * x for x in items]
+
+
+@pytest.mark.parametrize("output_format", ["json", "jsonl", "columnar"])
+@pytest.mark.parametrize("parser", ["python", "bulk"])
+def test_parallel_detection_tasks_match_serial(dataset, tmp_path, parser, output_format):
+    outputs = []
+    for num_workers in (1, 3):
+        outputs.append(generate_detection_tasks(
+            dataset["annotations_dir"], str(tmp_path / f"workers_{num_workers}"), output_format=output_format,
+            num_workers=num_workers, chunksize=4, parse_report_path=str(tmp_path / f"report_{num_workers}.json"),
+            group_by_image=True, parser=parser
+        ))
+    assert _same_output(*outputs)
+    assert filecmp.cmp(tmp_path / "report_1.json", tmp_path / "report_3.json", shallow=False)
+
+
+def test_parallel_normalized_tasks_match_serial(dataset, tmp_path):
+    outputs = [
+        generate_detection_tasks(
+            dataset["annotations_dir"], str(tmp_path / f"workers_{num_workers}"), output_format="jsonl",
+            num_workers=num_workers, group_by_image=True, images_base_dir=dataset["images_dir"],
+            box_normalization={"normalize_scale": 1000}
+        )
+        for num_workers in (1, 3)
+    ]
+    assert _same_output(*outputs)
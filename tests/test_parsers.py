@@ -0,0 +1,43 @@
+# tests/test_parsers.py
+
+import os
+
+from tasks.bulk_parser import ERROR_TYPES, detections_from_array, parse_annotation_buffer
+from tasks.detection_task import iter_parsed_files, list_annotation_files, parse_visdrone_txt
+
+
+def _annotation_paths(dataset):
+    annotations_dir = dataset["annotations_dir"]
+    return [os.path.join(annotations_dir, txt_file) for txt_file in list_annotation_files(annotations_dir)]
+
+
+def test_python_and_bulk_parsers_agree_on_valid_input(valid_dataset):
+    txt_paths = _annotation_paths(valid_dataset)
+    python_results = list(iter_parsed_files(txt_paths, "python"))
+    bulk_results = list(iter_parsed_files(txt_paths, "bulk"))
+
+    assert len(python_results) == len(bulk_results) == len(txt_paths)
+    for (python_detections, python_stats), (bulk_values, bulk_stats) in zip(python_results, bulk_results):
+        assert detections_from_array(bulk_values) == python_detections
+        assert bulk_stats == python_stats
+    assert sum(len(detections) for detections, _ in python_results) == valid_dataset["totals"]["boxes"]
+
+
+def test_bulk_parser_rejects_what_int_rejects_in_the_category(tmp_path):
+    lines = [
+        "1,2,3,4,1,4,0,0",     # valid
+        "1,2,3,4,1,4.0,0,0",   # float category
+        "1,2,3,4,1,4e0,0,0",   # exponent category
+        "1,2,3,4,1, 7 ,0,0",   # whitespace around the category is fine
+        "1.5,2,3,4,0.5,9,0,0",  # float coordinates and score are fine
+        "1,2,3,4,1,inf,0,0",   # infinite category
+    ]
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+    _, errors, _, _ = parse_annotation_buffer(data)
+    assert [ERROR_TYPES[code] for code in errors.tolist()] == ["", "value_error", "value_error", "", "", "value_error"]
+
+    txt_path = tmp_path / "0000001.txt"
+    txt_path.write_bytes(data)
+    assert [det["category_id"] for det in parse_visdrone_txt(str(txt_path))] == [4, 7, 9]
+    bulk_values, _ = next(iter_parsed_files([str(txt_path)], "bulk"))
+    assert [det["category_id"] for det in detections_from_array(bulk_values)] == [4, 7, 9]